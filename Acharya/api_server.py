@@ -3,31 +3,64 @@ FastAPI Backend Server for Acharya
 This file creates an API layer that connects the React frontend to the Python agentic system.
 """
 import asyncio
+import hmac
 import os
+import sys
+import threading
+import time
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import APIRouter, FastAPI, HTTPException, BackgroundTasks, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from google.adk.sessions import DatabaseSessionService
-from google.adk.runners import Runner
-from google.genai import types
-from teacher_agent.sub_agents.web_page_content_function.function import web_page_content_function
-from teacher_agent.sub_agents.factory_agent.agent import factory_agent
-from teacher_agent.sub_agents.topic_generator_agent.agent import topic_generator_agent
-
-# Load environment variables
+# Load environment variables before the agent modules read their settings
 load_dotenv()
 
-# Database setup
-db_url = "sqlite+aiosqlite:///./Acharya.db"
-session_service = DatabaseSessionService(db_url=db_url)
+# The agent pipeline (google.adk, google.genai, serpapi and the agent graphs) is loaded lazily
+# by services/pipeline.py, so only lightweight modules are imported here
+from teacher_agent.artifacts import PODCAST_DIR, IMAGE_DIR
+from services import pipeline
+from services.reaper import SessionReaper
+from services.loop_monitor import LoopLagMonitor, LOOP_MONITOR_ENABLED, sample_profile
+from services.snapshots import get_status_snapshot, choose_encoding
+from services.webhooks import WebhookDispatcher, session_payload, validate_callback_url
+from services.course_cache import COURSE_CACHE_ENABLED, CacheWarmer, CourseCache
+from services.subtopic_index import SUBTOPIC_REUSE_ENABLED
+from services.search_index import DOCUMENT_KINDS, SEARCH_INDEX_ENABLED, SearchIndex
+from services.export import archive_name, course_archive
+from services.process_pool import process_pool
+from teacher_agent.metrics import (
+    classify_error,
+    record_error,
+    throttle,
+    timed,
+    SESSIONS_ACTIVE,
+    SESSIONS_QUEUED,
+    SUBTOPICS_GENERATED,
+)
+from teacher_agent.tracing import (
+    Trace,
+    current_trace,
+    current_span,
+    end_span,
+    waterfall,
+    to_otlp,
+)
+from teacher_agent.scheduler import (
+    Job,
+    current_job,
+    fairness_key,
+    session_scheduler,
+    model_scheduler,
+)
+from teacher_agent.usage import UsageLedger, UsageStore, current_ledger, new_usage
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 # In-memory store for session progress and results
 # In production, use Redis or similar
@@ -35,11 +68,40 @@ session_store = {}
 
 APP_NAME = "Acharya"
 
+# Bearer token of the /api/admin endpoints, which are disabled while it is unset
+ADMIN_TOKEN = os.getenv("ACHARYA_ADMIN_TOKEN", "")
+
+# Completed courses by topic, served instantly to later requests for the same topic
+course_cache = CourseCache()
+
+# Evicts finished results to cold storage and deletes orphaned ADK sessions and artifact files
+reaper = SessionReaper(session_store, pipeline.loaded_session_service, APP_NAME, [PODCAST_DIR, IMAGE_DIR],
+                       pinned_artifacts=course_cache.artifacts)
+
+# Logs the stack of anything that blocks the event loop (ACHARYA_LOOP_LAG_THRESHOLD_MS)
+loop_monitor = LoopLagMonitor()
+profile_lock = asyncio.Lock()
+
+# Signed completion notifications for sessions created with a callback_url
+webhooks = WebhookDispatcher()
+
+# Full-text index of every generated artifact, kept after sessions are reaped
+search_index = SearchIndex() if SEARCH_INDEX_ENABLED else None
+
+# Tokens and cost per user (or tenant) and day, for the daily usage budgets
+usage_store = UsageStore()
+
 
 # Pydantic models for API
 class TopicRequest(BaseModel):
     topic: str
     user_id: Optional[str] = "default_user"
+    # School customers: the tenant's users share one fair-scheduling share
+    tenant_id: Optional[str] = None
+    # Receives signed POSTs on subtopic milestones and on completion or failure (see services/webhooks.py)
+    callback_url: Optional[str] = None
+    # Generates a new course even if the topic or some of its subtopics are in the course cache
+    fresh: bool = False
 
 
 class SessionResponse(BaseModel):
@@ -48,6 +110,19 @@ class SessionResponse(BaseModel):
     message: str
 
 
+class RegenerationTarget(BaseModel):
+    subtopic_index: int
+    # Content fields to regenerate; None (or webContent) regenerates the whole subtopic
+    artifacts: Optional[list[Literal["webContent", "flashcards", "quiz", "podcast", "images"]]] = None
+    # Replaces the subtopic with a new one, regenerating all of its content
+    subtopic: Optional[str] = None
+
+
+class RegenerationRequest(BaseModel):
+    # Regenerations run and are charged as the session's own user and tenant
+    targets: list[RegenerationTarget]
+
+
 class ContentResponse(BaseModel):
     session_id: str
     status: str  # "processing", "completed", "error"
@@ -61,21 +136,42 @@ class ContentResponse(BaseModel):
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Acharya API Server starting...")
+    reaper_task = asyncio.create_task(reaper.run())
+    webhook_task = asyncio.create_task(webhooks.run())
+    warmer_task = asyncio.create_task(cache_warmer.run())
+    monitor_task = asyncio.create_task(loop_monitor.run()) if LOOP_MONITOR_ENABLED else None
+    # Worker processes for rendering and other CPU-bound post-processing
+    process_pool.start()
+    # Load the agent pipeline after the server is already answering requests
+    prewarm_task = asyncio.create_task(pipeline.prewarm()) if pipeline.PREWARM else None
     yield
+    if prewarm_task:
+        prewarm_task.cancel()
+    reaper_task.cancel()
+    webhook_task.cancel()
+    warmer_task.cancel()
+    course_cache.save()
+    usage_store.save()
+    if search_index is not None:
+        search_index.close()
+    process_pool.shutdown()
+    if monitor_task:
+        monitor_task.cancel()
     # Shutdown - Clean up all sessions
     print("👋 Acharya API Server shutting down...")
     print("🧹 Cleaning up sessions...")
     
     # Delete all ADK sessions
     cleanup_count = 0
+    session_service = pipeline.loaded_session_service()
     for session_id, session_data in list(session_store.items()):
         try:
             # Extract ADK session ID if it exists
             adk_session_id = session_data.get("adk_session_id")
-            if adk_session_id:
+            if adk_session_id and session_service:
                 await session_service.delete_session(
                     app_name=APP_NAME,
-                    user_id="default_user",
+                    user_id=session_data.get("user_id", "default_user"),
                     session_id=adk_session_id,
                 )
                 cleanup_count += 1
@@ -104,23 +200,73 @@ app.add_middleware(
 )
 
 
-async def generate_content(session_id: str, topic: str, user_id: str):
+async def index_for_search(session_id: str, entry: dict, changed: Optional[list] = None) -> None:
+    """Indexes the changed (slot, field) pairs of a session, or all of it, for /api/search."""
+    if search_index is None:
+        return
+    try:
+        if changed is None:
+            await asyncio.to_thread(search_index.index_session, session_id, entry)
+        elif changed:
+            await asyncio.to_thread(search_index.index_changes, session_id, entry, changed)
+    except Exception as e:
+        print(f"Error indexing session {session_id} for search: {e}")
+
+
+async def generate_content(session_id: str, topic: str, user_id: str, tenant_id: Optional[str] = None,
+                           callback_url: Optional[str] = None, reuse_subtopics: bool = True):
     """
     Background task to run the agent pipeline and generate content.
-    Updates session_store with progress and results.
+    Waits for a fair-share slot for its user (or tenant), then updates session_store with
+    progress and results as the agents publish them. Unless reuse_subtopics is False, subtopics
+    close to ones generated before reuse their content.
     """
+    # Every stage, agent, model call, tool call and sleep below is recorded into this trace
+    trace = Trace(session_id)
+    pipeline_span = trace.start_span("generate_content", "stage", topic=topic, user_id=user_id)
+    trace_token = current_trace.set(trace)
+    span_token = current_span.set(pipeline_span)
+
+    # Model calls of this session are scheduled under the same fairness key
+    job = Job(session_id, fairness_key(user_id, tenant_id))
+    job_token = current_job.set(job)
+    session_grant = None
+
+    # Tokens and cost of every model and TTS call of this session, checked against the budgets
+    usage = new_usage()
+    ledger = UsageLedger(usage, job.key, usage_store)
+    ledger_token = current_ledger.set(ledger)
+
     try:
         session_store[session_id] = {
             "status": "processing",
             "topic": topic,
             "subtopics": [],
             "content": [],
-            "progress": "Generating subtopics...",
-            "error": None
+            "progress": "Waiting for a free generation slot...",
+            "error": None,
+            "user_id": user_id,
+            "tenant_id": tenant_id,
+            "callback_url": callback_url,
+            "created_at": time.time(),
+            "finished_at": None,
+            "trace": trace,
+            "usage": usage,
         }
 
-        # Create initial state
+        session_grant = await session_scheduler.acquire(job.key, owner=session_id)
+        SESSIONS_QUEUED.dec()
+        SESSIONS_ACTIVE.inc()
+        session_store[session_id]["progress"] = "Generating subtopics..."
+
+        # Loaded on first use unless the server already pre-warmed it
+        runtime = await pipeline.ensure_pipeline()
+        session_service = pipeline.get_session_service()
+
+        # Create initial state; the research agent builds on what earlier courses already cover
         initial_state = {"topic": topic}
+        if search_index is not None:
+            initial_state["existing_material"] = await asyncio.to_thread(search_index.existing_material, topic)
 
         # Create a new ADK session
         adk_session = await session_service.create_session(
@@ -134,129 +280,158 @@ async def generate_content(session_id: str, topic: str, user_id: str):
         session_store[session_id]["adk_session_id"] = adk_session_id
 
         # Step 1: Run topic generator agent
-        runner = Runner(
-            agent=topic_generator_agent,
+        runner = runtime.Runner(
+            agent=runtime.topic_generator_agent,
             app_name=APP_NAME,
             session_service=session_service,
+            plugins=runtime.plugins,
         )
 
-        content = types.Content(
+        content = runtime.types.Content(
             role="user",
-            parts=[types.Part(text=f"Please generate educational content for the topic: {topic}")]
+            parts=[runtime.types.Part(text=f"Please generate educational content for the topic: {topic}")]
         )
 
-        async for response in runner.run_async(
-            user_id=user_id,
-            session_id=adk_session_id,
-            new_message=content
-        ):
-            pass  # Process events
+        # Outputs are read from the state deltas of the yielded events, not from the session store
+        state = {}
+        invocation_ids = set()
+        with timed("topic_stage"):
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=adk_session_id,
+                new_message=content
+            ):
+                invocation_ids.add(event.invocation_id)
+                if event.actions and event.actions.state_delta:
+                    state.update(event.actions.state_delta)
 
-        # Wait for agent to complete and update state
-        await asyncio.sleep(30)
+        # The subtopics are in state now, so the topic generator's events can be dropped
+        await session_service.compact_events(APP_NAME, user_id, adk_session_id, invocation_ids)
 
-        # Refresh session to get latest state
-        adk_session = await session_service.get_session(
-            app_name=APP_NAME,
-            user_id=user_id,
-            session_id=adk_session_id
-        )
+        # Wait for agent to complete and update state
+        await throttle(30, "topic_stage")
 
         # Extract subtopics
-        if "subtopics" in adk_session.state and "subtopics" in adk_session.state["subtopics"]:
-            subtopics_data = adk_session.state["subtopics"]
+        if isinstance(state.get("subtopics"), dict) and "subtopics" in state["subtopics"]:
+            subtopics_data = state["subtopics"]
             subtopics_list = subtopics_data.get("subtopics", [])
-            subtopic_count = subtopics_data.get("count", len(subtopics_list))
+            subtopic_count = min(subtopics_data.get("count", len(subtopics_list)), len(subtopics_list))
+            subtopics_list = subtopics_list[:subtopic_count]
 
             session_store[session_id]["subtopics"] = subtopics_list
             session_store[session_id]["progress"] = f"Found {subtopic_count} subtopics. Generating content..."
-            
-            # Initialize empty content slots for each subtopic
-            session_store[session_id]["content"] = [
-                {
-                    "webContent": "",
-                    "flashcards": [],
-                    "quiz": [],
-                    "podcast": {"title": f"{subtopics_list[i]} Overview", "transcript": "", "audioUrl": ""},
-                    "images": []
-                } for i in range(subtopic_count)
-            ]
-
-            # Step 2: Create sub-agents for each subtopic
-            sub_agents = []
-            for i in range(subtopic_count):
-                sub_agents.append(web_page_content_function(subtopics_list[i]))
+            webhooks.notify(session_id, session_store[session_id], "session.subtopics", subtopics=subtopics_list)
+
+            # Subtopics close to one generated for an earlier course reuse its content
+            reused = {}
+            if reuse_subtopics and COURSE_CACHE_ENABLED and SUBTOPIC_REUSE_ENABLED:
+                with timed("subtopic_reuse"):
+                    matches = await asyncio.to_thread(lambda: [course_cache.subtopics.find(subtopic) for subtopic in subtopics_list])
+                for i, match in enumerate(matches):
+                    if match is not None:
+                        print(f"Reusing '{match['title']}' for subtopic '{subtopics_list[i]}' (score {match['score']})")
+                        reused[i] = match
+            session_store[session_id]["reused_slots"] = {i: match["id"] for i, match in reused.items()}
+            SUBTOPICS_GENERATED.labels(source="reused").inc(len(reused))
+            SUBTOPICS_GENERATED.labels(source="generated").inc(subtopic_count - len(reused))
+
+            def notify_completed(slots):
+                for slot in slots:
+                    webhooks.notify(
+                        session_id, session_store[session_id], "subtopic.completed",
+                        subtopic_index=slot,
+                        subtopic=subtopics_list[slot],
+                        content=session_store[session_id]["content"][slot],
+                    )
+
+            # Step 2: Research the topic once and share the corpus with every subtopic writer
+            use_research_corpus = False
+            if runtime.shared_research and len(reused) < subtopic_count:
+                session_store[session_id]["progress"] = "Researching topic..."
+                runner = runtime.Runner(
+                    agent=runtime.research_agent,
+                    app_name=APP_NAME,
+                    session_service=session_service,
+                    plugins=runtime.plugins,
+                )
 
-            factory_agent.sub_agents = sub_agents
+                invocation_ids = set()
+                with timed("research_stage"):
+                    async for event in runner.run_async(
+                        user_id=user_id,
+                        session_id=adk_session_id,
+                        new_message=content
+                    ):
+                        invocation_ids.add(event.invocation_id)
+                        if event.actions and event.actions.state_delta.get("research_notes"):
+                            use_research_corpus = True
 
-            # Step 3: Run factory agent (parallel content generation)
-            runner = Runner(
-                agent=factory_agent,
-                app_name=APP_NAME,
-                session_service=session_service,
-            )
+                # The notes and sources are in state; keep them out of every writer's history
+                await session_service.compact_events(APP_NAME, user_id, adk_session_id, invocation_ids)
 
-            await asyncio.sleep(30)
-            
-            # Start a background task to periodically update content
-            update_task = asyncio.create_task(
-                update_content_periodically(session_id, user_id, adk_session_id, subtopics_list, subtopic_count)
-            )
+                session_store[session_id]["progress"] = f"Found {subtopic_count} subtopics. Generating content..."
 
-            async for response in runner.run_async(
-                user_id=user_id,
-                session_id=adk_session_id,
-                new_message=content
-            ):
-                pass  # Process events
-            
-            # Cancel the update task
-            update_task.cancel()
-            try:
-                await update_task
-            except asyncio.CancelledError:
-                pass
+            # Step 3: Create sub-agents for each subtopic that is not reused
+            sub_agents = []
+            for i in range(subtopic_count):
+                if i not in reused:
+                    sub_agents.append(runtime.web_page_content_function(subtopics_list[i], use_research_corpus=use_research_corpus))
 
-            # Final content extraction
-            adk_session = await session_service.get_session(
-                app_name=APP_NAME,
-                user_id=user_id,
-                session_id=adk_session_id
+            # Content slots are filled in by the sink as each agent publishes its output
+            sink = runtime.ResultSink(
+                session_store[session_id], subtopics_list, sub_agents,
+                reused={i: match["content"] for i, match in reused.items()},
             )
+            session_store[session_id]["sink"] = sink
+            notify_completed(sink.newly_completed([(i, "webContent") for i in reused]))
+
+            # Step 4: Run factory agent (parallel content generation)
+            if sub_agents:
+                runner = runtime.Runner(
+                    # A new agent per session: sessions run concurrently, each with its own pipelines
+                    agent=runtime.factory_agent_function(sub_agents),
+                    app_name=APP_NAME,
+                    session_service=session_service,
+                    plugins=runtime.plugins,
+                )
 
-            # Extract final content for each subtopic
-            content_list = []
-            for i in range(1, subtopic_count + 1):
-                # Get podcast transcript/dialogue from state
-                podcast_data = adk_session.state.get(f"podcast_content_{i}", {})
-                podcast_transcript = ""
-                if isinstance(podcast_data, dict) and "dialogue" in podcast_data:
-                    # Format dialogue into readable transcript
-                    for turn in podcast_data.get("dialogue", []):
-                        podcast_transcript += f"{turn.get('speaker', 'Speaker')}: {turn.get('text', '')}\n"
-                elif isinstance(podcast_data, str):
-                    podcast_transcript = podcast_data
-
-                subtopic_content = {
-                    "webContent": adk_session.state.get(f"webpage_content_{i}", ""),
-                    "flashcards": parse_flashcards(adk_session.state.get(f"flashcards_{i}", "")),
-                    "quiz": parse_quiz(adk_session.state.get(f"quiz_{i}", "")),
-                    "podcast": {
-                        "title": f"{subtopics_list[i-1]} Overview",
-                        "transcript": podcast_transcript,
-                        # Serve local audio file via API endpoint
-                        "audioUrl": f"http://localhost:8000/api/podcast/out_{i}.wav"
-                    },
-                    "images": [
-                        # Serve local image file via API endpoint
-                        {"url": f"http://localhost:8000/api/images/image_{i}.jpg", "title": f"{subtopics_list[i-1]} Visual"}
-                    ]
-                }
-                content_list.append(subtopic_content)
-
-            session_store[session_id]["content"] = content_list
+                await throttle(30, "factory_stage")
+
+                with timed("factory_stage"):
+                    try:
+                        async for event in runner.run_async(
+                            user_id=user_id,
+                            session_id=adk_session_id,
+                            new_message=content
+                        ):
+                            changed = sink.publish_event(event)
+                            await index_for_search(session_id, session_store[session_id], changed)
+                            notify_completed(sink.newly_completed(changed))
+                    except Exception:
+                        # Cut off at a usage budget: keep what was generated, and finalize()
+                        # fills in the missing flashcards and quizzes offline
+                        if ledger.exceeded is None:
+                            raise
+                        print(f"Session {session_id}: {ledger.exceeded}")
+
+            await sink.finalize()
+            await index_for_search(session_id, session_store[session_id])
             session_store[session_id]["status"] = "completed"
-            session_store[session_id]["progress"] = "Content generation complete!"
+            session_store[session_id]["progress"] = (
+                f"{ledger.exceeded}; content is incomplete." if ledger.exceeded else "Content generation complete!"
+            )
+            session_store[session_id]["finished_at"] = time.time()
+
+            # Later requests for this topic are served from the course cache, and later courses
+            # reuse its subtopics
+            if COURSE_CACHE_ENABLED:
+                try:
+                    await asyncio.to_thread(course_cache.index_subtopics, session_store[session_id])
+                    # A course cut off at a budget may lack model-generated artifacts
+                    if not ledger.exceeded and all(slot["webContent"] for slot in session_store[session_id]["content"]):
+                        await asyncio.to_thread(course_cache.put, topic, session_store[session_id])
+                except Exception as e:
+                    print(f"Error caching course for {topic}: {e}")
 
             # Cleanup ADK session
             await session_service.delete_session(
@@ -268,92 +443,217 @@ async def generate_content(session_id: str, topic: str, user_id: str):
         else:
             session_store[session_id]["status"] = "error"
             session_store[session_id]["error"] = "Failed to generate subtopics"
+            session_store[session_id]["finished_at"] = time.time()
+            record_error("pipeline", "invalid subtopics")
 
     except Exception as e:
         # Extract meaningful error message from potentially nested exceptions
-        error_message = extract_error_message(e)
+        error_message = ledger.exceeded or extract_error_message(e)
         
         session_store[session_id]["status"] = "error"
         session_store[session_id]["error"] = error_message
+        session_store[session_id]["finished_at"] = time.time()
         print(f"Error generating content: {error_message}")
         
+        for sub_exc in getattr(e, "exceptions", [e]):
+            record_error("pipeline", sub_exc)
+
         # Also print full traceback for debugging
         import traceback
         traceback.print_exc()
 
+    finally:
+        if session_grant is None:
+            SESSIONS_QUEUED.dec()
+        else:
+            SESSIONS_ACTIVE.dec()
+            session_scheduler.release(session_grant)
+        # Model slots still held by calls that were cut short
+        model_scheduler.release_owner(session_id)
+        current_job.reset(job_token)
+        current_ledger.reset(ledger_token)
+        await asyncio.to_thread(usage_store.save)
+        entry = session_store.get(session_id)
+        if entry and entry["status"] in ("completed", "error"):
+            event = "session.completed" if entry["status"] == "completed" else "session.failed"
+            webhooks.notify(session_id, entry, event, **session_payload(session_id, entry))
+        end_span(pipeline_span, status=session_store.get(session_id, {}).get("status"))
+        current_span.reset(span_token)
+        current_trace.reset(trace_token)
+
+
+# Fairness key of the warmer's sessions; give it a low weight in ACHARYA_SCHEDULER_WEIGHTS
+# (e.g. user:cache_warmer=0.25) to keep it out of the way of users during a window
+WARMER_USER_ID = "cache_warmer"
+
+
+async def warm_topic(topic: str) -> Optional[dict]:
+    """Generates a course for the cache warmer and returns its finished entry."""
+    session_id = f"warm-{uuid.uuid4()}"
+    SESSIONS_QUEUED.inc()
+    # Refreshing a stale course must not copy the stale content back
+    await generate_content(session_id, topic, WARMER_USER_ID, reuse_subtopics=False)
+    # The course is in the cache now; nobody polls this session
+    return session_store.pop(session_id, None)
+
+# Pre-generates popular topics in off-peak windows (ACHARYA_WARMER)
+cache_warmer = CacheWarmer(course_cache, warm_topic)
+
+
+def cached_session_entry(session_id: str, course: dict, user_id: str, tenant_id: Optional[str],
+                         callback_url: Optional[str]) -> dict:
+    """A completed session_store entry for a course served from the course cache."""
+    trace = Trace(session_id)
+    end_span(trace.start_span("course_cache", "stage", topic=course["topic"], user_id=user_id))
+    now = time.time()
+    return {
+        "status": "completed",
+        "topic": course["topic"],
+        "subtopics": course["subtopics"],
+        "content": course["content"],
+        "progress": "Served from the course cache",
+        "error": None,
+        "user_id": user_id,
+        "tenant_id": tenant_id,
+        "callback_url": callback_url,
+        "created_at": now,
+        "finished_at": now,
+        "trace": trace,
+        "usage": new_usage(),
+        "cached": True,
+    }
 
-async def update_content_periodically(session_id: str, user_id: str, adk_session_id: str, subtopics_list: list, subtopic_count: int):
-    """Periodically check and update content as it becomes available."""
-    while True:
-        try:
-            await asyncio.sleep(10)  # Check every 10 seconds
-            
-            # Get latest session state
-            adk_session = await session_service.get_session(
-                app_name=APP_NAME,
+
+async def regenerate_content(session_id: str, targets: list, user_id: str, tenant_id: Optional[str] = None):
+    """
+    Background task to regenerate selected artifacts of selected subtopics of a finished session.
+    Only the agents producing those artifacts run; every other stored artifact is kept.
+    targets are dicts with subtopic_index, artifacts (None for the whole subtopic) and subtopic.
+    """
+    entry = session_store[session_id]
+    previous_status = entry.pop("previous_status", "completed")
+
+    # Recorded into the session's existing trace as another stage
+    trace = entry.get("trace") or Trace(session_id)
+    entry["trace"] = trace
+    regeneration_span = trace.start_span("regenerate_content", "stage", targets=len(targets), user_id=user_id)
+    trace_token = current_trace.set(trace)
+    span_token = current_span.set(regeneration_span)
+
+    job = Job(session_id, fairness_key(user_id, tenant_id))
+    job_token = current_job.set(job)
+    session_grant = None
+    session_service = None
+    adk_session_id = None
+
+    # Accounted to the session's existing usage, so the session budget covers its regenerations
+    entry["usage"] = entry.get("usage") or new_usage()
+    ledger = UsageLedger(entry["usage"], job.key, usage_store)
+    ledger_token = current_ledger.set(ledger)
+
+    try:
+        session_grant = await session_scheduler.acquire(job.key, owner=session_id)
+        SESSIONS_QUEUED.dec()
+        SESSIONS_ACTIVE.inc()
+
+        runtime = await pipeline.ensure_pipeline()
+        session_service = pipeline.get_session_service()
+
+        subtopics_list = entry["subtopics"]
+        targeted = {target["subtopic_index"] for target in targets}
+        # Pages of the untouched subtopics, used as distractors by the offline quiz fallback
+        sibling_pages = [c["webContent"] for i, c in enumerate(entry["content"]) if i not in targeted and c["webContent"]]
+
+        pipelines = []
+        state = {"topic": entry["topic"]}
+        for target in targets:
+            slot = target["subtopic_index"]
+            subtopic = target["subtopic"] or subtopics_list[slot]
+            agent = runtime.web_page_content_function(subtopic, artifacts=target["artifacts"])
+            if target["artifacts"] is not None:
+                # The downstream agents read the stored webpage instead of a new one
+                state.update(runtime.regeneration_state(agent, entry["content"][slot]["webContent"], sibling_pages))
+            pipelines.append(agent)
+
+        sink = runtime.ResultSink(entry, subtopics_list, pipelines, slots=[target["subtopic_index"] for target in targets])
+        for target in targets:
+            if target["artifacts"] is None:
+                sink.replace_subtopic(target["subtopic_index"], target["subtopic"] or subtopics_list[target["subtopic_index"]])
+        entry["sink"] = sink
+
+        adk_session = await session_service.create_session(
+            app_name=APP_NAME,
+            user_id=user_id,
+            state=state,
+        )
+        adk_session_id = adk_session.id
+        entry["adk_session_id"] = adk_session_id
+
+        runner = runtime.Runner(
+            agent=runtime.regeneration_agent_function(pipelines),
+            app_name=APP_NAME,
+            session_service=session_service,
+            plugins=runtime.plugins,
+        )
+        content = runtime.types.Content(
+            role="user",
+            parts=[runtime.types.Part(text=f"Please generate educational content for the topic: {entry['topic']}")]
+        )
+
+        entry["progress"] = "Regenerating content..."
+        with timed("regeneration_stage"):
+            async for event in runner.run_async(
                 user_id=user_id,
-                session_id=adk_session_id
+                session_id=adk_session_id,
+                new_message=content
+            ):
+                sink.publish_event(event)
+
+        await sink.finalize()
+        await index_for_search(session_id, entry)
+        entry["status"] = "completed"
+        entry["progress"] = "Regeneration complete!"
+
+    except Exception as e:
+        error_message = ledger.exceeded or extract_error_message(e)
+        # The artifacts that were not regenerated are still valid
+        entry["status"] = previous_status
+        entry["error"] = f"Regeneration failed: {error_message}"
+        print(f"Error regenerating content: {error_message}")
+
+        for sub_exc in getattr(e, "exceptions", [e]):
+            record_error("regeneration", sub_exc)
+
+    finally:
+        entry["finished_at"] = time.time()
+        if adk_session_id and session_service:
+            try:
+                await session_service.delete_session(
+                    app_name=APP_NAME,
+                    user_id=user_id,
+                    session_id=adk_session_id,
+                )
+            except Exception as e:
+                print(f"Error cleaning up regeneration session {adk_session_id}: {e}")
+        if session_grant is None:
+            SESSIONS_QUEUED.dec()
+        else:
+            SESSIONS_ACTIVE.dec()
+            session_scheduler.release(session_grant)
+        model_scheduler.release_owner(session_id)
+        current_job.reset(job_token)
+        current_ledger.reset(ledger_token)
+        await asyncio.to_thread(usage_store.save)
+        if entry["status"] != "processing":
+            event = "session.regeneration_failed" if entry["error"] else "session.regenerated"
+            webhooks.notify(
+                session_id, entry, event,
+                subtopic_indexes=[target["subtopic_index"] for target in targets],
+                **session_payload(session_id, entry),
             )
-            
-            # Update content for each subtopic
-            content_list = session_store[session_id].get("content", [])
-            content_updated = False
-            
-            for i in range(1, subtopic_count + 1):
-                idx = i - 1
-                if idx >= len(content_list):
-                    continue
-                
-                # Check for web content
-                web_content = adk_session.state.get(f"webpage_content_{i}", "")
-                if web_content and not content_list[idx].get("webContent"):
-                    content_list[idx]["webContent"] = web_content
-                    content_updated = True
-                    session_store[session_id]["progress"] = f"Generated web content for: {subtopics_list[idx]}"
-                
-                # Check for flashcards
-                flashcards = adk_session.state.get(f"flashcards_{i}", "")
-                if flashcards and not content_list[idx].get("flashcards"):
-                    content_list[idx]["flashcards"] = parse_flashcards(flashcards)
-                    content_updated = True
-                
-                # Check for quiz
-                quiz = adk_session.state.get(f"quiz_{i}", "")
-                if quiz and not content_list[idx].get("quiz"):
-                    content_list[idx]["quiz"] = parse_quiz(quiz)
-                    content_updated = True
-                
-                # Check for podcast
-                podcast_data = adk_session.state.get(f"podcast_content_{i}", {})
-                if podcast_data and not content_list[idx].get("podcast", {}).get("transcript"):
-                    podcast_transcript = ""
-                    if isinstance(podcast_data, dict) and "dialogue" in podcast_data:
-                        for turn in podcast_data.get("dialogue", []):
-                            podcast_transcript += f"{turn.get('speaker', 'Speaker')}: {turn.get('text', '')}\n"
-                    elif isinstance(podcast_data, str):
-                        podcast_transcript = podcast_data
-                    
-                    if podcast_transcript:
-                        content_list[idx]["podcast"]["transcript"] = podcast_transcript
-                        content_list[idx]["podcast"]["audioUrl"] = f"http://localhost:8000/api/podcast/out_{i}.wav"
-                        content_updated = True
-                
-                # Check for images
-                image_url = adk_session.state.get(f"image_url_{i}", "")
-                if image_url and not content_list[idx].get("images"):
-                    content_list[idx]["images"] = [
-                        {"url": f"http://localhost:8000/api/images/image_{i}.jpg", "title": f"{subtopics_list[idx]} Visual"}
-                    ]
-                    content_updated = True
-            
-            if content_updated:
-                session_store[session_id]["content"] = content_list
-                
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            print(f"Error updating content: {e}")
-            continue
+        end_span(regeneration_span, status=entry["status"])
+        current_span.reset(span_token)
+        current_trace.reset(trace_token)
 
 
 def extract_error_message(e):
@@ -363,18 +663,19 @@ def extract_error_message(e):
     def extract_from_exception(exc):
         exc_str = str(exc)
         
-        # Check for known API errors
-        if "503" in exc_str or "overloaded" in exc_str.lower():
+        # Check for known API errors (same categories as the acharya_errors_total metric)
+        category = classify_error(exc)
+        if category == "overloaded":
             return "Gemini API is temporarily overloaded. Please try again in a few minutes."
-        elif "429" in exc_str or "rate limit" in exc_str.lower():
+        elif category == "rate_limited":
             return "API rate limit exceeded. Please wait a moment and try again."
-        elif "401" in exc_str or "unauthorized" in exc_str.lower():
+        elif category == "unauthorized":
             return "API authentication failed. Please check your API key."
-        elif "400" in exc_str or "invalid" in exc_str.lower():
+        elif category == "invalid_request":
             return f"Invalid request: {exc_str[:200]}"
-        elif "timeout" in exc_str.lower():
+        elif category == "timeout":
             return "Request timed out. Please try again."
-        elif "connection" in exc_str.lower():
+        elif category == "connection":
             return "Connection error. Please check your internet connection."
         else:
             # Return a truncated version of the error
@@ -404,175 +705,131 @@ def extract_error_message(e):
         return " | ".join(unique_messages[:3])  # Limit to 3 messages
 
 
-def parse_flashcards(data):
-    """Parse flashcards from Pydantic schema format.
-    
-    Expected format from agent:
-    {
-        "flashcards": [
-            {"question": "...", "answer": "..."},
-            ...
-        ]
+# ==================== API Endpoints ====================
+
+@app.get("/")
+async def root():
+    return {"message": "Welcome to Acharya API", "status": "running"}
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """503 until the agent pipeline and session database are loaded (see ACHARYA_PREWARM)."""
+    if not pipeline.is_ready():
+        raise HTTPException(status_code=503, detail="Pipeline is still loading")
+    return {"status": "ready", **pipeline.stats}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for the generation pipeline."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Admin endpoints profile the process and expose every user's usage, so they need ADMIN_TOKEN."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+
+# Every route on this router requires the admin token
+admin = APIRouter(prefix="/api/admin", dependencies=[Depends(require_admin)])
+
+
+@admin.get("/reaper")
+async def get_reaper_stats():
+    """Report what the session reaper has reclaimed so far."""
+    return {
+        **reaper.stats,
+        "sessions_in_memory": len(session_store),
+        "sessions_in_cold_storage": len(reaper.cold_index),
     }
-    """
-    if not data:
-        return []
-    
-    import json
-    
-    # If it's already a list of flashcard dicts
-    if isinstance(data, list):
-        return data
-    
-    # If it's a dict with 'flashcards' key (Pydantic output)
-    if isinstance(data, dict):
-        flashcards = data.get("flashcards", [])
-        if isinstance(flashcards, list):
-            return flashcards
-        return []
-    
-    # If it's a string (JSON)
-    if isinstance(data, str):
-        try:
-            parsed = json.loads(data)
-            # Handle {"flashcards": [...]} format
-            if isinstance(parsed, dict) and "flashcards" in parsed:
-                return parsed["flashcards"]
-            # Handle direct list format
-            if isinstance(parsed, list):
-                return parsed
-        except:
-            pass
-    
-    return []
 
 
-def parse_quiz(data):
-    """Parse quiz from Pydantic schema format and transform for frontend.
-    
-    Expected format from agent:
-    {
-        "quiz": [
-            {
-                "questions": ["q1", "q2", ...],
-                "options": [["a", "b", "c", "d"], ...],
-                "correct_answers": ["answer1 with explanation", ...]
-            }
-        ]
+@admin.get("/scheduler")
+async def get_scheduler_stats():
+    """Report active and queued sessions and model calls per fairness key."""
+    return {
+        "sessions": session_scheduler.snapshot(),
+        "model_calls": model_scheduler.snapshot(),
     }
-    
-    Output format for frontend:
-    [
-        {
-            "question": "q1",
-            "options": ["a", "b", "c", "d"],
-            "correctIndex": 0  # index of correct answer in options
-        },
-        ...
-    ]
-    """
-    if not data:
-        return []
-    
-    import json
-    
-    # Parse JSON string if needed
-    if isinstance(data, str):
-        try:
-            data = json.loads(data)
-        except:
-            return []
-    
-    # Handle direct list (already parsed format)
-    if isinstance(data, list):
-        # Check if it's already in frontend format
-        if len(data) > 0 and "question" in data[0] and "correctIndex" in data[0]:
-            return data
-        # Otherwise try to parse as quiz schema
-        quiz_data = data
-    # Handle dict with 'quiz' key (Pydantic output)
-    elif isinstance(data, dict):
-        quiz_data = data.get("quiz", [])
-    else:
-        return []
-    
-    # Transform quiz data to frontend format
-    result = []
-    for quiz in quiz_data:
-        if not isinstance(quiz, dict):
-            continue
-            
-        questions = quiz.get("questions", [])
-        options_list = quiz.get("options", [])
-        correct_answers = quiz.get("correct_answers", [])
-        
-        for i, question in enumerate(questions):
-            if i >= len(options_list):
-                continue
-                
-            options = options_list[i]
-            correct_answer = correct_answers[i] if i < len(correct_answers) else ""
-            
-            # Extract correct index and explanation from format like "B) A cell - explanation..."
-            correct_index = 0
-            explanation = correct_answer
-            
-            # Try to extract letter-based answer (A, B, C, D format)
-            if correct_answer:
-                # Match patterns like "A)", "B)", "C)", "D)" at the start
-                letter_match = correct_answer.strip()[:2].upper()
-                letter_map = {"A)": 0, "B)": 1, "C)": 2, "D)": 3, "A:": 0, "B:": 1, "C:": 2, "D:": 3}
-                
-                if letter_match in letter_map:
-                    correct_index = letter_map[letter_match]
-                    # Extract explanation after the dash
-                    if " - " in correct_answer:
-                        explanation = correct_answer.split(" - ", 1)[1].strip()
-                    else:
-                        # Remove the letter prefix for cleaner explanation
-                        explanation = correct_answer[2:].strip()
-                else:
-                    # Fallback: match option text in the answer
-                    for j, opt in enumerate(options):
-                        if opt.lower() in correct_answer.lower():
-                            correct_index = j
-                            break
-            
-            result.append({
-                "question": question,
-                "options": options,
-                "correctIndex": correct_index,
-                "explanation": explanation
-            })
-    
-    return result
 
 
-def parse_images(data):
-    """Parse images from various formats."""
-    if not data:
-        return []
-    
-    if isinstance(data, list):
-        return [{"url": img, "title": f"Image {i+1}"} if isinstance(img, str) else img for i, img in enumerate(data)]
-    
-    if isinstance(data, str):
-        # Single URL
-        return [{"url": data, "title": "Image"}]
-    
-    return []
+@admin.get("/course-cache")
+async def get_course_cache_stats():
+    """Report course cache hits and contents, and what the warmer has generated and spent today."""
+    return {
+        "enabled": COURSE_CACHE_ENABLED,
+        **course_cache.stats,
+        "courses": len(course_cache.courses),
+        "subtopics": {**course_cache.subtopics.stats, "indexed_subtopics": len(course_cache.subtopics.entries),
+                      "reuse_enabled": SUBTOPIC_REUSE_ENABLED},
+        "warmer": {**cache_warmer.stats, "running": cache_warmer.running, "spend": course_cache.spend},
+        "candidates": cache_warmer.candidates(),
+    }
 
 
-# ==================== API Endpoints ====================
+@admin.post("/course-cache/warm")
+async def warm_course_cache(background_tasks: BackgroundTasks):
+    """Warm the course cache now, outside the off-peak windows but within the daily budget."""
+    if cache_warmer.running:
+        raise HTTPException(status_code=409, detail="The cache warmer is already running")
+    background_tasks.add_task(cache_warmer.warm_once)
+    return {"status": "started", "candidates": cache_warmer.candidates()}
 
-@app.get("/")
-async def root():
-    return {"message": "Welcome to Acharya API", "status": "running"}
 
+@admin.get("/usage")
+async def get_usage_stats(days: int = 7):
+    """Report tokens and estimated cost per user (or tenant) for the last days."""
+    return {"days": usage_store.report(max(1, min(days, 90)))}
 
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+
+@admin.get("/loop")
+async def get_loop_stats():
+    """Report event-loop lag and the stacks of recent stalls."""
+    return {
+        "enabled": LOOP_MONITOR_ENABLED,
+        "threshold_ms": loop_monitor.threshold * 1000,
+        **loop_monitor.stats,
+        "recent_stalls": list(loop_monitor.recent_stalls),
+    }
+
+
+@admin.get("/process-pool")
+async def get_process_pool_stats():
+    """Report the CPU-bound tasks run in the process pool, and how many are pending."""
+    return {
+        "workers": process_pool.workers,
+        "timeout_seconds": process_pool.timeout,
+        **process_pool.stats,
+    }
+
+
+@admin.get("/profile", response_class=PlainTextResponse)
+async def get_profile(seconds: float = 10, rate: int = 100, loop_only: bool = False):
+    """
+    Sample the stacks of the running server for a few seconds (at most 60).
+    Returns folded stacks ("frame;frame;... count") for flamegraph.pl, speedscope or inferno.
+    loop_only samples just the event-loop thread.
+    """
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with profile_lock:
+        # Sampling runs in a worker thread so the loop keeps serving requests while it is profiled
+        thread_id = threading.get_ident() if loop_only else None
+        return await asyncio.to_thread(sample_profile, seconds, rate, thread_id)
+
+
+app.include_router(admin)
 
 
 @app.post("/api/generate", response_model=SessionResponse)
@@ -584,14 +841,43 @@ async def start_content_generation(request: TopicRequest, background_tasks: Back
     if not request.topic or not request.topic.strip():
         raise HTTPException(status_code=400, detail="Topic cannot be empty")
 
+    if request.callback_url:
+        try:
+            await asyncio.to_thread(validate_callback_url, request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     session_id = str(uuid.uuid4())
+    topic = request.topic.strip()
+    over_budget = usage_store.over_budget(fairness_key(request.user_id, request.tenant_id))
+
+    if COURSE_CACHE_ENABLED:
+        course_cache.record_request(topic)
+        course = None if request.fresh else await asyncio.to_thread(course_cache.get, topic)
+        if course is not None:
+            entry = cached_session_entry(session_id, course, request.user_id, request.tenant_id, request.callback_url)
+            session_store[session_id] = entry
+            webhooks.notify(session_id, entry, "session.completed", **session_payload(session_id, entry))
+            return SessionResponse(
+                session_id=session_id,
+                status="completed",
+                message=f"Content for topic: {request.topic} served from the course cache"
+            )
     
+    # Cached courses cost nothing, but nothing new is generated once the daily budget is used up
+    if over_budget:
+        raise HTTPException(status_code=429, detail=over_budget)
+
     # Start background task
+    SESSIONS_QUEUED.inc()
     background_tasks.add_task(
         generate_content,
         session_id,
-        request.topic.strip(),
-        request.user_id
+        topic,
+        request.user_id,
+        request.tenant_id,
+        request.callback_url,
+        not request.fresh,
     )
 
     return SessionResponse(
@@ -601,46 +887,185 @@ async def start_content_generation(request: TopicRequest, background_tasks: Back
     )
 
 
+@app.post("/api/sessions/{session_id}/regenerate", response_model=SessionResponse)
+async def start_regeneration(session_id: str, request: RegenerationRequest, background_tasks: BackgroundTasks):
+    """
+    Regenerate selected artifacts of selected subtopics, or replace subtopics, of a finished session.
+    For example {"targets": [{"subtopic_index": 3, "artifacts": ["quiz"]},
+    {"subtopic_index": 6, "subtopic": "New subtopic"}]}. Only the agents that produce the
+    selected artifacts run; poll /api/status until the session is completed again.
+    """
+    if session_id not in session_store and await reaper.load_cold(session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    entry = session_store[session_id]
+    if entry["status"] == "processing":
+        raise HTTPException(status_code=409, detail="Session is still generating")
+    if not request.targets:
+        raise HTTPException(status_code=400, detail="No targets to regenerate")
+
+    targets = []
+    for target in request.targets:
+        slot = target.subtopic_index
+        if not 0 <= slot < len(entry["content"]):
+            raise HTTPException(status_code=400, detail=f"Invalid subtopic_index: {slot}")
+        if any(t["subtopic_index"] == slot for t in targets):
+            raise HTTPException(status_code=400, detail=f"Subtopic {slot} is targeted more than once")
+
+        subtopic = target.subtopic.strip() if target.subtopic else None
+        artifacts = target.artifacts
+        # Everything else is derived from the webpage, so a new page or subtopic regenerates it all
+        if subtopic or not artifacts or "webContent" in artifacts:
+            artifacts = None
+        elif not entry["content"][slot]["webContent"]:
+            raise HTTPException(status_code=400, detail=f"Subtopic {slot} has no web content to regenerate from")
+        targets.append({"subtopic_index": slot, "artifacts": artifacts, "subtopic": subtopic})
+
+    user_id = entry.get("user_id") or "default_user"
+    over_budget = usage_store.over_budget(fairness_key(user_id, entry.get("tenant_id")))
+    if over_budget:
+        raise HTTPException(status_code=429, detail=over_budget)
+
+    # Marked before returning, so a second request cannot start a concurrent regeneration
+    entry["previous_status"] = entry["status"]
+    entry["status"] = "processing"
+    entry["error"] = None
+    entry["progress"] = "Waiting for a free generation slot..."
+
+    SESSIONS_QUEUED.inc()
+    background_tasks.add_task(
+        regenerate_content,
+        session_id,
+        targets,
+        user_id,
+        entry.get("tenant_id"),
+    )
+
+    return SessionResponse(
+        session_id=session_id,
+        status="processing",
+        message=f"Regeneration started for {len(targets)} subtopic(s)"
+    )
+
+
 @app.get("/api/status/{session_id}", response_model=ContentResponse)
-async def get_generation_status(session_id: str):
+async def get_generation_status(session_id: str, request: Request):
     """
     Get the status and results of content generation.
     Poll this endpoint until status is 'completed' or 'error'.
+    The body is encoded once per content version and served from a snapshot until it changes.
     """
-    if session_id not in session_store:
+    if session_id not in session_store and await reaper.load_cold(session_id) is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    data = session_store[session_id]
-    
-    return ContentResponse(
-        session_id=session_id,
-        status=data["status"],
-        topic=data["topic"],
-        subtopics=data["subtopics"],
-        content=data["content"],
-        error=data.get("error")
-    )
+    snapshot = get_status_snapshot(session_id, session_store[session_id])
+    headers = {"ETag": snapshot.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get("accept-encoding"), len(snapshot.body))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=snapshot.encode(encoding), media_type="application/json", headers=headers)
 
 
 @app.get("/api/progress/{session_id}")
 async def get_progress(session_id: str):
-    """Get generation progress for UI updates."""
-    if session_id not in session_store:
+    """Get generation progress and token usage for UI updates."""
+    if session_id not in session_store and await reaper.load_cold(session_id) is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
     data = session_store[session_id]
     return {
         "status": data["status"],
         "progress": data.get("progress", ""),
-        "subtopics_count": len(data["subtopics"])
+        "subtopics_count": len(data["subtopics"]),
+        # Tokens and estimated cost so far, per agent role and model, and the budget state
+        "usage": data.get("usage"),
     }
 
 
+@app.get("/api/sessions/{session_id}/timeline")
+async def get_timeline(session_id: str, format: str = "waterfall"):
+    """
+    Get the trace of a session: every stage, agent, model call, tool call and sleep.
+    format=waterfall (default) returns offsets, durations and the critical path;
+    format=otlp returns OpenTelemetry OTLP/JSON for import into a tracing backend.
+    """
+    if session_id not in session_store and await reaper.load_cold(session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    trace = session_store[session_id].get("trace")
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No timeline recorded for this session")
+
+    if format == "otlp":
+        return to_otlp(trace)
+    if format != "waterfall":
+        raise HTTPException(status_code=400, detail="format must be 'waterfall' or 'otlp'")
+    return waterfall(trace)
+
+
+@app.get("/api/sessions/{session_id}/export")
+async def export_course(session_id: str):
+    """
+    Download a finished course as a zip archive: manifest.json, and per subtopic its webpage,
+    flashcards, quiz, podcast transcript and audio, and images.
+    The archive is streamed as it is built, so large courses do not have to fit in memory.
+    """
+    if session_id not in session_store and await reaper.load_cold(session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    entry = session_store[session_id]
+    if entry["status"] == "processing":
+        raise HTTPException(status_code=409, detail="Content is still being generated")
+    if not entry["content"]:
+        raise HTTPException(status_code=404, detail="Session has no content to export")
+
+    # A plain iterator, so Starlette reads the files and compresses in its thread pool
+    return StreamingResponse(
+        course_archive(session_id, entry),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name(entry)}"'},
+    )
+
+
+@app.get("/api/search")
+async def search_content(q: str, kind: Optional[str] = None, page: int = 1, page_size: int = 10):
+    """
+    Search every generated webpage, flashcard set, quiz and podcast transcript, best match first.
+    kind is a comma-separated filter (webpage, flashcards, quiz, podcast); snippets are HTML-escaped
+    text with the matched words in <mark>.
+    """
+    if search_index is None:
+        raise HTTPException(status_code=404, detail="Search is disabled on this server")
+    kinds = [k.strip() for k in kind.split(",") if k.strip()] if kind else None
+    if kinds and not set(kinds) <= set(DOCUMENT_KINDS):
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(DOCUMENT_KINDS)}")
+    if page < 1 or not 1 <= page_size <= 50:
+        raise HTTPException(status_code=400, detail="page must be at least 1 and page_size between 1 and 50")
+
+    found = await asyncio.to_thread(search_index.search, q, kinds, page_size, (page - 1) * page_size)
+    return {"query": q, "page": page, "page_size": page_size, **found}
+
+
+@app.get("/api/search/documents/{document_id}")
+async def get_search_document(document_id: int):
+    """Full text of a search result, also after its session has been reaped."""
+    if search_index is None:
+        raise HTTPException(status_code=404, detail="Search is disabled on this server")
+    document = await asyncio.to_thread(search_index.get, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+
 # Serve podcast audio files from the podcasts folder
 @app.get("/api/podcast/{filename}")
 async def get_podcast(filename: str):
-    # Use absolute path to the podcasts folder
-    podcast_path = Path(r"C:\Users\DELL\OneDrive\Desktop\Project\Hackathons\Acharya\podcasts") / filename
+    podcast_path = PODCAST_DIR / filename
     if podcast_path.exists():
         # WAV files need audio/wav media type
         return FileResponse(podcast_path, media_type="audio/wav")
@@ -650,19 +1075,22 @@ async def get_podcast(filename: str):
 # Serve images from the images folder
 @app.get("/api/images/{filename}")
 async def get_image(filename: str):
-    # Use absolute path to the images folder
-    image_path = Path(r"C:\Users\DELL\OneDrive\Desktop\Project\Hackathons\Acharya\images") / filename
+    image_path = IMAGE_DIR / filename
     if image_path.exists():
         return FileResponse(image_path, media_type="image/jpeg")
     raise HTTPException(status_code=404, detail=f"Image not found: {filename}")
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        app, 
-        host="0.0.0.0", 
-        port=8000,
-        timeout_keep_alive=1200,  # 20 minutes keep-alive timeout
-    )
+    # Serve the app by import string under `python -m uvicorn` rather than from this script. Process
+    # pool workers are spawned, and spawn re-runs the main script in every worker (as __mp_main__),
+    # which would build another course cache, search index, usage store and reaper in each of them.
+    # uvicorn's __main__ module is not re-run.
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "api_server:app",
+        "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+        "--host", "0.0.0.0",
+        "--port", "8000",
+        "--timeout-keep-alive", "1200",  # 20 minutes keep-alive timeout
+    ])
 
@@ -0,0 +1,149 @@
+"""
+End-to-end benchmark of generate_content on a recorded cassette.
+Measures course latency, model/tool calls per course and peak memory without network access.
+
+Record a cassette once (needs GOOGLE_API_KEY and SERPAPI_API_KEY):
+    python benchmarks/bench_pipeline.py --record --topic "The World Wide Web"
+Replay it offline:
+    python benchmarks/bench_pipeline.py --runs 3
+    python benchmarks/bench_pipeline.py --runs 3 --latency-scale 1 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CASSETTE = ROOT / "benchmarks" / "cassettes" / "pipeline.json.gz"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Acharya pipeline on a recorded cassette")
+    parser.add_argument("--topic", default="The World Wide Web")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--record", action="store_true", help="call the live APIs and record a cassette")
+    parser.add_argument("--cassette", type=Path, default=DEFAULT_CASSETTE)
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="replayed latency as a fraction of the recorded latency (0 = no latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of replayed calls failing with 429/503")
+    parser.add_argument("--throttle-scale", type=float, default=None,
+                        help="scale of the pipeline's deliberate sleeps (default 1 when recording, 0 when replaying)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    return parser.parse_args()
+
+
+def configure_environment(args, workdir: Path) -> None:
+    """Settings are read at import time, so they are set before the pipeline is imported."""
+    throttle_scale = args.throttle_scale if args.throttle_scale is not None else (1.0 if args.record else 0.0)
+    os.environ.update({
+        "ACHARYA_CASSETTE_MODE": "record" if args.record else "replay",
+        "ACHARYA_CASSETTE": str(args.cassette),
+        "ACHARYA_REPLAY_LATENCY_SCALE": str(args.latency_scale),
+        "ACHARYA_REPLAY_ERROR_RATE": str(args.error_rate),
+        "ACHARYA_REPLAY_SEED": str(args.seed),
+        "ACHARYA_THROTTLE_SCALE": str(throttle_scale),
+        # Keep the benchmark's database, artifacts and cold storage out of the working tree
+        "ACHARYA_DB_URL": f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+        "ACHARYA_PODCAST_DIR": str(workdir / "podcasts"),
+        "ACHARYA_IMAGE_DIR": str(workdir / "images"),
+        "ACHARYA_COLD_STORAGE_DIR": str(workdir / "cold_storage"),
+        "ACHARYA_SEARCH_DB": str(workdir / "search_index.db"),
+        "ACHARYA_USAGE_FILE": str(workdir / "usage.json"),
+        # Every run must go through the pipeline, not the course cache or subtopic reuse, with
+        # prompts that match the cassette (no existing material from earlier runs)
+        "ACHARYA_COURSE_CACHE": "0",
+        "ACHARYA_EXISTING_MATERIAL_LIMIT": "0",
+        "ACHARYA_COURSE_CACHE_DIR": str(workdir / "course_cache"),
+    })
+    sys.path.insert(0, str(ROOT))
+
+
+def time_by_kind(trace) -> dict:
+    """Total seconds of the finished spans of a trace, by span kind."""
+    totals = {}
+    for span in trace.spans:
+        if span["end"] is not None:
+            totals[span["kind"]] = totals.get(span["kind"], 0) + (span["end"] - span["start"]) / 1e9
+    return {kind: round(seconds, 3) for kind, seconds in totals.items()}
+
+
+async def run_course(api_server, cassette, topic: str) -> dict:
+    session_id = f"bench-{uuid.uuid4()}"
+    calls_before = dict(cassette.stats["calls"])
+
+    # generate_content expects to be queued by the /api/generate endpoint
+    api_server.SESSIONS_QUEUED.inc()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    await api_server.generate_content(session_id, topic, "bench_user")
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+
+    entry = api_server.session_store[session_id]
+    calls = {kind: count - calls_before.get(kind, 0) for kind, count in cassette.stats["calls"].items()}
+    return {
+        "status": entry["status"],
+        "error": entry.get("error"),
+        "seconds": round(seconds, 3),
+        "subtopics": len(entry["subtopics"]),
+        "calls": calls,
+        "peak_traced_mb": round(peak / 1e6, 1),
+        "time_by_kind": time_by_kind(entry["trace"]),
+    }
+
+
+async def main():
+    args = parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="acharya-bench-"))
+    configure_environment(args, workdir)
+
+    import api_server
+    from teacher_agent.cassette import cassette, save_cassette
+
+    if not args.record and not args.cassette.exists():
+        sys.exit(f"No cassette at {args.cassette}; record one first with --record")
+
+    tracemalloc.start()
+    results = []
+    for run in range(args.runs):
+        result = await run_course(api_server, cassette, args.topic)
+        results.append(result)
+        print(f"run {run + 1}: {result['status']} in {result['seconds']}s, {result['subtopics']} subtopics, "
+              f"calls {result['calls']}, peak {result['peak_traced_mb']} MB, time by kind {result['time_by_kind']}")
+        if result["error"]:
+            print(f"  error: {result['error']}")
+
+    if args.record:
+        save_cassette()
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    max_rss_mb = max_rss / 1e6 if sys.platform == "darwin" else max_rss / 1e3
+    seconds = sorted(result["seconds"] for result in results)
+    summary = {
+        "topic": args.topic,
+        "runs": len(results),
+        "completed": sum(result["status"] == "completed" for result in results),
+        "median_seconds": seconds[len(seconds) // 2],
+        "max_seconds": seconds[-1],
+        "max_rss_mb": round(max_rss_mb, 1),
+        "injected_errors": cassette.stats["injected_errors"],
+        "cassette_misses": cassette.stats["misses"],
+        "results": results,
+    }
+    print(json.dumps({key: value for key, value in summary.items() if key != "results"}, indent=2))
+
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Cold-start benchmark for api_server.
+Measures the time to import api_server in a fresh interpreter (with the slowest modules from
+-X importtime), the time until a spawned server answers /health, and until /ready reports the
+pre-warmed pipeline as loaded.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --max-import-seconds 1.5   # fails on a regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark api_server cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--top", type=int, default=10, help="slowest imported modules to list")
+    parser.add_argument("--max-import-seconds", type=float, help="exit with status 1 if the median import is slower")
+    parser.add_argument("--skip-server", action="store_true", help="only measure the import")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    return parser.parse_args()
+
+
+def isolated_env() -> dict:
+    # A throwaway database and folders, so the benchmark does not touch the working tree
+    workdir = Path(tempfile.mkdtemp(prefix="acharya-startup-"))
+    env = dict(os.environ)
+    env.update({
+        "ACHARYA_DB_URL": f"sqlite+aiosqlite:///{workdir / 'startup.db'}",
+        "ACHARYA_PODCAST_DIR": str(workdir / "podcasts"),
+        "ACHARYA_IMAGE_DIR": str(workdir / "images"),
+        "ACHARYA_COLD_STORAGE_DIR": str(workdir / "cold_storage"),
+        "ACHARYA_SEARCH_DB": str(workdir / "search_index.db"),
+        "ACHARYA_USAGE_FILE": str(workdir / "usage.json"),
+        "ACHARYA_COURSE_CACHE_DIR": str(workdir / "course_cache"),
+    })
+    return env
+
+
+def measure_import(env: dict) -> tuple:
+    """Returns the wall time of importing api_server and the -X importtime report."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api_server"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"Importing api_server failed:\n{result.stderr[-2000:]}")
+    return seconds, result.stderr
+
+
+def slowest_modules(importtime_report: str, top: int) -> list:
+    """Parses the "import time: self [us] | cumulative | imported package" lines."""
+    modules = []
+    for line in importtime_report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((int(cumulative_us), name.strip()))
+    modules.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in modules[:top]]
+
+
+def wait_for(url: str, timeout: float) -> float:
+    """Polls url until it answers 200 and returns the elapsed seconds."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def measure_server(env: dict, port: int) -> dict:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_for(f"http://127.0.0.1:{port}/health", timeout=120)
+        health_seconds = time.perf_counter() - start
+        # /ready answers 503 until the pre-warmed pipeline has loaded
+        wait_for(f"http://127.0.0.1:{port}/ready", timeout=300)
+        ready_seconds = time.perf_counter() - start
+        return {"health_seconds": round(health_seconds, 3), "ready_seconds": round(ready_seconds, 3)}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    args = parse_args()
+    env = isolated_env()
+
+    import_seconds = []
+    report = ""
+    for _ in range(args.runs):
+        seconds, report = measure_import(env)
+        import_seconds.append(seconds)
+
+    results = {
+        "import_median_seconds": round(statistics.median(import_seconds), 3),
+        "import_max_seconds": round(max(import_seconds), 3),
+        "slowest_modules": slowest_modules(report, args.top),
+    }
+    if not args.skip_server:
+        results["server"] = [measure_server(env, args.port) for _ in range(args.runs)]
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    if args.max_import_seconds is not None and results["import_median_seconds"] > args.max_import_seconds:
+        print(f"Median import time {results['import_median_seconds']}s exceeds {args.max_import_seconds}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
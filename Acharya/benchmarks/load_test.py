@@ -0,0 +1,300 @@
+"""
+HTTP load test for api_server with simulated learners.
+Each virtual user behaves like the frontend: startGeneration, then pollForCompletion every 3s,
+then fetches the podcast audio and images of the finished course, and starts over.
+
+Against a replay-backed server started by the harness (needs a recorded cassette, see
+bench_pipeline.py):
+    python benchmarks/load_test.py --spawn --users 50 --ramp-seconds 60 --duration 600
+Against a running server:
+    python benchmarks/load_test.py --url http://localhost:8000 --server-pid 12345 --users 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CASSETTE = ROOT / "benchmarks" / "cassettes" / "pipeline.json.gz"
+
+# Same interval and timeout as pollForCompletion in frontend/src/services/api.js
+POLL_INTERVAL = 3.0
+COURSE_TIMEOUT = 1200.0
+# Browsers accept compressed responses, so the load test exercises the compressed status path
+# (httpx can only decode Brotli when the brotli package is installed)
+try:
+    import brotli  # noqa: F401
+    BROWSER_HEADERS = {"Accept-Encoding": "gzip, deflate, br"}
+except ImportError:
+    BROWSER_HEADERS = {"Accept-Encoding": "gzip, deflate"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test api_server with simulated learners")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--spawn", action="store_true", help="start a replay-backed api_server for the test")
+    parser.add_argument("--port", type=int, default=8765, help="port of the spawned server")
+    parser.add_argument("--cassette", type=Path, default=DEFAULT_CASSETTE)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="replayed latency of the spawned server")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="injected 429/503 rate of the spawned server")
+    parser.add_argument("--server-pid", type=int, help="pid of a running server, to sample its memory")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--ramp-seconds", type=float, default=30.0)
+    parser.add_argument("--duration", type=float, default=300.0, help="seconds to keep starting new courses")
+    parser.add_argument("--think-seconds", type=float, default=10.0, help="pause between a user's courses")
+    parser.add_argument("--topics", nargs="+", default=["The World Wide Web"])
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    return parser.parse_args()
+
+
+class Recorder:
+    """Collects request latencies, errors and course outcomes."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.courses = []
+        self.probe_latencies = []
+        self.memory_samples = []
+
+    def request(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def percentiles(values: list, unit: str = "ms") -> dict:
+    """Summarizes durations in seconds as percentiles in ms (or s)."""
+    if not values:
+        return {}
+    values = sorted(values)
+    scale = 1000 if unit == "ms" else 1
+
+    def at(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * scale, 1)
+
+    return {
+        "count": len(values),
+        f"p50_{unit}": at(0.5),
+        f"p90_{unit}": at(0.9),
+        f"p99_{unit}": at(0.99),
+        f"max_{unit}": round(values[-1] * scale, 1),
+    }
+
+
+async def timed_request(client: httpx.AsyncClient, recorder: Recorder, endpoint: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.request(endpoint, time.perf_counter() - start, ok=False)
+        return None
+    recorder.request(endpoint, time.perf_counter() - start, ok=response.status_code < 400)
+    return response
+
+
+async def run_course(client: httpx.AsyncClient, recorder: Recorder, base_url: str, topic: str, user_id: str) -> None:
+    start = time.perf_counter()
+    response = await timed_request(client, recorder, "generate", "POST", f"{base_url}/api/generate",
+                                   json={"topic": topic, "user_id": user_id})
+    if response is None or response.status_code >= 400:
+        recorder.courses.append({"status": "rejected", "seconds": time.perf_counter() - start})
+        return
+    session_id = response.json()["session_id"]
+
+    status = None
+    while time.perf_counter() - start < COURSE_TIMEOUT:
+        response = await timed_request(client, recorder, "status", "GET", f"{base_url}/api/status/{session_id}",
+                                       headers=BROWSER_HEADERS)
+        if response is not None and response.status_code == 200:
+            status = response.json()
+            if status["status"] in ("completed", "error"):
+                break
+        await asyncio.sleep(POLL_INTERVAL)
+
+    seconds = time.perf_counter() - start
+    if status is None or status["status"] not in ("completed", "error"):
+        recorder.courses.append({"status": "timeout", "seconds": seconds})
+        return
+    recorder.courses.append({"status": status["status"], "seconds": seconds})
+
+    # The frontend loads the audio and images of every subtopic once the course is shown
+    for slot in status["content"]:
+        urls = [("podcast", slot.get("podcast", {}).get("audioUrl"))]
+        urls += [("image", image.get("url")) for image in slot.get("images", [])]
+        for endpoint, url in urls:
+            if url:
+                # Artifact URLs point at the server's configured base URL; keep only the path
+                await timed_request(client, recorder, endpoint, "GET", f"{base_url}{urlparse(url).path}")
+
+
+async def virtual_user(index: int, args, recorder: Recorder, base_url: str, deadline: float) -> None:
+    await asyncio.sleep(args.ramp_seconds * index / max(args.users, 1))
+    rng = random.Random(index)
+    limits = httpx.Limits(max_connections=4)
+    async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+        while time.perf_counter() < deadline:
+            await run_course(client, recorder, base_url, rng.choice(args.topics), f"load_user_{index}")
+            await asyncio.sleep(args.think_seconds)
+
+
+async def probe_event_loop(recorder: Recorder, base_url: str, stop: asyncio.Event) -> None:
+    """/health does no work, so its latency approximates the server's event-loop lag."""
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                await client.get(f"{base_url}/health")
+                recorder.probe_latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                recorder.errors["health_probe"] = recorder.errors.get("health_probe", 0) + 1
+            await asyncio.sleep(0.5)
+
+
+def read_rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_memory(recorder: Recorder, pid, stop: asyncio.Event) -> None:
+    if pid is None:
+        return
+    while not stop.is_set():
+        rss = read_rss_mb(pid)
+        if rss is not None:
+            recorder.memory_samples.append((time.perf_counter(), rss))
+        await asyncio.sleep(2.0)
+
+
+def spawn_server(args) -> subprocess.Popen:
+    workdir = Path(tempfile.mkdtemp(prefix="acharya-load-"))
+    env = dict(os.environ)
+    env.update({
+        "ACHARYA_CASSETTE_MODE": "replay",
+        "ACHARYA_CASSETTE": str(args.cassette),
+        "ACHARYA_REPLAY_LATENCY_SCALE": str(args.latency_scale),
+        "ACHARYA_REPLAY_ERROR_RATE": str(args.error_rate),
+        "ACHARYA_THROTTLE_SCALE": env.get("ACHARYA_THROTTLE_SCALE", "0"),
+        "ACHARYA_DB_URL": f"sqlite+aiosqlite:///{workdir / 'load.db'}",
+        "ACHARYA_PODCAST_DIR": str(workdir / "podcasts"),
+        "ACHARYA_IMAGE_DIR": str(workdir / "images"),
+        "ACHARYA_COLD_STORAGE_DIR": str(workdir / "cold_storage"),
+        "ACHARYA_SEARCH_DB": str(workdir / "search_index.db"),
+        "ACHARYA_USAGE_FILE": str(workdir / "usage.json"),
+        # Every run must go through the pipeline, not the course cache or subtopic reuse, with
+        # prompts that match the cassette (no existing material from earlier runs)
+        "ACHARYA_COURSE_CACHE": "0",
+        "ACHARYA_EXISTING_MATERIAL_LIMIT": "0",
+        "ACHARYA_COURSE_CACHE_DIR": str(workdir / "course_cache"),
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+
+def build_report(args, recorder: Recorder, wall_seconds: float) -> dict:
+    total_requests = sum(len(values) for values in recorder.latencies.values())
+    total_errors = sum(recorder.errors.values())
+    completed = [course["seconds"] for course in recorder.courses if course["status"] == "completed"]
+    outcomes = {}
+    for course in recorder.courses:
+        outcomes[course["status"]] = outcomes.get(course["status"], 0) + 1
+
+    memory = {}
+    if recorder.memory_samples:
+        rss = [sample for _, sample in recorder.memory_samples]
+        elapsed_minutes = max((recorder.memory_samples[-1][0] - recorder.memory_samples[0][0]) / 60, 1e-9)
+        memory = {
+            "start_mb": round(rss[0], 1),
+            "end_mb": round(rss[-1], 1),
+            "peak_mb": round(max(rss), 1),
+            "growth_mb_per_minute": round((rss[-1] - rss[0]) / elapsed_minutes, 2),
+        }
+
+    return {
+        "users": args.users,
+        "wall_seconds": round(wall_seconds, 1),
+        "requests": total_requests,
+        "requests_per_second": round(total_requests / max(wall_seconds, 1e-9), 2),
+        "error_rate": round(total_errors / max(total_requests, 1), 4),
+        "errors": recorder.errors,
+        "latency": {endpoint: percentiles(values) for endpoint, values in recorder.latencies.items()},
+        "event_loop_probe": percentiles(recorder.probe_latencies),
+        "courses": outcomes,
+        "course_seconds": percentiles(completed, unit="s"),
+        "server_memory": memory,
+    }
+
+
+async def main():
+    args = parse_args()
+    server = None
+    base_url = args.url.rstrip("/")
+    pid = args.server_pid
+
+    if args.spawn:
+        if not args.cassette.exists():
+            sys.exit(f"No cassette at {args.cassette}; record one first with bench_pipeline.py --record")
+        server = spawn_server(args)
+        base_url = f"http://127.0.0.1:{args.port}"
+        pid = server.pid
+
+    try:
+        await wait_until_healthy(base_url)
+        recorder = Recorder()
+        stop = asyncio.Event()
+        background = [
+            asyncio.create_task(probe_event_loop(recorder, base_url, stop)),
+            asyncio.create_task(sample_memory(recorder, pid, stop)),
+        ]
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(virtual_user(i, args, recorder, base_url, deadline) for i in range(args.users)))
+        wall_seconds = time.perf_counter() - start
+
+        stop.set()
+        await asyncio.gather(*background)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = build_report(args, recorder, wall_seconds)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
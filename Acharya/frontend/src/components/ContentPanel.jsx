@@ -29,7 +29,7 @@ const ContentPanel = ({ subtopic, data, subtopicIndex, isGenerating }) => {
     const renderContent = () => {
         switch (activeSection) {
             case 'web':
-                return <WebContent content={data?.webContent} isLoading={isGenerating && !hasContent.web} />;
+                return <WebContent content={data?.webContent} html={data?.webHtml} toc={data?.webToc} isLoading={isGenerating && !hasContent.web} />;
             case 'flashcards':
                 return <Flashcards cards={data?.flashcards} />;
             case 'quiz':
@@ -39,7 +39,7 @@ const ContentPanel = ({ subtopic, data, subtopicIndex, isGenerating }) => {
             case 'images':
                 return <ImageGallery images={data?.images} />;
             default:
-                return <WebContent content={data?.webContent} isLoading={isGenerating && !hasContent.web} />;
+                return <WebContent content={data?.webContent} html={data?.webHtml} toc={data?.webToc} isLoading={isGenerating && !hasContent.web} />;
         }
     };
 
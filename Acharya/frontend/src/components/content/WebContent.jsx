@@ -1,6 +1,9 @@
-import ReactMarkdown from 'react-markdown';
+import { lazy, Suspense } from 'react';
 import './WebContent.css';
 
+// Only needed for pages the server has not rendered, so it stays out of the main bundle
+const ReactMarkdown = lazy(() => import('react-markdown'));
+
 // Process content to style inline citations like [1], [2], etc.
 const formatCitations = (text) => {
     if (typeof text !== 'string') return text;
@@ -9,7 +12,30 @@ const formatCitations = (text) => {
     return text.replace(/\[(\d+)\]/g, '<cite class="citation">[$1]</cite>');
 };
 
-const WebContent = ({ content, isLoading }) => {
+// Table of contents of the headings of a server-rendered page
+const TableOfContents = ({ toc }) => {
+    if (!toc || toc.length < 2) return null;
+
+    const scrollTo = (event, id) => {
+        event.preventDefault();
+        document.getElementById(id)?.scrollIntoView({ behavior: 'smooth', block: 'start' });
+    };
+
+    return (
+        <nav className="web-toc" aria-label="Contents">
+            <span className="web-toc-title">Contents</span>
+            <ul>
+                {toc.map((entry) => (
+                    <li key={entry.id} className={`web-toc-item level-${entry.level}`}>
+                        <a href={`#${entry.id}`} onClick={(event) => scrollTo(event, entry.id)}>{entry.title}</a>
+                    </li>
+                ))}
+            </ul>
+        </nav>
+    );
+};
+
+const WebContent = ({ content, html, toc, isLoading }) => {
     if (!content && !isLoading) {
         return (
             <div className="web-content-empty">
@@ -38,6 +64,19 @@ const WebContent = ({ content, isLoading }) => {
         );
     }
 
+    // Sanitized HTML rendered once by the server (services/rendering.py)
+    if (html) {
+        return (
+            <div className="web-content">
+                <TableOfContents toc={toc} />
+                <article
+                    className={`web-article ${html.includes('sources-header') ? 'has-sources' : ''}`}
+                    dangerouslySetInnerHTML={{ __html: html }}
+                />
+            </div>
+        );
+    }
+
     // Check if content has a Sources section
     const hasSourcesSection = content && (
         content.includes('## Sources') ||
@@ -49,51 +88,53 @@ const WebContent = ({ content, isLoading }) => {
     return (
         <div className="web-content">
             <article className={`web-article ${hasSourcesSection ? 'has-sources' : ''}`}>
-                <ReactMarkdown
-                    components={{
-                        // Custom styling for markdown elements
-                        h1: ({ children }) => <h1 className="md-h1">{children}</h1>,
-                        h2: ({ children }) => {
-                            const text = children?.toString() || '';
-                            const isSourcesHeader = text.toLowerCase().includes('sources') || text.toLowerCase().includes('references');
-                            return <h2 className={`md-h2 ${isSourcesHeader ? 'sources-header' : ''}`}>{children}</h2>;
-                        },
-                        h3: ({ children }) => {
-                            const text = children?.toString() || '';
-                            const isSourcesHeader = text.toLowerCase().includes('sources') || text.toLowerCase().includes('references');
-                            return <h3 className={`md-h3 ${isSourcesHeader ? 'sources-header' : ''}`}>{children}</h3>;
-                        },
-                        h4: ({ children }) => <h4 className="md-h4">{children}</h4>,
-                        p: ({ children }) => (
-                            <p
-                                className="md-paragraph"
-                                dangerouslySetInnerHTML={{
-                                    __html: formatCitations(
-                                        typeof children === 'string' ? children :
-                                            Array.isArray(children) ? children.map(c => typeof c === 'string' ? c : '').join('') : ''
-                                    ) || ''
-                                }}
-                            />
-                        ),
-                        ul: ({ children }) => <ul className="md-list">{children}</ul>,
-                        ol: ({ children }) => <ol className="md-list ordered">{children}</ol>,
-                        li: ({ children }) => <li className="md-list-item">{children}</li>,
-                        strong: ({ children }) => <strong className="md-bold">{children}</strong>,
-                        em: ({ children }) => <em className="md-italic">{children}</em>,
-                        blockquote: ({ children }) => <blockquote className="md-quote">{children}</blockquote>,
-                        code: ({ inline, children }) =>
-                            inline
-                                ? <code className="md-inline-code">{children}</code>
-                                : <pre className="md-code-block"><code>{children}</code></pre>,
-                        a: ({ href, children }) => (
-                            <a href={href} target="_blank" rel="noopener noreferrer" className="md-link">
-                                {children}
-                            </a>
-                        ),
-                    }}
-                >
-                    {content}
-                </ReactMarkdown>
+                <Suspense fallback={<div className="loading-skeleton"><div className="skeleton-line"></div></div>}>
+                    <ReactMarkdown
+                        components={{
+                            // Custom styling for markdown elements
+                            h1: ({ children }) => <h1 className="md-h1">{children}</h1>,
+                            h2: ({ children }) => {
+                                const text = children?.toString() || '';
+                                const isSourcesHeader = text.toLowerCase().includes('sources') || text.toLowerCase().includes('references');
+                                return <h2 className={`md-h2 ${isSourcesHeader ? 'sources-header' : ''}`}>{children}</h2>;
+                            },
+                            h3: ({ children }) => {
+                                const text = children?.toString() || '';
+                                const isSourcesHeader = text.toLowerCase().includes('sources') || text.toLowerCase().includes('references');
+                                return <h3 className={`md-h3 ${isSourcesHeader ? 'sources-header' : ''}`}>{children}</h3>;
+                            },
+                            h4: ({ children }) => <h4 className="md-h4">{children}</h4>,
+                            p: ({ children }) => (
+                                <p
+                                    className="md-paragraph"
+                                    dangerouslySetInnerHTML={{
+                                        __html: formatCitations(
+                                            typeof children === 'string' ? children :
+                                                Array.isArray(children) ? children.map(c => typeof c === 'string' ? c : '').join('') : ''
+                                        ) || ''
+                                    }}
+                                />
+                            ),
+                            ul: ({ children }) => <ul className="md-list">{children}</ul>,
+                            ol: ({ children }) => <ol className="md-list ordered">{children}</ol>,
+                            li: ({ children }) => <li className="md-list-item">{children}</li>,
+                            strong: ({ children }) => <strong className="md-bold">{children}</strong>,
+                            em: ({ children }) => <em className="md-italic">{children}</em>,
+                            blockquote: ({ children }) => <blockquote className="md-quote">{children}</blockquote>,
+                            code: ({ inline, children }) =>
+                                inline
+                                    ? <code className="md-inline-code">{children}</code>
+                                    : <pre className="md-code-block"><code>{children}</code></pre>,
+                            a: ({ href, children }) => (
+                                <a href={href} target="_blank" rel="noopener noreferrer" className="md-link">
+                                    {children}
+                                </a>
+                            ),
+                        }}
+                    >
+                        {content}
+                    </ReactMarkdown>
+                </Suspense>
                 {isLoading && (
                     <div className="streaming-indicator">
                         <span className="dot"></span>
@@ -47,7 +47,7 @@ export async function getGenerationStatus(sessionId) {
 /**
  * Get generation progress
  * @param {string} sessionId - The session ID
- * @returns {Promise<{status: string, progress: string, subtopics_count: number}>}
+ * @returns {Promise<{status: string, progress: string, subtopics_count: number, usage: object}>}
  */
 export async function getProgress(sessionId) {
     const response = await fetch(`${API_BASE_URL}/api/progress/${sessionId}`);
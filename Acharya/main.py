@@ -5,22 +5,24 @@ from pathlib import Path
 import shutil
 
 from dotenv import load_dotenv
-from google.adk.sessions import DatabaseSessionService
+
+# Load environment variables before the agent modules read their settings
+load_dotenv()
+
 from google.adk.runners import Runner
 from google.genai import types
 from teacher_agent.sub_agents.web_page_content_function.function import web_page_content_function
-from teacher_agent.sub_agents.factory_agent.agent import factory_agent
+from teacher_agent.sub_agents.factory_agent.agent import factory_agent_function
 from teacher_agent.sub_agents.topic_generator_agent.agent import topic_generator_agent
-
-# Load environment variables
-load_dotenv()
+from teacher_agent.sub_agents.research_agent.agent import research_agent
+from teacher_agent.sub_agents.research_agent.corpus import SHARED_RESEARCH
+from services.session_db import create_session_service
 
 # Local storage - Use absolute path for SQLite
 # Use relative path for SQLite to avoid Windows absolute path issues
 
-# use sqlite + aiosqlite for async support
-db_url = "sqlite+aiosqlite:///./Acharya.db"
-session_service = DatabaseSessionService(db_url=db_url)
+# use sqlite + aiosqlite for async support (WAL, pooled; override with ACHARYA_DB_URL)
+session_service = create_session_service()
 
 
 # async allows streaming
@@ -122,15 +124,38 @@ async def main_async():
         #     print(f"DEBUG: Creating agent for subtopic {i}: {subtopic}")
         #     sub_agents.append(web_page_content_function(subtopic))
 
+        # Research the topic once so the subtopic writers share one source corpus
+        use_research_corpus = False
+        if SHARED_RESEARCH:
+            runner = Runner(
+                agent=research_agent,
+                app_name=APP_NAME,
+                session_service=session_service,
+            )
+            print("DEBUG: Starting research_agent execution...")
+
+            async for response in runner.run_async(
+                user_id=USER_ID,
+                session_id=SESSION_ID,
+                new_message=content
+            ):
+                pass
+
+            session = await session_service.get_session(
+                app_name=APP_NAME,
+                user_id=USER_ID,
+                session_id=SESSION_ID
+            )
+            use_research_corpus = bool(session.state.get("research_notes"))
+            print(f"DEBUG: Research corpus has {len(session.state.get('research_sources', []))} sources")
+
         for i in range(session.state["subtopics"]["count"]):
             print(f"DEBUG: Creating agent for subtopic {i}")
-            sub_agents.append(web_page_content_function(subtopics_list[i]))
+            sub_agents.append(web_page_content_function(subtopics_list[i], use_research_corpus=use_research_corpus))
 
 
-        factory_agent.sub_agents = sub_agents
-        
         runner = Runner(
-            agent=factory_agent,
+            agent=factory_agent_function(sub_agents),
             app_name=APP_NAME,
             session_service=session_service,
         )
@@ -0,0 +1,202 @@
+"""
+Formatting of agent outputs into the content slots served to the frontend.
+"""
+from teacher_agent.output_repair import parse_json_leniently, repair_quiz
+
+# Base URL the frontend uses to fetch podcast audio and images
+API_BASE_URL = "http://localhost:8000"
+
+
+def new_content_slot(subtopic: str) -> dict:
+    """Empty content slot for a subtopic, filled in as its artifacts are generated."""
+    return {
+        "webContent": "",
+        # Sanitized HTML of webContent and its table of contents, rendered once on the server
+        "webHtml": "",
+        "webToc": [],
+        "flashcards": [],
+        "quiz": [],
+        "podcast": {"title": f"{subtopic} Overview", "transcript": "", "audioUrl": ""},
+        "images": []
+    }
+
+
+def slot_complete(content: dict) -> bool:
+    """Whether every artifact of a content slot has arrived; offline placeholders do not count."""
+    return bool(
+        content["webContent"]
+        and content["flashcards"]
+        and content["quiz"]
+        and not content.get("placeholders")
+        and content["podcast"]["audioUrl"]
+        and content["images"]
+    )
+
+
+def format_podcast_transcript(podcast_data) -> str:
+    """Format a PodcastScript dialogue (or a plain string) into a readable transcript."""
+    podcast_transcript = ""
+    if isinstance(podcast_data, dict) and "dialogue" in podcast_data:
+        for turn in podcast_data.get("dialogue", []):
+            podcast_transcript += f"{turn.get('speaker', 'Speaker')}: {turn.get('text', '')}\n"
+    elif isinstance(podcast_data, str):
+        podcast_transcript = podcast_data
+    return podcast_transcript
+
+
+def podcast_audio_url(filename: str) -> str:
+    return f"{API_BASE_URL}/api/podcast/{filename}"
+
+
+def image_url(filename: str) -> str:
+    return f"{API_BASE_URL}/api/images/{filename}"
+
+
+def parse_flashcards(data):
+    """Parse flashcards from Pydantic schema format.
+    
+    Expected format from agent:
+    {
+        "flashcards": [
+            {"question": "...", "answer": "..."},
+            ...
+        ]
+    }
+    """
+    if not data:
+        return []
+    
+    # If it's already a list of flashcard dicts
+    if isinstance(data, list):
+        return data
+    
+    # If it's a dict with 'flashcards' key (Pydantic output)
+    if isinstance(data, dict):
+        flashcards = data.get("flashcards", [])
+        if isinstance(flashcards, list):
+            return flashcards
+        return []
+    
+    # If it's a string (JSON, possibly fenced or truncated)
+    if isinstance(data, str):
+        parsed = parse_json_leniently(data)
+        # Handle {"flashcards": [...]} format
+        if isinstance(parsed, dict) and "flashcards" in parsed:
+            return parsed["flashcards"]
+        # Handle direct list format
+        if isinstance(parsed, list):
+            return parsed
+    
+    return []
+
+
+def parse_quiz(data):
+    """Parse quiz from Pydantic schema format and transform for frontend.
+    
+    Expected format from agent:
+    {
+        "quiz": [
+            {
+                "questions": ["q1", "q2", ...],
+                "options": [["a", "b", "c", "d"], ...],
+                "correct_answers": ["answer1 with explanation", ...]
+            }
+        ]
+    }
+    
+    Output format for frontend:
+    [
+        {
+            "question": "q1",
+            "options": ["a", "b", "c", "d"],
+            "correctIndex": 0  # index of correct answer in options
+        },
+        ...
+    ]
+    """
+    if not data:
+        return []
+    
+    # Parse JSON string if needed (tolerates fences and truncation)
+    if isinstance(data, str):
+        data = parse_json_leniently(data)
+    
+    # Handle direct list (already parsed format)
+    if isinstance(data, list):
+        # Check if it's already in frontend format
+        if len(data) > 0 and isinstance(data[0], dict) and "question" in data[0] and "correctIndex" in data[0]:
+            return data
+    elif not isinstance(data, dict):
+        return []
+    
+    # Realign the parallel questions/options/correct_answers arrays of the quiz schema
+    repaired = repair_quiz(data)
+    if repaired is None:
+        return []
+    quiz_data = repaired["quiz"]
+    
+    # Transform quiz data to frontend format
+    result = []
+    for quiz in quiz_data:
+        if not isinstance(quiz, dict):
+            continue
+            
+        questions = quiz.get("questions", [])
+        options_list = quiz.get("options", [])
+        correct_answers = quiz.get("correct_answers", [])
+        
+        for i, question in enumerate(questions):
+            if i >= len(options_list):
+                continue
+                
+            options = options_list[i]
+            correct_answer = correct_answers[i] if i < len(correct_answers) else ""
+            
+            # Extract correct index and explanation from format like "B) A cell - explanation..."
+            correct_index = 0
+            explanation = correct_answer
+            
+            # Try to extract letter-based answer (A, B, C, D format)
+            if correct_answer:
+                # Match patterns like "A)", "B)", "C)", "D)" at the start
+                letter_match = correct_answer.strip()[:2].upper()
+                letter_map = {"A)": 0, "B)": 1, "C)": 2, "D)": 3, "A:": 0, "B:": 1, "C:": 2, "D:": 3}
+                
+                if letter_match in letter_map:
+                    correct_index = letter_map[letter_match]
+                    # Extract explanation after the dash
+                    if " - " in correct_answer:
+                        explanation = correct_answer.split(" - ", 1)[1].strip()
+                    else:
+                        # Remove the letter prefix for cleaner explanation
+                        explanation = correct_answer[2:].strip()
+                else:
+                    # Fallback: match option text in the answer
+                    for j, opt in enumerate(options):
+                        if opt.lower() in correct_answer.lower():
+                            correct_index = j
+                            break
+            
+            result.append({
+                "question": question,
+                "options": options,
+                "correctIndex": correct_index,
+                "explanation": explanation
+            })
+    
+    return result
+
+
+def parse_images(data):
+    """Parse images from various formats."""
+    if not data:
+        return []
+    
+    if isinstance(data, list):
+        return [{"url": img, "title": f"Image {i+1}"} if isinstance(img, str) else img for i, img in enumerate(data)]
+    
+    if isinstance(data, str):
+        # Single URL
+        return [{"url": data, "title": "Image"}]
+    
+    return []
@@ -0,0 +1,275 @@
+"""
+Course cache and off-peak cache warmer.
+Completed courses are cached by normalized topic, so a request for a cached topic is answered
+instantly instead of through the factory_agent fan-out. The warmer pre-generates popular topics
+(configured, or mined from recent requests) in off-peak windows within a daily budget, and
+refreshes cached courses before they go stale.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from services.reaper import referenced_artifacts
+from services.subtopic_index import SubtopicIndex
+
+COURSE_CACHE_ENABLED = os.getenv("ACHARYA_COURSE_CACHE", "1") != "0"
+COURSE_CACHE_DIR = Path(os.getenv("ACHARYA_COURSE_CACHE_DIR", "./course_cache"))
+# Courses older than this are served but refreshed first by the warmer
+FRESH_TTL = int(os.getenv("ACHARYA_COURSE_CACHE_FRESH_TTL", str(7 * 24 * 3600)))
+# Courses older than this are no longer served and are deleted
+MAX_AGE = int(os.getenv("ACHARYA_COURSE_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+# Requests remembered for mining popular topics
+HISTORY_LIMIT = 10000
+
+WARMER_ENABLED = os.getenv("ACHARYA_WARMER", "0") == "1"
+WARMER_INTERVAL = int(os.getenv("ACHARYA_WARMER_INTERVAL", "300"))
+# Local-time windows in which the warmer may generate, e.g. "01:00-06:00,13:00-14:00"
+WARMER_WINDOWS = os.getenv("ACHARYA_WARMER_WINDOWS", "01:00-06:00")
+# Topics to keep warm, besides the ones mined from the request history
+WARMER_TOPICS = [topic.strip() for topic in os.getenv("ACHARYA_WARMER_TOPICS", "").split(",") if topic.strip()]
+WARMER_TOPICS_FILE = os.getenv("ACHARYA_WARMER_TOPICS_FILE")
+# A topic requested this often within the history window is warmed
+WARMER_MIN_REQUESTS = int(os.getenv("ACHARYA_WARMER_MIN_REQUESTS", "3"))
+WARMER_HISTORY_DAYS = int(os.getenv("ACHARYA_WARMER_HISTORY_DAYS", "14"))
+# Spend budget per day: courses generated and model tokens (prompt + output + thoughts)
+WARMER_DAILY_COURSES = int(os.getenv("ACHARYA_WARMER_DAILY_COURSES", "20"))
+WARMER_DAILY_TOKENS = int(os.getenv("ACHARYA_WARMER_DAILY_TOKENS", "5000000"))
+
+
+def normalize_topic(topic: str) -> str:
+    """Cache key form of a topic: case, spacing and trailing punctuation do not matter."""
+    topic = re.sub(r"\s+", " ", topic.strip().lower())
+    return topic.rstrip(" .?!")
+
+
+def parse_windows(value: str) -> list:
+    """Parses "HH:MM-HH:MM,..." into (start, end) minutes of the day."""
+    windows = []
+    for window in value.split(","):
+        if "-" not in window:
+            continue
+        start, end = (part.strip() for part in window.split("-", 1))
+        windows.append(tuple(int(h) * 60 + int(m) for h, m in (start.split(":"), end.split(":"))))
+    return windows
+
+
+def in_window(now: datetime, windows: list) -> bool:
+    minute = now.hour * 60 + now.minute
+    for start, end in windows:
+        # Windows may wrap past midnight, e.g. 22:00-04:00
+        if (start <= minute < end) if start <= end else (minute >= start or minute < end):
+            return True
+    return False
+
+
+class CourseCache:
+    """Completed courses on disk by topic, with an index of their age, hits and artifacts.
+
+    Their subtopics are also kept in a near-duplicate index (subtopic_index.py), so a new course
+    can reuse the content of subtopics it shares with earlier ones.
+    """
+
+    def __init__(self, directory: Path = COURSE_CACHE_DIR):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.json"
+        self.lock = threading.Lock()
+        index = self._load_index()
+        # normalized topic -> {"topic", "created_at", "hits", "tokens", "artifacts"}
+        self.courses = index.get("courses", {})
+        # [request time, normalized topic], oldest first
+        self.history = index.get("history", [])
+        # Warmer spend of the current day
+        self.spend = index.get("spend", {})
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "expired": 0}
+        self.subtopics = SubtopicIndex(self.directory / "subtopics")
+
+    def _load_index(self) -> dict:
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Could not read course cache index: {e}")
+            return {}
+
+    def save(self) -> None:
+        with self.lock:
+            data = json.dumps({"courses": self.courses, "history": self.history, "spend": self.spend})
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(data)
+        tmp_path.replace(self.index_path)
+        self.subtopics.save()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json.gz"
+
+    def record_request(self, topic: str) -> None:
+        with self.lock:
+            self.history.append([time.time(), normalize_topic(topic)])
+            del self.history[:-HISTORY_LIMIT]
+
+    def get(self, topic: str) -> Optional[dict]:
+        """Returns a fresh copy of the cached course, or None if it is missing or too old."""
+        key = normalize_topic(topic)
+        item = self.courses.get(key)
+        if item is None or time.time() - item["created_at"] > MAX_AGE or not self._path(key).exists():
+            self.stats["misses"] += 1
+            return None
+        with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+            course = json.load(f)
+        with self.lock:
+            item["hits"] = item.get("hits", 0) + 1
+        self.stats["hits"] += 1
+        return course
+
+    def put(self, topic: str, entry: dict) -> None:
+        """Caches a completed session_store entry."""
+        key = normalize_topic(topic)
+        course = {"topic": entry["topic"], "subtopics": entry["subtopics"], "content": entry["content"]}
+        with gzip.open(self._path(key), "wt", encoding="utf-8") as f:
+            json.dump(course, f)
+        with self.lock:
+            self.courses[key] = {
+                "topic": entry["topic"],
+                "created_at": time.time(),
+                "hits": self.courses.get(key, {}).get("hits", 0),
+                # Tokens of the session, as charged to its usage (including output repair and TTS)
+                "tokens": (entry.get("usage") or {}).get("tokens"),
+                "artifacts": sorted(referenced_artifacts(entry)),
+            }
+        self.stats["stored"] += 1
+
+    def index_subtopics(self, entry: dict) -> None:
+        """Adds the generated subtopics of a finished entry to the near-duplicate index."""
+        reused = entry.get("reused_slots", {})
+        for slot, (subtopic, content) in enumerate(zip(entry["subtopics"], entry["content"])):
+            if slot not in reused and content["webContent"]:
+                self.subtopics.add(entry["topic"], subtopic, content, sorted(referenced_artifacts({"content": [content]})))
+
+    def is_fresh(self, topic: str) -> bool:
+        item = self.courses.get(normalize_topic(topic))
+        return item is not None and time.time() - item["created_at"] <= FRESH_TTL
+
+    def expire(self) -> None:
+        now = time.time()
+        with self.lock:
+            expired = [key for key, item in self.courses.items() if now - item["created_at"] > MAX_AGE]
+            for key in expired:
+                del self.courses[key]
+        for key in expired:
+            self._path(key).unlink(missing_ok=True)
+        self.stats["expired"] += len(expired)
+        self.subtopics.expire()
+
+    def artifacts(self) -> set:
+        """Podcast/image files the cached courses and subtopics link to, which the reaper must keep."""
+        with self.lock:
+            names = {name for item in self.courses.values() for name in item.get("artifacts", [])}
+        return names | self.subtopics.artifacts()
+
+    def popular_topics(self, since: float, min_requests: int) -> list:
+        """Normalized topics requested at least min_requests times since a time, most requested first."""
+        counts = {}
+        with self.lock:
+            for requested_at, key in self.history:
+                if requested_at >= since:
+                    counts[key] = counts.get(key, 0) + 1
+        return [key for key, count in sorted(counts.items(), key=lambda item: -item[1]) if count >= min_requests]
+
+
+class CacheWarmer:
+    """Pre-generates and refreshes cached courses in off-peak windows within a daily budget.
+
+    generate(topic) runs the pipeline for a topic and returns its finished session_store entry.
+    """
+
+    def __init__(self, cache: CourseCache, generate: Callable[[str], Awaitable[Optional[dict]]]):
+        self.cache = cache
+        self.generate = generate
+        self.windows = parse_windows(WARMER_WINDOWS)
+        self.running = False
+        self.stats = {"runs": 0, "warmed": 0, "failed": 0, "skipped_budget": 0, "last_run_at": None}
+
+    def configured_topics(self) -> list:
+        topics = list(WARMER_TOPICS)
+        if WARMER_TOPICS_FILE and Path(WARMER_TOPICS_FILE).exists():
+            topics += [line.strip() for line in Path(WARMER_TOPICS_FILE).read_text().splitlines() if line.strip()]
+        return topics
+
+    def candidates(self) -> list:
+        """Topics to generate: missing ones before stale ones, configured before mined."""
+        since = time.time() - WARMER_HISTORY_DAYS * 24 * 3600
+        topics = {}
+        for topic in self.configured_topics() + self.cache.popular_topics(since, WARMER_MIN_REQUESTS):
+            topics.setdefault(normalize_topic(topic), topic)
+        missing = [topic for key, topic in topics.items() if key not in self.cache.courses]
+        stale = [topic for topic in topics.values() if topic not in missing and not self.cache.is_fresh(topic)]
+        return missing + stale
+
+    def _today_spend(self) -> dict:
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self.cache.spend.get("day") != today:
+            self.cache.spend = {"day": today, "courses": 0, "tokens": 0}
+        return self.cache.spend
+
+    def within_budget(self) -> bool:
+        spend = self._today_spend()
+        if spend["courses"] >= WARMER_DAILY_COURSES:
+            return False
+        # Expect the next course to cost as much as the average cached course
+        known = [item["tokens"] for item in self.cache.courses.values() if item.get("tokens")]
+        expected = sum(known) / len(known) if known else 0
+        return spend["tokens"] + expected <= WARMER_DAILY_TOKENS
+
+    async def warm_once(self) -> list:
+        """Generates candidates until they or the budget run out; returns the warmed topics."""
+        if self.running:
+            return []
+        self.running = True
+        warmed = []
+        try:
+            for topic in self.candidates():
+                if not self.within_budget():
+                    self.stats["skipped_budget"] += 1
+                    break
+                entry = await self.generate(topic)
+                spend = self._today_spend()
+                spend["courses"] += 1
+                if entry is not None and entry.get("usage"):
+                    spend["tokens"] += entry["usage"]["tokens"]
+                # generate() caches completed courses whose subtopics all have content
+                if entry is None or entry["status"] != "completed" or not self.cache.is_fresh(topic):
+                    self.stats["failed"] += 1
+                    continue
+                self.stats["warmed"] += 1
+                warmed.append(topic)
+        finally:
+            self.running = False
+            self.stats["runs"] += 1
+            self.stats["last_run_at"] = time.time()
+            await asyncio.to_thread(self.cache.save)
+        return warmed
+
+    async def run(self) -> None:
+        """Expires old courses, and warms in off-peak windows, every WARMER_INTERVAL seconds."""
+        while True:
+            try:
+                await asyncio.sleep(WARMER_INTERVAL)
+                await asyncio.to_thread(self.cache.expire)
+                if WARMER_ENABLED and in_window(datetime.now(), self.windows):
+                    await self.warm_once()
+                else:
+                    await asyncio.to_thread(self.cache.save)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in cache warmer: {e}")
@@ -0,0 +1,140 @@
+"""
+Streaming course export.
+A finished course is downloaded as one zip archive: a manifest, and per subtopic the webpage
+(markdown and rendered HTML), flashcards, quiz, podcast transcript and audio, and images. The
+archive is built while it is sent; artifact files are copied in fixed-size chunks, so memory use
+does not grow with the size of the course.
+"""
+import io
+import json
+import re
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import urlparse
+
+from teacher_agent.artifacts import IMAGE_DIR, PODCAST_DIR
+
+CHUNK_SIZE = 1024 * 1024
+# Audio and images are already compressed (or, for WAV, barely compressible), so they are stored
+MEDIA_COMPRESSION = zipfile.ZIP_STORED
+TEXT_COMPRESSION = zipfile.ZIP_DEFLATED
+
+
+class _StreamWriter(io.RawIOBase):
+    """Unseekable sink for ZipFile that hands out what was written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "course"
+
+
+def archive_name(entry: dict) -> str:
+    return f"{_slug(entry.get('topic') or '')}.zip"
+
+
+def _artifact_path(url: str, directory: Path) -> Path:
+    return directory / Path(urlparse(url).path).name
+
+
+def _plan(session_id: str, entry: dict) -> tuple:
+    """Returns the manifest and the (archive name, text or file path) members of a course."""
+    members = []
+    subtopics = []
+    missing = []
+    for index, (subtopic, content) in enumerate(zip(entry["subtopics"], entry["content"])):
+        folder = f"subtopics/{index + 1:02d}-{_slug(subtopic)}"
+        files = {}
+
+        def add(kind: str, name: str, source) -> None:
+            files.setdefault(kind, []).append(f"{folder}/{name}")
+            members.append((f"{folder}/{name}", source))
+
+        if content["webContent"]:
+            add("webpage", "webpage.md", content["webContent"])
+        if content.get("webHtml"):
+            add("webpage", "webpage.html", content["webHtml"])
+        if content["flashcards"]:
+            add("flashcards", "flashcards.json", json.dumps(content["flashcards"], indent=2))
+        if content["quiz"]:
+            add("quiz", "quiz.json", json.dumps(content["quiz"], indent=2))
+        podcast = content.get("podcast", {})
+        if podcast.get("transcript"):
+            add("podcast", "podcast.txt", podcast["transcript"])
+        for kind, url, directory, name in (
+            [("podcast", podcast.get("audioUrl"), PODCAST_DIR, None)]
+            + [("images", image.get("url"), IMAGE_DIR, "images/") for image in content.get("images", [])]
+        ):
+            if not url:
+                continue
+            path = _artifact_path(url, directory)
+            if not path.is_file():
+                missing.append(str(Path(urlparse(url).path).name))
+                continue
+            add(kind, f"{name}{path.name}" if name else f"podcast{path.suffix}", path)
+        subtopics.append({"index": index, "title": subtopic, "files": files})
+
+    manifest = {
+        "format": "acharya-course",
+        "version": 1,
+        "session_id": session_id,
+        "topic": entry["topic"],
+        "created_at": entry.get("created_at"),
+        "exported_at": time.time(),
+        "subtopics": subtopics,
+        "missing_artifacts": missing,
+    }
+    return manifest, members
+
+
+def course_archive(session_id: str, entry: dict) -> Iterator[bytes]:
+    """Returns an iterator over the bytes of the course's zip archive.
+
+    The course is snapshotted now, so a regeneration that starts during the download does not
+    change the archive. Only the text artifacts are held in memory; files are read as it is sent.
+    """
+    manifest, members = _plan(session_id, entry)
+
+    def generate() -> Iterator[bytes]:
+        writer = _StreamWriter()
+        date_time = time.localtime()[:6]
+        with zipfile.ZipFile(writer, "w") as archive:
+            archive.writestr(zipfile.ZipInfo("manifest.json", date_time), json.dumps(manifest, indent=2),
+                             compress_type=TEXT_COMPRESSION)
+            for name, source in members:
+                info = zipfile.ZipInfo(name, date_time)
+                if isinstance(source, Path):
+                    info.compress_type = MEDIA_COMPRESSION
+                    info.file_size = source.stat().st_size
+                    with source.open("rb") as src, archive.open(info, "w") as dst:
+                        while chunk := src.read(CHUNK_SIZE):
+                            dst.write(chunk)
+                            data = writer.drain()
+                            if data:
+                                yield data
+                else:
+                    archive.writestr(info, source, compress_type=TEXT_COMPRESSION)
+                data = writer.drain()
+                if data:
+                    yield data
+        # The central directory is written when the archive closes
+        yield writer.drain()
+
+    return generate()
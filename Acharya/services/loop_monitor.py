@@ -0,0 +1,118 @@
+"""
+Event-loop lag monitor and sampling profiler for the API server.
+A heartbeat coroutine measures how late the loop wakes it up. A watchdog thread notices when
+the heartbeat stops and logs the stack of whatever is blocking the loop at that moment.
+"""
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Optional
+
+from teacher_agent.metrics import BLOCKED_EVENT_LOOP, EVENT_LOOP_LAG
+
+LOOP_MONITOR_ENABLED = os.getenv("ACHARYA_LOOP_MONITOR", "1") != "0"
+LOOP_LAG_THRESHOLD = int(os.getenv("ACHARYA_LOOP_LAG_THRESHOLD_MS", "250")) / 1000
+HEARTBEAT_INTERVAL = 0.1
+
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_RATE_HZ = 1000
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag and logs the loop thread's stack while it is blocked."""
+
+    def __init__(self, threshold: float = LOOP_LAG_THRESHOLD, interval: float = HEARTBEAT_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.stopped = threading.Event()
+        self.recent_stalls = collections.deque(maxlen=20)
+        self.stats = {"max_lag_ms": 0.0, "stalls": 0}
+
+    async def run(self) -> None:
+        """Heartbeat; runs on the loop until cancelled and starts the watchdog thread."""
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        watchdog.start()
+
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self.last_beat = now
+
+                lag = max(0.0, now - expected)
+                EVENT_LOOP_LAG.observe(lag)
+                self.stats["max_lag_ms"] = max(self.stats["max_lag_ms"], round(lag * 1000, 1))
+                if lag > self.threshold:
+                    print(f"⚠️ Event loop was blocked for {lag * 1000:.0f} ms")
+                    if self.recent_stalls and self.recent_stalls[-1]["duration_ms"] is None:
+                        self.recent_stalls[-1]["duration_ms"] = round(lag * 1000, 1)
+        finally:
+            self.stopped.set()
+
+    def _watch(self) -> None:
+        reported = False
+        while not self.stopped.wait(self.interval):
+            stalled = time.monotonic() - self.last_beat
+            if stalled <= self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+
+            # Report each stall once, with the stack of the code that is holding the loop
+            reported = True
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<loop thread not found>"
+            BLOCKED_EVENT_LOOP.inc()
+            self.stats["stalls"] += 1
+            self.recent_stalls.append({"at": time.time(), "duration_ms": None, "stack": stack})
+            print(f"⚠️ Event loop blocked for over {stalled * 1000:.0f} ms, loop thread stack:\n{stack}")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # ';' separates frames in the folded format
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _fold(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def sample_profile(seconds: float, rate_hz: int, thread_id: Optional[int] = None) -> str:
+    """Samples the stacks of the process's threads and returns them in folded format.
+
+    Each output line is "frame;frame;...;frame count", root first, as read by flamegraph.pl,
+    speedscope and inferno. With thread_id, only that thread (e.g. the event loop) is sampled.
+    """
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    interval = 1 / min(max(rate_hz, 1), MAX_PROFILE_RATE_HZ)
+    own_thread = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    counts = collections.Counter()
+
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == own_thread or (thread_id is not None and ident != thread_id):
+                continue
+            thread_name = names.get(ident) or f"thread-{ident}"
+            counts[f"{thread_name};{_fold(frame)}"] += 1
+        time.sleep(interval)
+
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
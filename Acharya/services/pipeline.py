@@ -0,0 +1,98 @@
+"""
+Lazily loaded agent pipeline for the API server.
+google.adk, google.genai, serpapi and the agent graphs take seconds to import and build, so the
+server loads them on first use, or in the background right after it starts listening, rather
+than before it can answer /health.
+"""
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+# Load the pipeline in the background as soon as the server has started
+PREWARM = os.getenv("ACHARYA_PREWARM", "1") != "0"
+
+_lock = threading.Lock()
+_pipeline: Optional[SimpleNamespace] = None
+_session_service = None
+
+stats = {"pipeline_load_seconds": None, "session_service_seconds": None}
+
+
+def get_session_service():
+    """Returns the ADK session service, creating it (and the database engine) on first use."""
+    global _session_service
+    with _lock:
+        if _session_service is None:
+            start = time.perf_counter()
+            from services.session_db import create_session_service
+            _session_service = create_session_service()
+            stats["session_service_seconds"] = round(time.perf_counter() - start, 3)
+    return _session_service
+
+
+def loaded_session_service():
+    """Returns the session service if it has been created, without creating it."""
+    return _session_service
+
+
+def load_pipeline() -> SimpleNamespace:
+    """Imports the ADK runtime and builds the agent graph on first use.
+
+    Blocking; call it from a worker thread (see ensure_pipeline) when on the event loop.
+    """
+    global _pipeline
+    with _lock:
+        if _pipeline is None:
+            start = time.perf_counter()
+            from google.adk.runners import Runner
+            from google.genai import types
+            from teacher_agent.plugins import metrics_plugin, scheduler_plugin, tracing_plugin, usage_plugin
+            from teacher_agent.sub_agents.web_page_content_function.function import (
+                regeneration_state,
+                web_page_content_function,
+            )
+            from teacher_agent.sub_agents.factory_agent.agent import factory_agent_function, regeneration_agent_function
+            from teacher_agent.sub_agents.topic_generator_agent.agent import topic_generator_agent
+            from teacher_agent.sub_agents.research_agent.agent import research_agent
+            from teacher_agent.sub_agents.research_agent.corpus import SHARED_RESEARCH
+            from services.result_sink import ResultSink
+
+            _pipeline = SimpleNamespace(
+                Runner=Runner,
+                types=types,
+                plugins=[scheduler_plugin, usage_plugin, metrics_plugin, tracing_plugin],
+                web_page_content_function=web_page_content_function,
+                regeneration_state=regeneration_state,
+                factory_agent_function=factory_agent_function,
+                regeneration_agent_function=regeneration_agent_function,
+                topic_generator_agent=topic_generator_agent,
+                research_agent=research_agent,
+                shared_research=SHARED_RESEARCH,
+                ResultSink=ResultSink,
+            )
+            stats["pipeline_load_seconds"] = round(time.perf_counter() - start, 3)
+    return _pipeline
+
+
+def is_ready() -> bool:
+    return _pipeline is not None and _session_service is not None
+
+
+async def ensure_pipeline() -> SimpleNamespace:
+    """Loads the pipeline and session service without blocking the event loop."""
+    if not is_ready():
+        await asyncio.to_thread(get_session_service)
+        await asyncio.to_thread(load_pipeline)
+    return _pipeline
+
+
+async def prewarm() -> None:
+    try:
+        await ensure_pipeline()
+        print(f"🔥 Pipeline loaded in {stats['pipeline_load_seconds']}s")
+    except Exception as e:
+        # The first request will retry the load and report the error
+        print(f"Error pre-warming the pipeline: {e}")
@@ -0,0 +1,21 @@
+"""
+CPU-bound post-processing of published webpages, run in the process pool (process_pool.py).
+Tasks are top-level functions that take and return plain data, so they can be sent to workers.
+"""
+from teacher_agent.offline_generator import generate_flashcards, generate_quiz
+from services.content import parse_flashcards, parse_quiz
+from services.rendering import render_webpage
+
+
+def webpage_artifacts(markdown_text: str, sibling_pages: list, render: bool = True,
+                      flashcards: bool = False, quiz: bool = False) -> dict:
+    """Rendered HTML and table of contents of a webpage, and offline flashcards/quiz on request."""
+    result = {}
+    if render:
+        result["webHtml"], toc = render_webpage(markdown_text)
+        result["webToc"] = list(toc)
+    if flashcards:
+        result["flashcards"] = parse_flashcards(generate_flashcards(markdown_text))
+    if quiz:
+        result["quiz"] = parse_quiz(generate_quiz(markdown_text, sibling_pages))
+    return result
@@ -0,0 +1,145 @@
+"""
+Managed process pool for CPU-bound artifact post-processing.
+Markdown rendering, sanitizing and the offline flashcard/quiz generators hold the GIL for
+milliseconds per page, which would delay every request the API server is answering meanwhile.
+They run in worker processes instead, behind a bounded queue and a per-task timeout.
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from teacher_agent.metrics import PROCESS_POOL_DURATION, PROCESS_POOL_PENDING, PROCESS_POOL_TASKS, PROCESS_POOL_WAIT
+from teacher_agent.tracing import traced
+
+# Worker processes; 0 runs the tasks in threads of the server process instead
+WORKERS = int(os.getenv("ACHARYA_PROCESS_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Tasks submitted to the workers at once; callers beyond this wait for a free place
+MAX_PENDING = int(os.getenv("ACHARYA_PROCESS_POOL_QUEUE", str(max(WORKERS, 1) * 8)))
+# Seconds before a task is abandoned and new workers take the next tasks
+TASK_TIMEOUT = float(os.getenv("ACHARYA_PROCESS_POOL_TIMEOUT", "60"))
+# spawn does not inherit the server's threads and locks, which fork would copy mid-use
+START_METHOD = os.getenv("ACHARYA_PROCESS_POOL_START_METHOD", "spawn")
+
+
+class ProcessPool:
+    """ProcessPoolExecutor with a bounded queue, per-task timeouts, metrics and restarts.
+
+    Tasks must be top-level functions taking and returning picklable values.
+    """
+
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING, timeout: float = TASK_TIMEOUT,
+                 initializer: Optional[Callable] = None):
+        self.workers = workers
+        self.timeout = timeout
+        self.initializer = initializer
+        self.executor = None
+        # Executor -> its submitted tasks that have not finished yet
+        self.in_flight = {}
+        self.places = asyncio.Semaphore(max_pending)
+        self.stats = {"ok": 0, "error": 0, "timeout": 0, "restarts": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=self.initializer,
+            )
+        return self.executor
+
+    def start(self) -> None:
+        """Starts the workers now, so the first tasks do not pay for their imports."""
+        if self.workers > 0 and self.initializer is not None:
+            executor = self._get_executor()
+            for _ in range(self.workers):
+                executor.submit(self.initializer)
+
+    def _submit(self, executor: ProcessPoolExecutor, func: Callable, *args) -> concurrent.futures.Future:
+        future = executor.submit(func, *args)
+        futures = self.in_flight.setdefault(executor, set())
+        futures.add(future)
+        future.add_done_callback(futures.discard)
+        return future
+
+    def restart(self, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        """Replaces the workers, e.g. when one is stuck in a task that timed out.
+
+        New tasks go to new workers at once. The other tasks of the old workers may still finish
+        within the timeout; then the workers still busy (the stuck ones) are terminated. Given
+        the executor a task failed in, does nothing if it was already replaced.
+        """
+        if self.executor is None or (executor is not None and executor is not self.executor):
+            return
+        executor, self.executor = self.executor, None
+        self.stats["restarts"] += 1
+        futures = list(self.in_flight.pop(executor, ()))
+        threading.Thread(target=self._retire, args=(executor, futures), name="process-pool-retire",
+                         daemon=True).start()
+
+    def _retire(self, executor: ProcessPoolExecutor, futures: list) -> None:
+        concurrent.futures.wait(futures, timeout=self.timeout)
+        # A running task cannot be cancelled, so its worker is terminated
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            self.in_flight.pop(executor, None)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, task: str, func: Callable, *args):
+        """Runs func(*args) in a worker and returns its result; task names it in metrics."""
+        PROCESS_POOL_PENDING.inc()
+        waited_from = time.perf_counter()
+        try:
+            async with self.places:
+                PROCESS_POOL_WAIT.labels(task=task).observe(time.perf_counter() - waited_from)
+                start = time.perf_counter()
+                with traced(f"process {task}", kind="process"):
+                    executor = None
+                    try:
+                        if self.workers > 0:
+                            executor = self._get_executor()
+                            future = asyncio.wrap_future(self._submit(executor, func, *args))
+                        else:
+                            future = asyncio.to_thread(func, *args)
+                        result = await asyncio.wait_for(future, self.timeout)
+                    except asyncio.TimeoutError:
+                        self._record(task, "timeout")
+                        if executor is not None:
+                            self.restart(executor)
+                        raise
+                    except BrokenProcessPool:
+                        # A worker died (e.g. out of memory); the next task gets new workers
+                        self._record(task, "error")
+                        self.restart(executor)
+                        raise
+                    except Exception:
+                        self._record(task, "error")
+                        raise
+                PROCESS_POOL_DURATION.labels(task=task).observe(time.perf_counter() - start)
+                self._record(task, "ok")
+                return result
+        finally:
+            PROCESS_POOL_PENDING.dec()
+
+    def _record(self, task: str, outcome: str) -> None:
+        self.stats[outcome] += 1
+        PROCESS_POOL_TASKS.labels(task=task, outcome=outcome).inc()
+
+
+def _import_tasks() -> None:
+    """Worker initializer: loads the task modules when a worker starts, not on its first task."""
+    import services.postprocess  # noqa: F401
+
+
+# Shared by every session of the API server
+process_pool = ProcessPool(initializer=_import_tasks)
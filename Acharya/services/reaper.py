@@ -0,0 +1,303 @@
+"""
+Background garbage collection for the API server.
+Evicts finished results from session_store to cold storage, deletes orphaned ADK sessions
+and removes podcast/image files that no result references any more.
+"""
+import asyncio
+import copy
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from teacher_agent.tracing import Trace
+
+# Seconds a finished result stays in memory before it is moved to cold storage
+RESULT_TTL = int(os.getenv("ACHARYA_RESULT_TTL", "3600"))
+# Seconds a result stays in cold storage
+COLD_STORAGE_TTL = int(os.getenv("ACHARYA_COLD_STORAGE_TTL", str(7 * 24 * 3600)))
+# Seconds since its last update after which an ADK session no running job owns is deleted
+ADK_SESSION_TTL = int(os.getenv("ACHARYA_ADK_SESSION_TTL", "7200"))
+# Minimum age in seconds before an unreferenced artifact file is deleted
+ARTIFACT_TTL = int(os.getenv("ACHARYA_ARTIFACT_TTL", str(24 * 3600)))
+# Estimated bytes of finished results kept in memory before the oldest are evicted early
+MEMORY_HIGH_WATER_BYTES = int(os.getenv("ACHARYA_MEMORY_HIGH_WATER_BYTES", str(512 * 1024 * 1024)))
+# Bytes of artifact files kept on disk before unreferenced files are deleted regardless of age
+DISK_HIGH_WATER_BYTES = int(os.getenv("ACHARYA_DISK_HIGH_WATER_BYTES", str(5 * 1024 * 1024 * 1024)))
+REAPER_INTERVAL = int(os.getenv("ACHARYA_REAPER_INTERVAL", "60"))
+COLD_STORAGE_DIR = Path(os.getenv("ACHARYA_COLD_STORAGE_DIR", "./cold_storage"))
+
+FINISHED_STATUSES = ("completed", "error")
+
+# Fields of a session_store entry that are persisted to cold storage
+PERSISTED_FIELDS = ("status", "topic", "subtopics", "content", "progress", "error", "user_id", "tenant_id",
+                    "callback_url", "webhook_sequence", "created_at", "finished_at", "usage")
+
+
+def referenced_artifacts(entry: dict) -> set:
+    """Returns the podcast/image file names a session_store entry links to."""
+    filenames = set()
+    for slot in entry.get("content", []):
+        audio_url = slot.get("podcast", {}).get("audioUrl")
+        if audio_url:
+            filenames.add(Path(urlparse(audio_url).path).name)
+        for image in slot.get("images", []):
+            if image.get("url"):
+                filenames.add(Path(urlparse(image["url"]).path).name)
+    return filenames
+
+
+class SessionReaper:
+    """Periodically reclaims memory, database rows and disk space held by old sessions."""
+
+    def __init__(self, session_store: dict, get_session_service: Callable, app_name: str, artifact_dirs: list,
+                 pinned_artifacts: Optional[Callable[[], set]] = None):
+        self.session_store = session_store
+        # Returns the ADK session service, or None while it has not been created yet
+        self.get_session_service = get_session_service
+        self.app_name = app_name
+        self.artifact_dirs = [Path(d) for d in artifact_dirs]
+        # Returns artifact file names referenced outside session_store, e.g. by the course cache
+        self.pinned_artifacts = pinned_artifacts
+        self.cold_dir = COLD_STORAGE_DIR
+        self.cold_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cold_dir / "index.json"
+        # session_id -> {"stored_at", "user_id", "artifacts"} for everything in cold storage
+        self.cold_index = self._load_index()
+        self.known_users = {"default_user"} | {item.get("user_id") for item in self.cold_index.values() if item.get("user_id")}
+        self.stats = {
+            "runs": 0,
+            "results_evicted": 0,
+            "result_bytes_evicted": 0,
+            "results_restored": 0,
+            "cold_results_expired": 0,
+            "adk_sessions_deleted": 0,
+            "artifacts_deleted": 0,
+            "artifact_bytes_deleted": 0,
+            "last_run_at": None,
+            "last_run_seconds": None,
+        }
+
+    def _load_index(self) -> dict:
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Could not read cold storage index: {e}")
+            return {}
+
+    def _save_index(self) -> None:
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.cold_index))
+        tmp_path.replace(self.index_path)
+
+    def _cold_path(self, session_id: str) -> Path:
+        return self.cold_dir / f"{session_id}.json.gz"
+
+    async def run(self) -> None:
+        """Reaps every REAPER_INTERVAL seconds until cancelled."""
+        while True:
+            try:
+                await asyncio.sleep(REAPER_INTERVAL)
+                await self.reap_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in session reaper: {e}")
+
+    async def reap_once(self) -> dict:
+        started = time.time()
+        for entry in self.session_store.values():
+            if entry.get("user_id"):
+                self.known_users.add(entry["user_id"])
+
+        # The event loop keeps changing the entries, so the worker threads only get copies of them
+        evictions = self._choose_evictions()
+        await asyncio.to_thread(self._write_cold_records, evictions)
+        for session_id, entry, _, _, size in evictions:
+            # Unless a regeneration changed it while it was written (the sink drops size_bytes);
+            # it is written again later
+            if (self.session_store.get(session_id) is entry and entry.get("status") in FINISHED_STATUSES
+                    and "size_bytes" in entry):
+                del self.session_store[session_id]
+                self.stats["results_evicted"] += 1
+                self.stats["result_bytes_evicted"] += size
+        await self._delete_orphaned_adk_sessions()
+        await asyncio.to_thread(self._expire_cold_storage)
+        referenced = set()
+        for entry in self.session_store.values():
+            referenced |= referenced_artifacts(entry)
+        await asyncio.to_thread(self._delete_unreferenced_artifacts, referenced)
+
+        self.stats["runs"] += 1
+        self.stats["last_run_at"] = started
+        self.stats["last_run_seconds"] = round(time.time() - started, 3)
+        return self.stats
+
+    # ---------- Results ----------
+
+    def _choose_evictions(self) -> list:
+        """Returns (session_id, entry, record, artifacts, size) of the results to move to cold storage.
+
+        Runs on the event loop; record and artifacts are copies the worker thread may write out.
+        """
+        now = time.time()
+        finished = []
+        for session_id, entry in self.session_store.items():
+            if entry.get("status") not in FINISHED_STATUSES:
+                continue
+            # Dropped by the result sink whenever it changes the content
+            if "size_bytes" not in entry:
+                entry["size_bytes"] = len(json.dumps(entry.get("content", [])))
+            finished.append((entry.get("finished_at") or now, session_id, entry))
+
+        # Oldest first, so the high-water mark evicts the least recently finished results
+        finished.sort(key=lambda item: item[0])
+        resident_bytes = sum(entry["size_bytes"] for _, _, entry in finished)
+
+        evictions = []
+        for finished_at, session_id, entry in finished:
+            expired = now - finished_at > RESULT_TTL
+            over_high_water = resident_bytes > MEMORY_HIGH_WATER_BYTES
+            if not expired and not over_high_water:
+                continue
+
+            record = copy.deepcopy({field: entry.get(field) for field in PERSISTED_FIELDS})
+            if entry.get("trace") is not None:
+                record["trace"] = copy.deepcopy(entry["trace"].to_dict())
+            evictions.append((session_id, entry, record, sorted(referenced_artifacts(entry)), entry["size_bytes"]))
+            resident_bytes -= entry["size_bytes"]
+        return evictions
+
+    def _write_cold_records(self, evictions: list) -> None:
+        for session_id, _, record, artifacts, _ in evictions:
+            self._write_cold(session_id, record, artifacts)
+        self._save_index()
+
+    def _write_cold(self, session_id: str, record: dict, artifacts: list) -> None:
+        with gzip.open(self._cold_path(session_id), "wt", encoding="utf-8") as f:
+            json.dump(record, f)
+        self.cold_index[session_id] = {
+            "stored_at": time.time(),
+            "user_id": record.get("user_id"),
+            "artifacts": artifacts,
+        }
+
+    def _read_cold(self, session_id: str) -> Optional[dict]:
+        path = self._cold_path(session_id)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+        if entry.get("trace"):
+            entry["trace"] = Trace.from_dict(entry["trace"])
+        return entry
+
+    async def load_cold(self, session_id: str) -> Optional[dict]:
+        """Restores an evicted result into session_store, or returns None if it is unknown."""
+        if session_id not in self.cold_index:
+            return None
+
+        # Decompressing and parsing a course takes long enough to stall the event loop
+        entry = await asyncio.to_thread(self._read_cold, session_id)
+        if entry is None:
+            return None
+        # Another request may have restored it meanwhile, and started a regeneration of it
+        if session_id in self.session_store:
+            return self.session_store[session_id]
+
+        # Keep the restored result hot for another RESULT_TTL
+        entry["finished_at"] = time.time()
+        self.session_store[session_id] = entry
+        self.stats["results_restored"] += 1
+        return entry
+
+    def _expire_cold_storage(self) -> None:
+        now = time.time()
+        for session_id, item in list(self.cold_index.items()):
+            if now - item.get("stored_at", now) <= COLD_STORAGE_TTL:
+                continue
+            self._cold_path(session_id).unlink(missing_ok=True)
+            del self.cold_index[session_id]
+            self.stats["cold_results_expired"] += 1
+        self._save_index()
+
+    # ---------- ADK sessions ----------
+
+    async def _delete_orphaned_adk_sessions(self) -> None:
+        session_service = self.get_session_service()
+        if session_service is None:
+            return
+
+        now = time.time()
+        # Sessions of running jobs are never orphans, whatever their age
+        active = {
+            entry.get("adk_session_id")
+            for entry in self.session_store.values()
+            if entry.get("status") not in FINISHED_STATUSES
+        }
+
+        for user_id in list(self.known_users):
+            try:
+                response = await session_service.list_sessions(app_name=self.app_name, user_id=user_id)
+            except Exception as e:
+                print(f"Could not list ADK sessions for {user_id}: {e}")
+                continue
+
+            for session in response.sessions:
+                if session.id in active or now - session.last_update_time <= ADK_SESSION_TTL:
+                    continue
+                try:
+                    await session_service.delete_session(
+                        app_name=self.app_name,
+                        user_id=user_id,
+                        session_id=session.id,
+                    )
+                    self.stats["adk_sessions_deleted"] += 1
+                except Exception as e:
+                    print(f"Could not delete ADK session {session.id}: {e}")
+
+    # ---------- Artifact files ----------
+
+    def _delete_unreferenced_artifacts(self, referenced: set) -> None:
+        """Deletes old files outside referenced, the files session_store links to."""
+        referenced = set(referenced)
+        for item in self.cold_index.values():
+            referenced.update(item.get("artifacts", []))
+        if self.pinned_artifacts is not None:
+            referenced |= self.pinned_artifacts()
+
+        now = time.time()
+        files = []
+        total_bytes = 0
+        for directory in self.artifact_dirs:
+            if not directory.exists():
+                continue
+            for path in directory.iterdir():
+                if not path.is_file():
+                    continue
+                stat = path.stat()
+                total_bytes += stat.st_size
+                if path.name not in referenced:
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+        # Oldest first; files still being written by running jobs are protected by ARTIFACT_TTL
+        # unless the disk high-water mark is exceeded
+        files.sort(key=lambda item: item[0])
+        for mtime, size, path in files:
+            expired = now - mtime > ARTIFACT_TTL
+            over_high_water = total_bytes > DISK_HIGH_WATER_BYTES
+            if not expired and not over_high_water:
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                print(f"Could not delete artifact {path}: {e}")
+                continue
+            total_bytes -= size
+            self.stats["artifacts_deleted"] += 1
+            self.stats["artifact_bytes_deleted"] += size
@@ -0,0 +1,104 @@
+"""
+Server-side rendering of webpage markdown.
+Each webpage is rendered once, when the agent publishes it, to sanitized HTML with a table of
+contents of its headings. The result is stored in the content slot next to the markdown, so
+clients can show it without parsing markdown on every view.
+"""
+import html as html_lib
+import re
+from functools import lru_cache
+from xml.etree.ElementTree import Element
+
+import markdown
+import nh3
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+from markdown.util import HTML_PLACEHOLDER_RE
+
+# Headings included in the table of contents
+TOC_DEPTH = "2-3"
+
+# Element classes of the frontend's markdown styles (WebContent.css)
+ELEMENT_CLASSES = {
+    "h1": "md-h1",
+    "h2": "md-h2",
+    "h3": "md-h3",
+    "h4": "md-h4",
+    "p": "md-paragraph",
+    "ul": "md-list",
+    "ol": "md-list ordered",
+    "li": "md-list-item",
+    "strong": "md-bold",
+    "em": "md-italic",
+    "blockquote": "md-quote",
+    "pre": "md-code-block",
+    "a": "md-link",
+}
+SOURCES_HEADINGS = ("sources", "references")
+
+ALLOWED_TAGS = {
+    "h1", "h2", "h3", "h4", "h5", "h6", "p", "br", "hr", "ul", "ol", "li", "strong", "em", "b", "i",
+    "blockquote", "pre", "code", "a", "cite", "table", "thead", "tbody", "tr", "th", "td",
+}
+ALLOWED_ATTRIBUTES = {
+    "*": {"class"},
+    "h1": {"id", "class"}, "h2": {"id", "class"}, "h3": {"id", "class"}, "h4": {"id", "class"},
+    "a": {"href", "title", "class"},
+    "th": {"align"}, "td": {"align"},
+}
+URL_SCHEMES = {"http", "https", "mailto"}
+
+# Inline citation markers like [1], which are not links
+CITATION_PATTERN = re.compile(r"\[(\d+)\](?!\()")
+
+
+class _ClassTreeprocessor(Treeprocessor):
+    def run(self, root: Element) -> None:
+        block_code = {id(child) for pre in root.iter("pre") for child in pre}
+        for element in root.iter():
+            css_class = ELEMENT_CLASSES.get(element.tag)
+            if element.tag == "code" and id(element) not in block_code:
+                css_class = "md-inline-code"
+            heading = "".join(element.itertext()).lower()
+            if element.tag in ("h2", "h3") and any(word in heading for word in SOURCES_HEADINGS):
+                css_class = f"{css_class} sources-header"
+            # Paragraphs holding only a stashed block (a fenced code block or raw HTML) must stay
+            # bare <p> tags, or the stash is not swapped back in
+            if element.tag == "p" and element.text and HTML_PLACEHOLDER_RE.fullmatch(element.text.strip()):
+                css_class = None
+            if css_class:
+                element.set("class", css_class)
+
+
+class _ClassExtension(Extension):
+    def extendMarkdown(self, md) -> None:
+        # After the inline patterns (priority 20), before the toc extension assigns ids
+        md.treeprocessors.register(_ClassTreeprocessor(md), "acharya_classes", 15)
+
+
+def _flatten_toc(tokens: list) -> list:
+    entries = []
+    for token in tokens:
+        entries.append({"level": token["level"], "id": token["id"], "title": html_lib.unescape(token["name"])})
+        entries.extend(_flatten_toc(token["children"]))
+    return entries
+
+
+@lru_cache(maxsize=256)
+def render_webpage(text: str) -> tuple:
+    """Returns the sanitized HTML of a webpage and its table of contents, [{level, id, title}]."""
+    converter = markdown.Markdown(
+        extensions=["toc", "tables", "fenced_code", "sane_lists", _ClassExtension()],
+        extension_configs={"toc": {"toc_depth": TOC_DEPTH}},
+    )
+    text = CITATION_PATTERN.sub(r'<cite class="citation">[\1]</cite>', text)
+    rendered = nh3.clean(
+        converter.convert(text),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=URL_SCHEMES,
+        set_tag_attribute_values={"a": {"target": "_blank"}},
+    )
+    # Fenced code blocks are rendered outside the tree, so they get their class here
+    rendered = rendered.replace("<pre>", f'<pre class="{ELEMENT_CLASSES["pre"]}">')
+    return rendered, _flatten_toc(converter.toc_tokens)
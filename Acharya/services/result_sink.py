@@ -0,0 +1,245 @@
+"""
+Push-based sink for generated content.
+Agents and callbacks publish their outputs as ADK state deltas; the sink applies each delta
+to the session's content slots as the runner yields it, so the ADK session store never
+has to be polled.
+"""
+import asyncio
+import os
+from typing import Optional
+
+from services.postprocess import webpage_artifacts
+from services.process_pool import process_pool
+from services.content import (
+    new_content_slot,
+    slot_complete,
+    format_podcast_transcript,
+    parse_flashcards,
+    parse_quiz,
+    podcast_audio_url,
+    image_url,
+)
+
+# Serve offline (extractive) flashcards and quizzes while the model versions are generating
+OFFLINE_PLACEHOLDERS = os.getenv("ACHARYA_OFFLINE_PLACEHOLDERS", "1") != "0"
+
+# State keys written by each agent (by output_key prefix) besides its output_key
+DERIVED_KEYS = {
+    "assessment": ["flashcards", "quiz"],       # split by the assessment after_agent_callback
+    "podcast_content": ["podcast_audio"],       # audio file written by the podcast callback
+    "image_url": ["image_file"],                # image file downloaded by image_tool
+}
+
+
+def collect_output_keys(agent) -> list:
+    """Returns the output keys of an agent and all of its descendants."""
+    keys = [agent.output_key] if getattr(agent, "output_key", None) else []
+    for sub_agent in agent.sub_agents:
+        keys.extend(collect_output_keys(sub_agent))
+    return keys
+
+
+class ResultSink:
+    """Applies published state deltas to the content slots of one session_store entry.
+
+    Each subtopic pipeline is mapped to its content slot by the output keys of its agents,
+    so only the artifacts named in a delta are parsed and updated. Webpages, including reused
+    ones stored unrendered, are rendered and their offline placeholders generated in the process
+    pool; finalize() waits for them.
+
+    By default the content is emptied and the pipelines fill the slots in order, skipping the
+    slots filled from reused (slot -> stored content of a near-duplicate subtopic). For a
+    regeneration, slots names the existing slot each pipeline updates, and the other slots are
+    left as they are.
+    """
+
+    def __init__(self, entry: dict, subtopics: list, pipelines: list, slots: Optional[list] = None,
+                 reused: Optional[dict] = None):
+        self.entry = entry
+        self.subtopics = subtopics
+        # Continue from the previous sink, so a status snapshot is never mistaken as current
+        previous = entry.get("sink")
+        self.version = previous.version + 1 if previous else 0
+        entry.pop("size_bytes", None)
+        self.slot_for_key = {}
+        self.completed_slots = set()
+        # Process pool tasks post-processing published webpages
+        self.tasks = set()
+
+        if slots is None:
+            reused = reused or {}
+            entry["content"] = [new_content_slot(subtopic) for subtopic in subtopics]
+            for slot, content in reused.items():
+                entry["content"][slot] = self._adapt(content, subtopics[slot])
+                # Content stored before webpages were rendered on the server
+                if entry["content"][slot]["webContent"] and not entry["content"][slot]["webHtml"]:
+                    self._postprocess(slot, entry["content"][slot]["webContent"], False, False)
+            slots = [slot for slot in range(len(subtopics)) if slot not in reused]
+
+        for slot, pipeline in zip(slots, pipelines):
+            for key in collect_output_keys(pipeline):
+                self.slot_for_key[key] = slot
+                prefix, index = key.rsplit("_", 1)
+                for derived in DERIVED_KEYS.get(prefix, []):
+                    self.slot_for_key[f"{derived}_{index}"] = slot
+
+    def _changed(self) -> None:
+        """Marks the content as changed, for a new status snapshot and a new size for the reaper."""
+        self.version += 1
+        self.entry.pop("size_bytes", None)
+
+    @staticmethod
+    def _adapt(content: dict, subtopic: str) -> dict:
+        """Retitles the stored content of a similar subtopic for this one."""
+        content = {**new_content_slot(subtopic), **content}
+        content["podcast"] = {**content["podcast"], "title": f"{subtopic} Overview"}
+        content["images"] = [{**image, "title": f"{subtopic} Visual"} for image in content["images"]]
+        content.pop("placeholders", None)
+        return content
+
+    def replace_subtopic(self, slot: int, subtopic: str) -> None:
+        """Swaps the subtopic of a slot and empties its content for the new pipeline."""
+        self.subtopics[slot] = subtopic
+        self.entry["content"][slot] = new_content_slot(subtopic)
+        self._changed()
+
+    def publish(self, state_delta: dict) -> list:
+        """Applies a state delta and returns the (slot, field) pairs that changed."""
+        changed = []
+
+        for key, value in (state_delta or {}).items():
+            slot = self.slot_for_key.get(key)
+            if slot is None or not value:
+                continue
+
+            field = self._apply(slot, key.rsplit("_", 1)[0], value)
+            if field:
+                changed.append((slot, field))
+
+        if changed:
+            self._changed()
+
+        return changed
+
+    def newly_completed(self, changed: list) -> list:
+        """Returns the slots among changed (slot, field) pairs that now have every artifact."""
+        slots = []
+        for slot in sorted({slot for slot, _ in changed}):
+            if slot not in self.completed_slots and slot_complete(self.entry["content"][slot]):
+                self.completed_slots.add(slot)
+                slots.append(slot)
+        return slots
+
+    def publish_event(self, event) -> list:
+        """Publishes the state delta carried by an ADK event, if any."""
+        if not event.actions or not event.actions.state_delta:
+            return []
+        return self.publish(event.actions.state_delta)
+
+    def _apply(self, slot: int, prefix: str, value):
+        content = self.entry["content"][slot]
+        subtopic = self.subtopics[slot]
+        placeholders = content.setdefault("placeholders", [])
+
+        if prefix == "webpage_content":
+            content["webContent"] = value
+            content["webHtml"], content["webToc"] = "", []
+            self.entry["progress"] = f"Generated web content for: {subtopic}"
+
+            # Render the page, and show offline flashcards/quiz until the model versions arrive
+            self._postprocess(slot, value, OFFLINE_PLACEHOLDERS and not content["flashcards"],
+                              OFFLINE_PLACEHOLDERS and not content["quiz"])
+            return "webContent"
+
+        if prefix == "flashcards":
+            content["flashcards"] = parse_flashcards(value)
+            if "flashcards" in placeholders:
+                placeholders.remove("flashcards")
+            self.entry["progress"] = f"Generated flashcards for: {subtopic}"
+            return "flashcards"
+
+        if prefix == "quiz":
+            content["quiz"] = parse_quiz(value)
+            if "quiz" in placeholders:
+                placeholders.remove("quiz")
+            self.entry["progress"] = f"Generated quiz for: {subtopic}"
+            return "quiz"
+
+        if prefix == "podcast_content":
+            transcript = format_podcast_transcript(value)
+            if not transcript:
+                return None
+            content["podcast"]["transcript"] = transcript
+            self.entry["progress"] = f"Generated podcast script for: {subtopic}"
+            return "podcast"
+
+        if prefix == "podcast_audio":
+            content["podcast"]["audioUrl"] = podcast_audio_url(value)
+            self.entry["progress"] = f"Generated podcast audio for: {subtopic}"
+            return "podcast"
+
+        if prefix == "image_file":
+            content["images"] = [{"url": image_url(value), "title": f"{subtopic} Visual"}]
+            self.entry["progress"] = f"Found an image for: {subtopic}"
+            return "images"
+
+        return None
+
+    def _postprocess(self, slot: int, web_content: str, flashcards: bool, quiz: bool) -> None:
+        """Renders a webpage, and generates offline flashcards/quiz if asked, in the process pool."""
+        task = asyncio.get_running_loop().create_task(process_pool.run(
+            "webpage", webpage_artifacts, web_content, self._sibling_pages(slot), True, flashcards, quiz,
+        ))
+        self.tasks.add(task)
+        task.add_done_callback(lambda task: self._apply_postprocessed(task, slot, web_content))
+
+    def _apply_postprocessed(self, task: asyncio.Task, slot: int, web_content: str) -> None:
+        self.tasks.discard(task)
+        content = self.entry["content"][slot]
+        if task.cancelled() or content["webContent"] != web_content:
+            return
+        if task.exception() is not None:
+            # Clients render the markdown themselves, and finalize() fills in the assessments
+            print(f"Error post-processing the webpage of {self.subtopics[slot]}: {task.exception()!r}")
+            return
+
+        result = task.result()
+        content["webHtml"], content["webToc"] = result["webHtml"], result["webToc"]
+        # The model versions may have arrived while the placeholders were generated
+        placeholders = content.setdefault("placeholders", [])
+        for field in ("flashcards", "quiz"):
+            if result.get(field) and not content[field]:
+                content[field] = result[field]
+                placeholders.append(field)
+        self._changed()
+
+    def _sibling_pages(self, slot: int) -> list:
+        return [c["webContent"] for i, c in enumerate(self.entry["content"]) if i != slot and c["webContent"]]
+
+    async def finalize(self) -> None:
+        """Waits for the webpage post-processing, then fills flashcards/quizzes that never arrived
+        from the model with offline versions."""
+        if self.tasks:
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
+
+        missing = {}
+        for slot, content in enumerate(self.entry["content"]):
+            web_content = content["webContent"]
+            if web_content and (not content["flashcards"] or not content["quiz"]):
+                missing[slot] = process_pool.run(
+                    "offline_assessment", webpage_artifacts, web_content, self._sibling_pages(slot), False,
+                    not content["flashcards"], not content["quiz"],
+                )
+        results = await asyncio.gather(*missing.values(), return_exceptions=True)
+
+        for slot, result in zip(missing, results):
+            if isinstance(result, BaseException):
+                print(f"Error generating offline assessments for {self.subtopics[slot]}: {result!r}")
+                continue
+            content = self.entry["content"][slot]
+            for field in ("flashcards", "quiz"):
+                if result.get(field) and not content[field]:
+                    content[field] = result[field]
+        for content in self.entry["content"]:
+            content.pop("placeholders", None)
+        self._changed()
@@ -0,0 +1,210 @@
+"""
+Full-text search over all generated courses.
+Webpages, flashcards, quizzes and podcast transcripts are written to a local SQLite FTS5 index as
+the agents publish them, and stay searchable after their session is reaped. The API server
+serves ranked, paginated results with snippets, and the pipeline looks up existing material on
+a topic before researching it again.
+"""
+import html
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+SEARCH_INDEX_ENABLED = os.getenv("ACHARYA_SEARCH_INDEX", "1") != "0"
+SEARCH_DB_PATH = os.getenv("ACHARYA_SEARCH_DB", "./search_index.db")
+# Passages of existing material handed to the research agent (0 disables the lookup)
+EXISTING_MATERIAL_LIMIT = int(os.getenv("ACHARYA_EXISTING_MATERIAL_LIMIT", "5"))
+
+# Content slot field -> document kind
+KINDS = {"webContent": "webpage", "flashcards": "flashcards", "quiz": "quiz", "podcast": "podcast"}
+DOCUMENT_KINDS = tuple(KINDS.values())
+
+# bm25 weights of the topic, subtopic and body columns
+RANK_WEIGHTS = (2.0, 5.0, 1.0)
+SNIPPET_TOKENS = 24
+# Control characters marking the matched words in FTS5 snippets; generated text never contains them
+MATCH_START, MATCH_END = "\x02", "\x03"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    subtopic_index INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    subtopic TEXT NOT NULL,
+    body TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (session_id, subtopic_index, kind)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    topic, subtopic, body, content='documents', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts(rowid, topic, subtopic, body) VALUES (new.id, new.topic, new.subtopic, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, topic, subtopic, body)
+    VALUES ('delete', old.id, old.topic, old.subtopic, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, topic, subtopic, body)
+    VALUES ('delete', old.id, old.topic, old.subtopic, old.body);
+    INSERT INTO documents_fts(rowid, topic, subtopic, body) VALUES (new.id, new.topic, new.subtopic, new.body);
+END;
+"""
+
+
+def document_text(content: dict, kind: str) -> str:
+    """Searchable text of one artifact of a content slot."""
+    if kind == "webpage":
+        return content.get("webContent") or ""
+    if kind == "flashcards":
+        return "\n".join(f"{card.get('question', '')}\n{card.get('answer', '')}"
+                         for card in content.get("flashcards", []) if isinstance(card, dict))
+    if kind == "quiz":
+        return "\n".join(f"{question.get('question', '')}\n" + "\n".join(map(str, question.get("options", [])))
+                         for question in content.get("quiz", []) if isinstance(question, dict))
+    if kind == "podcast":
+        return content.get("podcast", {}).get("transcript") or ""
+    return ""
+
+
+def highlight(snippet: str) -> str:
+    """HTML of a snippet: the text escaped, the matched words in <mark>."""
+    return html.escape(snippet, quote=False).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
+
+
+def plain(snippet: str) -> str:
+    """Text of a snippet without the match markers, on one line."""
+    return " ".join(snippet.replace(MATCH_START, "").replace(MATCH_END, "").split())
+
+
+def match_expression(query: str, any_term: bool = False) -> Optional[str]:
+    """Quotes every word of a user query, so FTS5 operators in it are searched as plain words."""
+    terms = [f'"{term}"' for term in re.findall(r"\w+", query.lower())]
+    if not terms:
+        return None
+    return (" OR " if any_term else " ").join(terms)
+
+
+class SearchIndex:
+    """SQLite FTS5 index of generated artifacts, one document per subtopic and kind."""
+
+    def __init__(self, path: str = SEARCH_DB_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.stats = {"indexed": 0, "searches": 0}
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def _upsert(self, session_id: str, topic: str, slot: int, subtopic: str, kind: str, body: str) -> None:
+        if not body.strip():
+            return
+        cursor = self.connection.execute(
+            """
+            INSERT INTO documents (session_id, subtopic_index, kind, topic, subtopic, body, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (session_id, subtopic_index, kind) DO UPDATE SET
+                topic = excluded.topic, subtopic = excluded.subtopic, body = excluded.body,
+                updated_at = excluded.updated_at
+            WHERE body != excluded.body OR subtopic != excluded.subtopic
+            """,
+            (session_id, slot, kind, topic, subtopic, body, time.time()),
+        )
+        self.stats["indexed"] += cursor.rowcount
+
+    def index_changes(self, session_id: str, entry: dict, changed: list) -> None:
+        """Indexes the artifacts named by the (slot, field) pairs a ResultSink reported as changed."""
+        pairs = {(slot, KINDS[field]) for slot, field in changed if field in KINDS}
+        if not pairs:
+            return
+        with self.lock, self.connection:
+            for slot, kind in sorted(pairs):
+                self._upsert(session_id, entry["topic"], slot, entry["subtopics"][slot], kind,
+                             document_text(entry["content"][slot], kind))
+
+    def index_session(self, session_id: str, entry: dict) -> None:
+        """Re-indexes every artifact of a finished session, e.g. after offline fallbacks or a regeneration."""
+        with self.lock, self.connection:
+            for slot, (subtopic, content) in enumerate(zip(entry["subtopics"], entry["content"])):
+                for kind in DOCUMENT_KINDS:
+                    self._upsert(session_id, entry["topic"], slot, subtopic, kind, document_text(content, kind))
+
+    def search(self, query: str, kinds: Optional[list] = None, limit: int = 10, offset: int = 0,
+               any_term: bool = False) -> dict:
+        """Returns {"total", "results"} for the documents matching every word of query, best first.
+
+        Snippets are HTML: generated text is escaped, and only the matched words are marked up.
+        """
+        found = self._search(query, kinds, limit, offset, any_term)
+        for result in found["results"]:
+            result["snippet"] = highlight(result["snippet"])
+        return found
+
+    def _search(self, query: str, kinds: Optional[list], limit: int, offset: int, any_term: bool) -> dict:
+        self.stats["searches"] += 1
+        expression = match_expression(query, any_term)
+        if expression is None:
+            return {"total": 0, "results": []}
+
+        where = "documents_fts MATCH ?"
+        params = [expression]
+        if kinds:
+            where += f" AND d.kind IN ({', '.join('?' for _ in kinds)})"
+            params += list(kinds)
+
+        with self.lock:
+            total = self.connection.execute(
+                f"SELECT COUNT(*) FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid WHERE {where}",
+                params,
+            ).fetchone()[0]
+            rows = self.connection.execute(
+                f"""
+                SELECT d.id, d.session_id, d.subtopic_index, d.kind, d.topic, d.subtopic, d.updated_at,
+                       snippet(documents_fts, 2, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet,
+                       bm25(documents_fts, {', '.join(map(str, RANK_WEIGHTS))}) AS rank
+                FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE {where}
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+                """,
+                params + [limit, offset],
+            ).fetchall()
+
+        results = []
+        for row in rows:
+            result = dict(row)
+            # bm25 is lower for better matches
+            result["score"] = round(-result.pop("rank"), 4)
+            results.append(result)
+        return {"total": total, "results": results}
+
+    def get(self, document_id: int) -> Optional[dict]:
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM documents WHERE id = ?", (document_id,)).fetchone()
+        return dict(row) if row else None
+
+    def existing_material(self, topic: str, limit: int = EXISTING_MATERIAL_LIMIT) -> str:
+        """Markdown digest of the best matching webpages on a topic, for the research agent."""
+        if limit <= 0:
+            return ""
+        results = self._search(topic, ["webpage"], limit, 0, any_term=True)["results"]
+        snippets = []
+        for result in results:
+            snippets.append(f"- **{result['subtopic']}** (course: {result['topic']}): {plain(result['snippet'])}")
+        return "\n".join(snippets)
+
+    def counts(self) -> dict:
+        with self.lock:
+            rows = self.connection.execute("SELECT kind, COUNT(*) FROM documents GROUP BY kind").fetchall()
+        return {kind: count for kind, count in rows}
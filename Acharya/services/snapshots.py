@@ -0,0 +1,94 @@
+"""
+Pre-serialized /api/status responses.
+The JSON body of a session is encoded (and compressed) once per content version and then
+served as-is to every poll until the sink publishes a change.
+"""
+import gzip
+import json
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are served uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("ACHARYA_STATUS_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class StatusSnapshot:
+    """One encoded status body with its compressed variants, built lazily per encoding."""
+
+    def __init__(self, key: tuple, body: bytes):
+        self.key = key
+        self.body = body
+        self.etag = f'"{zlib.crc32(body):08x}-{len(body)}"'
+        self.encoded = {"identity": body}
+
+    def encode(self, encoding: str) -> bytes:
+        if encoding not in self.encoded:
+            if encoding == "br":
+                self.encoded[encoding] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                self.encoded[encoding] = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+        return self.encoded[encoding]
+
+
+def snapshot_key(session_id: str, entry: dict) -> tuple:
+    """Changes whenever any field served by /api/status changes."""
+    sink = entry.get("sink")
+    return (
+        session_id,
+        sink.version if sink else None,
+        entry["status"],
+        len(entry["subtopics"]),
+        entry.get("error"),
+    )
+
+
+def status_body(session_id: str, entry: dict) -> bytes:
+    """Encodes the ContentResponse fields of a session_store entry."""
+    return json.dumps({
+        "session_id": session_id,
+        "status": entry["status"],
+        "topic": entry["topic"],
+        "subtopics": entry["subtopics"],
+        "content": entry["content"],
+        "error": entry.get("error"),
+    }, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def get_status_snapshot(session_id: str, entry: dict) -> StatusSnapshot:
+    """Returns the cached snapshot of an entry, rebuilding it only if the content changed.
+
+    The snapshot lives in the entry itself, so it is dropped together with the entry.
+    """
+    key = snapshot_key(session_id, entry)
+    snapshot = entry.get("status_snapshot")
+    if snapshot is None or snapshot.key != key:
+        snapshot = StatusSnapshot(key, status_body(session_id, entry))
+        entry["status_snapshot"] = snapshot
+    return snapshot
+
+
+def choose_encoding(accept_encoding: Optional[str], body_size: int) -> str:
+    """Picks br, gzip or identity from an Accept-Encoding header."""
+    if body_size < COMPRESS_MIN_BYTES or not accept_encoding:
+        return "identity"
+
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
@@ -0,0 +1,227 @@
+"""
+Near-duplicate subtopic index for artifact reuse.
+The topic generator words the same subtopic differently from course to course ("The Role of HTML in
+Structuring Web Content" vs "HTML and Web Page Structure"), so exact keys rarely hit. Every
+generated subtopic is indexed by a MinHash signature of its title, bucketed with LSH, plus the
+keywords of its title and webpage headings. A new subtopic whose best match scores above
+ACHARYA_SUBTOPIC_REUSE_THRESHOLD, and shares nearly all keywords with it in both directions,
+reuses the stored artifacts instead of running its agents. Reused content is served as the new
+subtopic, so matching errs on the side of generating. Off unless ACHARYA_SUBTOPIC_REUSE=1.
+Everything runs locally on the CPU; no embedding service is involved.
+"""
+import gzip
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Optional
+
+SUBTOPIC_REUSE_ENABLED = os.getenv("ACHARYA_SUBTOPIC_REUSE", "0") == "1"
+# Score in [0, 1]: the mean of the estimated title Jaccard similarity and the keyword containment
+# (the lower of the two below)
+REUSE_THRESHOLD = float(os.getenv("ACHARYA_SUBTOPIC_REUSE_THRESHOLD", "0.85"))
+# Both shares must reach this: the new title's keywords found in the stored title and webpage
+# headings, and the stored title's keywords found in the new title. "Python Sets and Lists" must
+# not reuse "Python Lists and Tuples"
+MIN_CONTAINMENT = float(os.getenv("ACHARYA_SUBTOPIC_REUSE_MIN_CONTAINMENT", "0.8"))
+MAX_AGE = int(os.getenv("ACHARYA_SUBTOPIC_REUSE_MAX_AGE", str(30 * 24 * 3600)))
+
+NUM_PERMUTATIONS = 64
+# 32 bands of 2 rows: titles with a Jaccard similarity of 0.3 share a bucket with 95% probability
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+# Titles with fewer keywords ("Introduction", "Conclusion") are too generic to match
+MIN_KEYWORDS = 2
+
+_PRIME = (1 << 61) - 1
+# Fixed seed, so signatures stay comparable across restarts
+_rng = random.Random(1234)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "basics", "by", "for", "from", "how", "in", "into", "introduction",
+    "is", "its", "of", "on", "or", "overview", "role", "the", "their", "they", "this", "to", "understanding", "what",
+    "why", "with",
+}
+SUFFIXES = ("ing", "ion", "ed", "es", "al", "s")
+# Roman numerals up to 39, as in "World War II" or "Henry VIII"
+ROMAN_NUMERAL = re.compile(r"x{0,3}(ix|iv|v?i{0,3})")
+
+
+def _stem(word: str) -> str:
+    """Strips one common suffix and a final e, so structure, structuring and structured share a stem."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def keywords(text: str) -> set:
+    return {_stem(word) for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS}
+
+
+def numerals(text: str) -> set:
+    """Words with digits, and roman numerals: titles that differ in these are about different things."""
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower())
+            if any(c.isdigit() for c in word) or ROMAN_NUMERAL.fullmatch(word)}
+
+
+def containment(query_keywords: set, title: str, stored_keywords: set) -> float:
+    """The lower of the share of the query's keywords in the stored keywords (title and headings)
+    and the share of the stored title's keywords in the query."""
+    title_keywords = keywords(title)
+    if not query_keywords or not title_keywords:
+        return 0.0
+    forward = len(query_keywords & stored_keywords) / len(query_keywords)
+    reverse = len(title_keywords & query_keywords) / len(title_keywords)
+    return min(forward, reverse)
+
+
+def shingles(text: str) -> set:
+    """Character 3-grams of each keyword, which also catch spelling variants of a word."""
+    grams = set()
+    for word in keywords(text):
+        word = f"#{word}#"
+        grams.update(word[i:i + SHINGLE_SIZE] for i in range(len(word) - SHINGLE_SIZE + 1))
+    return grams
+
+
+def minhash(grams: set) -> list:
+    hashes = [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimate_jaccard(signature: list, other: list) -> float:
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERMUTATIONS
+
+
+def _bands(signature: list) -> list:
+    return [f"{band}:" + ",".join(map(str, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]))
+            for band in range(LSH_BANDS)]
+
+
+def page_headings(markdown: str) -> str:
+    return " ".join(line.lstrip("#").strip() for line in markdown.splitlines() if line.startswith("#"))
+
+
+class SubtopicIndex:
+    """Stored subtopic content slots, searchable by similar titles."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.json"
+        self.lock = threading.Lock()
+        # id -> {"topic", "title", "signature", "keywords", "artifacts", "created_at"}
+        self.entries = self._load_index()
+        # LSH band -> ids of the entries in that bucket
+        self.buckets = {}
+        for entry_id, item in self.entries.items():
+            self._add_to_buckets(entry_id, item["signature"])
+        self.stats = {"lookups": 0, "reused": 0, "indexed": 0, "expired": 0}
+
+    def _load_index(self) -> dict:
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Could not read subtopic index: {e}")
+            return {}
+
+    def save(self) -> None:
+        with self.lock:
+            data = json.dumps(self.entries)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(data)
+        tmp_path.replace(self.index_path)
+
+    def _path(self, entry_id: str) -> Path:
+        return self.directory / f"{entry_id}.json.gz"
+
+    def _add_to_buckets(self, entry_id: str, signature: list) -> None:
+        for band in _bands(signature):
+            self.buckets.setdefault(band, set()).add(entry_id)
+
+    def add(self, topic: str, title: str, content: dict, artifacts: list) -> None:
+        """Indexes the content slot of a generated subtopic."""
+        grams = shingles(title)
+        if not grams or not content.get("webContent"):
+            return
+        entry_id = str(uuid.uuid4())
+        signature = minhash(grams)
+        with gzip.open(self._path(entry_id), "wt", encoding="utf-8") as f:
+            json.dump(content, f)
+        with self.lock:
+            self.entries[entry_id] = {
+                "topic": topic,
+                "title": title,
+                "signature": signature,
+                "keywords": sorted(keywords(title) | keywords(page_headings(content["webContent"]))),
+                "artifacts": artifacts,
+                "created_at": time.time(),
+            }
+            self._add_to_buckets(entry_id, signature)
+        self.stats["indexed"] += 1
+
+    def find(self, title: str) -> Optional[dict]:
+        """Returns {"id", "title", "score", "content"} of the best match above the threshold."""
+        self.stats["lookups"] += 1
+        query_keywords = keywords(title)
+        if len(query_keywords) < MIN_KEYWORDS:
+            return None
+        signature = minhash(shingles(title))
+        query_numerals = numerals(title)
+
+        with self.lock:
+            candidates = set()
+            for band in _bands(signature):
+                candidates |= self.buckets.get(band, set())
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                item = self.entries.get(entry_id)
+                if item is None or time.time() - item["created_at"] > MAX_AGE:
+                    continue
+                # "World War II" is not "World War I", nor "HTML5" "HTML4"
+                if numerals(item["title"]) != query_numerals:
+                    continue
+                shared = containment(query_keywords, item["title"], set(item["keywords"]))
+                if shared < MIN_CONTAINMENT:
+                    continue
+                score = (estimate_jaccard(signature, item["signature"]) + shared) / 2
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None or best_score < REUSE_THRESHOLD:
+                return None
+            match_title = self.entries[best_id]["title"]
+
+        try:
+            with gzip.open(self._path(best_id), "rt", encoding="utf-8") as f:
+                content = json.load(f)
+        except OSError:
+            return None
+        self.stats["reused"] += 1
+        return {"id": best_id, "title": match_title, "score": round(best_score, 3), "content": content}
+
+    def expire(self) -> int:
+        now = time.time()
+        with self.lock:
+            expired = [entry_id for entry_id, item in self.entries.items() if now - item["created_at"] > MAX_AGE]
+            for entry_id in expired:
+                for band in _bands(self.entries.pop(entry_id)["signature"]):
+                    self.buckets.get(band, set()).discard(entry_id)
+        for entry_id in expired:
+            self._path(entry_id).unlink(missing_ok=True)
+        self.stats["expired"] += len(expired)
+        return len(expired)
+
+    def artifacts(self) -> set:
+        with self.lock:
+            return {name for item in self.entries.values() for name in item.get("artifacts", [])}
@@ -0,0 +1,239 @@
+"""
+Signed completion webhooks for API clients.
+A session created with a callback_url gets a POST when each subtopic is complete and when the
+session completes or fails. Notifications go through an in-memory delivery queue and are retried
+with exponential backoff, so a slow or failing receiver never holds up generation.
+Callback hosts must resolve to public addresses, checked when the URL is submitted and again
+before every delivery attempt, which is then sent to the checked address; otherwise any API
+caller could make the server POST into its internal network.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import socket
+import time
+import uuid
+from urllib.parse import urlparse
+
+import httpx
+
+from teacher_agent.metrics import WEBHOOK_DELIVERIES
+
+# Key of the HMAC-SHA256 signature; callback URLs are refused while it is unset
+WEBHOOK_SECRET = os.getenv("ACHARYA_WEBHOOK_SECRET", "")
+# Comma-separated hosts callbacks may point at; empty allows any host with a public address.
+# Listed hosts may also resolve to private addresses
+ALLOWED_HOSTS = {host.strip() for host in os.getenv("ACHARYA_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()}
+# Allows callbacks to loopback, link-local and private addresses on any host, e.g. in development
+ALLOW_PRIVATE = os.getenv("ACHARYA_WEBHOOK_ALLOW_PRIVATE", "0") == "1"
+MAX_ATTEMPTS = int(os.getenv("ACHARYA_WEBHOOK_MAX_ATTEMPTS", "8"))
+# First retry delay in seconds, doubled on each attempt up to MAX_BACKOFF
+BACKOFF = float(os.getenv("ACHARYA_WEBHOOK_BACKOFF", "2"))
+MAX_BACKOFF = float(os.getenv("ACHARYA_WEBHOOK_MAX_BACKOFF", "300"))
+TIMEOUT = float(os.getenv("ACHARYA_WEBHOOK_TIMEOUT", "10"))
+WORKERS = int(os.getenv("ACHARYA_WEBHOOK_WORKERS", "4"))
+
+SIGNATURE_HEADER = "X-Acharya-Signature"
+
+
+def _port(parsed) -> int:
+    return parsed.port or (443 if parsed.scheme == "https" else 80)
+
+
+def _needs_address_check(hostname: str) -> bool:
+    return not ALLOW_PRIVATE and hostname not in ALLOWED_HOSTS
+
+
+def check_addresses(hostname: str, addresses: list) -> None:
+    """Raises ValueError unless every address a host resolves to is public."""
+    if not addresses:
+        raise ValueError(f"callback_url host {hostname} does not resolve")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global:
+            raise ValueError(f"callback_url host {hostname} resolves to a non-public address")
+
+
+def validate_callback_url(url: str) -> str:
+    """Returns the URL if callbacks may be sent to it, otherwise raises ValueError.
+
+    Resolves the host, so call it from a worker thread when on the event loop.
+    """
+    if not WEBHOOK_SECRET:
+        raise ValueError("Webhooks are not configured on this server")
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    if ALLOWED_HOSTS and parsed.hostname not in ALLOWED_HOSTS:
+        raise ValueError(f"callback_url host {parsed.hostname} is not allowed")
+    if _needs_address_check(parsed.hostname):
+        try:
+            infos = socket.getaddrinfo(parsed.hostname, _port(parsed), type=socket.SOCK_STREAM)
+        except OSError:
+            raise ValueError(f"callback_url host {parsed.hostname} does not resolve")
+        check_addresses(parsed.hostname, [info[4][0] for info in infos])
+    return url
+
+
+async def pinned_request(url: str) -> tuple:
+    """Resolves and checks a callback host again, against DNS rebinding since it was validated.
+
+    Returns the URL with the host replaced by the checked address, the Host header and the
+    request extensions (the TLS server name) to send to it. Raises ValueError if the host now
+    resolves to a non-public address, and OSError if it does not resolve.
+    """
+    parsed = urlparse(url)
+    if not _needs_address_check(parsed.hostname):
+        return url, {}, {}
+    infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, _port(parsed), type=socket.SOCK_STREAM)
+    addresses = [info[4][0] for info in infos]
+    check_addresses(parsed.hostname, addresses)
+    address = addresses[0]
+    host = f"[{address}]" if ":" in address else address
+    if parsed.port:
+        host = f"{host}:{parsed.port}"
+    return (
+        parsed._replace(netloc=host).geturl(),
+        {"Host": parsed.netloc.rsplit("@", 1)[-1]},
+        {"sni_hostname": parsed.hostname},
+    )
+
+
+def sign(body: bytes, timestamp: int, secret: str = WEBHOOK_SECRET) -> str:
+    """Signature header value: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">.
+
+    Receivers recompute the HMAC with the shared secret and reject stale timestamps, which
+    stops replayed notifications.
+    """
+    digest = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("utf-8") + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def session_payload(session_id: str, entry: dict) -> dict:
+    """Outcome of a session; the content itself is fetched once from status_url."""
+    # services.content imports the agent modules, which the server loads lazily (services/pipeline.py)
+    from services.content import API_BASE_URL
+
+    return {
+        "status": entry["status"],
+        "error": entry.get("error"),
+        "subtopics": entry["subtopics"],
+        "status_url": f"{API_BASE_URL}/api/status/{session_id}",
+    }
+
+
+class Delivery:
+    """One notification to one callback URL, with its retry state."""
+
+    def __init__(self, url: str, event: str, payload: dict):
+        self.id = str(uuid.uuid4())
+        self.url = url
+        self.event = event
+        self.body = json.dumps({"id": self.id, "event": event, **payload}).encode("utf-8")
+        self.attempts = 0
+
+
+class WebhookDispatcher:
+    """Delivers queued notifications with WORKERS concurrent senders until cancelled."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        # Retries waiting for their backoff to expire
+        self.scheduled = {}
+        self.stats = {"delivered": 0, "retried": 0, "failed": 0}
+
+    def notify(self, session_id: str, entry: dict, event: str, **payload) -> None:
+        """Queues a notification for a session_store entry; a no-op without a callback URL."""
+        url = entry.get("callback_url")
+        if not url:
+            return
+        # Receivers order notifications by sequence, since retries can deliver them out of order
+        entry["webhook_sequence"] = entry.get("webhook_sequence", 0) + 1
+        self.queue.put_nowait(Delivery(url, event, {
+            "session_id": session_id,
+            "sequence": entry["webhook_sequence"],
+            "timestamp": time.time(),
+            "topic": entry.get("topic"),
+            **payload,
+        }))
+
+    async def run(self) -> None:
+        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
+            workers = [asyncio.create_task(self._work(client)) for _ in range(WORKERS)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                for handle in self.scheduled.values():
+                    handle.cancel()
+                pending = self.queue.qsize() + len(self.scheduled)
+                if pending:
+                    print(f"Dropping {pending} undelivered webhook notifications")
+
+    async def _work(self, client: httpx.AsyncClient) -> None:
+        while True:
+            delivery = await self.queue.get()
+            try:
+                await self._deliver(client, delivery)
+            except Exception as e:
+                print(f"Error delivering webhook {delivery.id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, client: httpx.AsyncClient, delivery: Delivery) -> None:
+        delivery.attempts += 1
+        headers = {
+            "Content-Type": "application/json",
+            "X-Acharya-Event": delivery.event,
+            "X-Acharya-Delivery": delivery.id,
+            SIGNATURE_HEADER: sign(delivery.body, int(time.time())),
+        }
+        try:
+            url, host_header, extensions = await pinned_request(delivery.url)
+        except ValueError as e:
+            self.stats["failed"] += 1
+            WEBHOOK_DELIVERIES.labels(event=delivery.event, outcome="failed").inc()
+            print(f"Refusing webhook {delivery.event} to {delivery.url}: {e}")
+            return
+        except OSError as e:
+            url, status, error = None, None, f"DNS error: {e}"
+
+        if url is not None:
+            try:
+                response = await client.post(url, content=delivery.body, headers={**headers, **host_header},
+                                             extensions=extensions)
+                status = response.status_code
+                error = None if status < 300 else f"HTTP {status}"
+            except httpx.HTTPError as e:
+                status = None
+                error = str(e) or type(e).__name__
+
+        if error is None:
+            self.stats["delivered"] += 1
+            WEBHOOK_DELIVERIES.labels(event=delivery.event, outcome="delivered").inc()
+            return
+
+        # Client errors other than timeouts and rate limits will not succeed on a retry
+        retryable = status is None or status in (408, 429) or status >= 500
+        if not retryable or delivery.attempts >= MAX_ATTEMPTS:
+            self.stats["failed"] += 1
+            WEBHOOK_DELIVERIES.labels(event=delivery.event, outcome="failed").inc()
+            print(f"Giving up on webhook {delivery.event} to {delivery.url} after {delivery.attempts} attempts: {error}")
+            return
+
+        # Full jitter, so receivers that come back up are not hit by every retry at once
+        delay = random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** (delivery.attempts - 1)))
+        self.stats["retried"] += 1
+        WEBHOOK_DELIVERIES.labels(event=delivery.event, outcome="retried").inc()
+        self.scheduled[delivery.id] = asyncio.get_running_loop().call_later(delay, self._requeue, delivery)
+
+    def _requeue(self, delivery: Delivery) -> None:
+        self.scheduled.pop(delivery.id, None)
+        self.queue.put_nowait(delivery)
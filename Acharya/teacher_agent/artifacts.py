@@ -0,0 +1,6 @@
+import os
+from pathlib import Path
+
+# Folders where the podcast and image agents save their files and the API server serves them from
+PODCAST_DIR = Path(os.getenv("ACHARYA_PODCAST_DIR", r"C:\Users\DELL\OneDrive\Desktop\Project\Hackathons\Acharya\podcasts"))
+IMAGE_DIR = Path(os.getenv("ACHARYA_IMAGE_DIR", r"C:\Users\DELL\OneDrive\Desktop\Project\Hackathons\Acharya\images"))
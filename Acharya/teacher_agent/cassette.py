@@ -0,0 +1,211 @@
+"""
+Record/replay backend for Gemini, SerpAPI, image downloads and TTS.
+With ACHARYA_CASSETTE_MODE=record, live responses are saved to a cassette file. With
+ACHARYA_CASSETTE_MODE=replay, they are served from the cassette with synthetic latency and
+injected 429/503 errors, so the pipeline runs deterministically without network access.
+"""
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import AsyncGenerator, Callable, Optional
+
+from google.adk.models import BaseLlm, Gemini, LlmRequest, LlmResponse
+
+# off | record | replay
+CASSETTE_MODE = os.getenv("ACHARYA_CASSETTE_MODE", "off")
+CASSETTE_PATH = Path(os.getenv("ACHARYA_CASSETTE", "./cassettes/default.json.gz"))
+# Strict replay fails on requests that were not recorded; otherwise the next recording
+# of the same agent (or tool) is served, so prompt changes do not invalidate a cassette
+CASSETTE_STRICT = os.getenv("ACHARYA_CASSETTE_STRICT", "0") == "1"
+
+# Fixed replay latency in seconds; unset replays the recorded latency times the scale
+REPLAY_LATENCY = os.getenv("ACHARYA_REPLAY_LATENCY")
+REPLAY_LATENCY_SCALE = float(os.getenv("ACHARYA_REPLAY_LATENCY_SCALE", "1"))
+REPLAY_ERROR_RATE = float(os.getenv("ACHARYA_REPLAY_ERROR_RATE", "0"))
+REPLAY_ERROR_CODES = [int(code) for code in os.getenv("ACHARYA_REPLAY_ERROR_CODES", "429,503").split(",") if code.strip()]
+REPLAY_SEED = int(os.getenv("ACHARYA_REPLAY_SEED", "0"))
+
+# Messages shaped like the real API errors, so retry logic and error classification treat them alike
+INJECTED_ERROR_MESSAGES = {
+    429: "429 RESOURCE_EXHAUSTED. Injected by cassette replay: rate limit exceeded.",
+    503: "503 UNAVAILABLE. Injected by cassette replay: the model is overloaded.",
+}
+
+
+class CassetteMiss(Exception):
+    """A replayed request has no recording."""
+
+
+class InjectedError(Exception):
+    """A synthetic API error raised during replay."""
+
+
+def _normalize(key_data) -> str:
+    # Agent names carry a per-process counter (flashcard_agent_7), which must not change the key
+    text = json.dumps(key_data, sort_keys=True, default=str)
+    return re.sub(r"(?<=[a-z])_\d+\b", "_N", text)
+
+
+def request_key(key_data) -> str:
+    return hashlib.sha256(_normalize(key_data).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded interactions, looked up by request key or, leniently, by kind and role."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.rng = random.Random(REPLAY_SEED)
+        self.by_key = {}
+        self.by_role = {}
+        self.cursors = {}
+        self.stats = {"calls": {}, "misses": 0, "injected_errors": 0, "recorded": 0}
+
+        if path.exists():
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for interaction in json.load(f)["interactions"]:
+                    self._index(interaction)
+
+    def _index(self, interaction: dict) -> None:
+        self.by_key.setdefault(interaction["key"], []).append(interaction)
+        self.by_role.setdefault((interaction["kind"], interaction["role"]), []).append(interaction)
+
+    def _next(self, bucket_name, bucket: list) -> dict:
+        # Repeated identical requests replay their recordings in order, then cycle
+        cursor = self.cursors.get(bucket_name, 0)
+        self.cursors[bucket_name] = cursor + 1
+        return bucket[cursor % len(bucket)]
+
+    def count_call(self, kind: str) -> None:
+        with self.lock:
+            self.stats["calls"][kind] = self.stats["calls"].get(kind, 0) + 1
+
+    def lookup(self, kind: str, role: str, key: str) -> dict:
+        with self.lock:
+            if key in self.by_key:
+                return self._next(("key", key), self.by_key[key])
+            self.stats["misses"] += 1
+            if not CASSETTE_STRICT and (kind, role) in self.by_role:
+                return self._next(("role", kind, role), self.by_role[(kind, role)])
+        raise CassetteMiss(f"No recording for {kind} {role} ({key[:12]}) in {self.path}")
+
+    def record(self, kind: str, role: str, key: str, latency: float, response) -> None:
+        with self.lock:
+            self._index({"kind": kind, "role": role, "key": key, "latency": latency, "response": response})
+            self.stats["recorded"] += 1
+
+    def replay_delay(self, interaction: dict) -> float:
+        if REPLAY_LATENCY is not None:
+            return float(REPLAY_LATENCY)
+        return interaction.get("latency", 0) * REPLAY_LATENCY_SCALE
+
+    def maybe_inject_error(self, kind: str, role: str) -> None:
+        with self.lock:
+            inject = REPLAY_ERROR_CODES and self.rng.random() < REPLAY_ERROR_RATE
+            code = self.rng.choice(REPLAY_ERROR_CODES) if inject else None
+            if inject:
+                self.stats["injected_errors"] += 1
+        if code is not None:
+            raise InjectedError(INJECTED_ERROR_MESSAGES.get(code, f"{code} Injected by cassette replay ({kind} {role})"))
+
+    def save(self) -> None:
+        with self.lock:
+            interactions = [interaction for bucket in self.by_key.values() for interaction in bucket]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump({"interactions": interactions}, f)
+
+
+cassette: Optional[Cassette] = Cassette(CASSETTE_PATH) if CASSETTE_MODE in ("record", "replay") else None
+
+
+def save_cassette() -> None:
+    if cassette is not None and CASSETTE_MODE == "record":
+        cassette.save()
+        print(f"Saved {cassette.stats['recorded']} recorded interactions to {cassette.path}")
+
+
+def replay_call(kind: str, role: str, key_data, live: Callable[[], object]):
+    """Runs a blocking call through the cassette. live() must return a JSON-serializable value."""
+    if cassette is None:
+        return live()
+
+    cassette.count_call(kind)
+    key = request_key(key_data)
+
+    if CASSETTE_MODE == "replay":
+        interaction = cassette.lookup(kind, role, key)
+        time.sleep(cassette.replay_delay(interaction))
+        cassette.maybe_inject_error(kind, role)
+        return interaction["response"]
+
+    start = time.perf_counter()
+    response = live()
+    cassette.record(kind, role, key, time.perf_counter() - start, response)
+    return response
+
+
+def encode_bytes(data: Optional[bytes]) -> Optional[str]:
+    return base64.b64encode(data).decode("ascii") if data is not None else None
+
+
+def decode_bytes(data: Optional[str]) -> Optional[bytes]:
+    return base64.b64decode(data) if data is not None else None
+
+
+def _agent_role(llm_request: LlmRequest) -> str:
+    # ADK puts the agent's name into its system instruction
+    instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+    match = re.search(r'internal name is "([\w]+?)(?:_\d+)?"', instruction)
+    return match.group(1) if match else llm_request.model or "unknown"
+
+
+class CassetteLlm(BaseLlm):
+    """Gemini model whose responses are recorded to, or replayed from, the cassette."""
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        role = _agent_role(llm_request)
+        cassette.count_call("llm")
+        key = request_key({
+            "model": llm_request.model,
+            "system_instruction": llm_request.config.system_instruction if llm_request.config else None,
+            "contents": [content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents],
+        })
+
+        if CASSETTE_MODE == "replay":
+            interaction = cassette.lookup("llm", role, key)
+            await asyncio.sleep(cassette.replay_delay(interaction))
+            cassette.maybe_inject_error("llm", role)
+            for response in interaction["response"]:
+                yield LlmResponse.model_validate(response)
+            return
+
+        start = time.perf_counter()
+        responses = []
+        async for response in Gemini(model=self.model).generate_content_async(llm_request, stream=stream):
+            responses.append(response.model_dump(mode="json", exclude_none=True))
+            yield response
+        cassette.record("llm", role, key, time.perf_counter() - start, responses)
+
+
+def model_backend(model: str):
+    """Returns the model to configure an agent with: the plain model name unless a cassette is active."""
+    if cassette is None:
+        return model
+    return CassetteLlm(model=model)
+
+
+def model_llm(model: str) -> BaseLlm:
+    """Returns a BaseLlm for direct calls outside an agent, honoring the cassette."""
+    if cassette is None:
+        return Gemini(model=model)
+    return CassetteLlm(model=model)
@@ -0,0 +1,201 @@
+"""
+Prometheus metrics for the generation pipeline.
+Agent, model and tool timings are recorded by MetricsPlugin (plugins.py) on every Runner; TTS, image
+search/download, throttling sleeps, retries and artifact writes are recorded where they happen.
+The helpers below also record their operations as spans of the session's trace (see tracing.py).
+"""
+import asyncio
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .tracing import add_event, traced
+
+# Multiplies the deliberate pipeline sleeps (e.g. 0 for replayed benchmarks)
+THROTTLE_SCALE = float(os.getenv("ACHARYA_THROTTLE_SCALE", "1"))
+
+# Model calls and agents take seconds to minutes; TTS and the factory stage can take several minutes
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+
+AGENT_DURATION = Histogram(
+    "acharya_agent_duration_seconds",
+    "Time from an agent starting to it finishing, excluding its after_agent_callback",
+    ["agent"],
+    buckets=DURATION_BUCKETS,
+)
+MODEL_CALL_DURATION = Histogram(
+    "acharya_model_call_duration_seconds",
+    "Latency of a single LLM call",
+    ["agent", "model"],
+    buckets=DURATION_BUCKETS,
+)
+MODEL_TOKENS = Histogram(
+    "acharya_model_tokens",
+    "Tokens per LLM call by kind (prompt, cached, output, thoughts)",
+    ["model", "kind"],
+    buckets=TOKEN_BUCKETS,
+)
+TOOL_DURATION = Histogram(
+    "acharya_tool_duration_seconds",
+    "Latency of a tool call",
+    ["tool"],
+    buckets=DURATION_BUCKETS,
+)
+OPERATION_DURATION = Histogram(
+    "acharya_operation_duration_seconds",
+    "Latency of non-agent operations (pipeline stages, TTS, image search and download)",
+    ["operation"],
+    buckets=DURATION_BUCKETS,
+)
+RATE_LIMIT_WAIT = Histogram(
+    "acharya_rate_limit_wait_seconds",
+    "Time spent in deliberate throttling sleeps and retry backoff",
+    ["stage"],
+    buckets=DURATION_BUCKETS,
+)
+RETRIES = Counter(
+    "acharya_retries_total",
+    "Retried calls by operation",
+    ["operation"],
+)
+ERRORS = Counter(
+    "acharya_errors_total",
+    "Errors by where they happened and their class",
+    ["source", "category"],
+)
+SESSIONS_ACTIVE = Gauge(
+    "acharya_sessions_active",
+    "Sessions currently generating content",
+)
+SESSIONS_QUEUED = Gauge(
+    "acharya_sessions_queued",
+    "Sessions accepted but not yet started",
+)
+SCHEDULER_WAIT = Histogram(
+    "acharya_scheduler_wait_seconds",
+    "Time a session or model call waited for a fair-share slot",
+    ["scheduler"],
+    buckets=DURATION_BUCKETS,
+)
+SCHEDULER_QUEUED = Gauge(
+    "acharya_scheduler_queued",
+    "Sessions or model calls waiting for a fair-share slot",
+    ["scheduler"],
+)
+EVENT_LOOP_LAG = Histogram(
+    "acharya_event_loop_lag_seconds",
+    "How late the API server's event loop ran a 100 ms heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+BLOCKED_EVENT_LOOP = Counter(
+    "acharya_event_loop_blocked_total",
+    "Times the event loop was blocked for longer than the lag threshold",
+)
+WEBHOOK_DELIVERIES = Counter(
+    "acharya_webhook_deliveries_total",
+    "Webhook delivery attempts by event and outcome (delivered, retried, failed)",
+    ["event", "outcome"],
+)
+SUBTOPICS_GENERATED = Counter(
+    "acharya_subtopics_total",
+    "Subtopics of new sessions by source (generated, or reused from a near-duplicate)",
+    ["source"],
+)
+PROCESS_POOL_DURATION = Histogram(
+    "acharya_process_pool_task_duration_seconds",
+    "Time a CPU-bound task took in the process pool, including transfer to and from the worker",
+    ["task"],
+    buckets=DURATION_BUCKETS,
+)
+PROCESS_POOL_WAIT = Histogram(
+    "acharya_process_pool_wait_seconds",
+    "Time a CPU-bound task waited because the process pool queue was full",
+    ["task"],
+    buckets=DURATION_BUCKETS,
+)
+PROCESS_POOL_PENDING = Gauge(
+    "acharya_process_pool_pending",
+    "CPU-bound tasks submitted to the process pool or waiting to be",
+)
+PROCESS_POOL_TASKS = Counter(
+    "acharya_process_pool_tasks_total",
+    "CPU-bound tasks by outcome (ok, error, timeout)",
+    ["task", "outcome"],
+)
+MODEL_COST = Counter(
+    "acharya_model_cost_usd_total",
+    "Estimated cost of model and TTS calls in USD, from the list prices in usage.py",
+    ["agent", "model"],
+)
+BUDGET_ACTIONS = Counter(
+    "acharya_budget_actions_total",
+    "Model calls downgraded to a cheaper model, or refused (cutoff), because a usage budget ran low",
+    ["action"],
+)
+ARTIFACT_BYTES_WRITTEN = Counter(
+    "acharya_artifact_bytes_written_total",
+    "Bytes of podcast audio and images written to disk",
+    ["kind"],
+)
+
+
+def classify_error(error) -> str:
+    """Classifies an error into the categories the API reports to users."""
+    error_str = str(error).lower()
+    if "503" in error_str or "overloaded" in error_str:
+        return "overloaded"
+    elif "429" in error_str or "rate limit" in error_str:
+        return "rate_limited"
+    elif "401" in error_str or "unauthorized" in error_str:
+        return "unauthorized"
+    elif "400" in error_str or "invalid" in error_str:
+        return "invalid_request"
+    elif "timeout" in error_str:
+        return "timeout"
+    elif "connection" in error_str:
+        return "connection"
+    return "other"
+
+
+def agent_role(agent_name: str) -> str:
+    """Strips the per-subtopic index, so flashcard_agent_3 is reported as flashcard_agent."""
+    return re.sub(r"_\d+$", "", agent_name)
+
+
+def record_error(source: str, error) -> None:
+    ERRORS.labels(source=source, category=classify_error(error)).inc()
+
+
+def record_retry(operation: str) -> None:
+    RETRIES.labels(operation=operation).inc()
+    add_event("retry", operation=operation)
+
+
+@contextmanager
+def timed(operation: str):
+    """Records the duration of the enclosed block under acharya_operation_duration_seconds."""
+    start = time.perf_counter()
+    try:
+        with traced(operation):
+            yield
+    finally:
+        OPERATION_DURATION.labels(operation=operation).observe(time.perf_counter() - start)
+
+
+async def throttle(seconds: float, stage: str) -> None:
+    """asyncio.sleep that is recorded as rate-limiter wait time."""
+    seconds *= THROTTLE_SCALE
+    RATE_LIMIT_WAIT.labels(stage=stage).observe(seconds)
+    with traced(f"sleep {stage}", kind="sleep", seconds=seconds):
+        await asyncio.sleep(seconds)
+
+
+def backoff_sleep(seconds: float, stage: str) -> None:
+    """Blocking counterpart of throttle for synchronous tools."""
+    RATE_LIMIT_WAIT.labels(stage=stage).observe(seconds)
+    with traced(f"sleep {stage}", kind="sleep", seconds=seconds):
+        time.sleep(seconds)
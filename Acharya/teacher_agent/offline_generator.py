@@ -0,0 +1,294 @@
+import asyncio
+import json
+import random
+import re
+import zlib
+from typing import Optional
+
+import httpx
+from google.genai import errors, types
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+
+# Gemini errors that mean the service is overloaded or briefly unavailable, not that the request
+# or the configuration is wrong
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_STATUSES = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "INTERNAL", "DEADLINE_EXCEEDED"}
+
+FLASHCARD_COUNT = 5
+QUIZ_QUESTION_COUNT = 5
+OPTION_LETTERS = ["A", "B", "C", "D"]
+# Options that fill a question up to four when the pages have too few other terms
+FILLER_OPTIONS = ["None of the above", "All of the above", "Not covered on this page"]
+
+# Definition patterns like "HTTP is a protocol ..." or "HTTP refers to ...".
+DEFINITION_PATTERN = re.compile(
+    r"^(?P<term>[A-Z][\w\-() /]{1,60}?)\s+(?:is|are|refers to|describes|means)\s+(?P<definition>.{15,})$"
+)
+# Bullet labels like "- **Term**: definition" or "- **Term** - definition".
+LABELLED_BULLET_PATTERN = re.compile(r"^\s*[-*]\s+\*\*(?P<term>[^*]{2,60})\*\*\s*[:\-–—]\s*(?P<definition>.{10,})$")
+BOLD_PATTERN = re.compile(r"\*\*([^*]{2,60})\*\*")
+
+# Sentences starting with these ("The products are ...", "It is ...") do not define a term.
+NON_TERM_WORDS = {"a", "an", "it", "its", "that", "the", "there", "these", "they", "this", "those"}
+
+# Headings that name a section rather than a concept are never used as terms.
+GENERIC_HEADINGS = {"overview", "introduction", "conclusion", "summary", "references", "key terms", "key concepts"}
+
+
+def _plain(text: str) -> str:
+    """Strips inline markdown (links, emphasis, code) from a line of text."""
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", text)
+    text = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"[*_`]+", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _sentences(markdown: str) -> list:
+    """Returns the prose sentences of the page, skipping headings and the References section."""
+    body = markdown.split("\n## References", 1)[0]
+    sentences = []
+    for line in body.split("\n"):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        line = re.sub(r"^([-*]|\d+\.)\s+", "", line)
+        for sentence in re.split(r"(?<=[.!?])\s+", _plain(line)):
+            if 40 <= len(sentence) <= 300:
+                sentences.append(sentence)
+    return sentences
+
+
+def extract_definitions(markdown: str) -> list:
+    """Returns (term, definition) pairs from labelled bullets and "X is ..." sentences."""
+    definitions = []
+    seen = set()
+
+    body = markdown.split("\n## References", 1)[0]
+    for line in body.split("\n"):
+        match = LABELLED_BULLET_PATTERN.match(line)
+        if match:
+            term, definition = _plain(match.group("term")), _plain(match.group("definition"))
+            if term.lower() not in seen:
+                seen.add(term.lower())
+                definitions.append((term, definition))
+
+    for sentence in _sentences(markdown):
+        match = DEFINITION_PATTERN.match(sentence)
+        if match:
+            term = match.group("term").strip()
+            if term.lower() not in seen and len(term.split()) <= 6 and term.split()[0].lower() not in NON_TERM_WORDS:
+                seen.add(term.lower())
+                definitions.append((term, sentence))
+
+    return definitions
+
+
+def extract_key_terms(markdown: str) -> list:
+    """Returns key terms from bold text, definitions and headings, most specific first."""
+    terms = []
+    for term, _ in extract_definitions(markdown):
+        terms.append(term)
+    for match in BOLD_PATTERN.finditer(markdown):
+        terms.append(_plain(match.group(1)).rstrip(":"))
+    for heading in re.findall(r"^#{2,4}\s+(.+)$", markdown, flags=re.MULTILINE):
+        heading = _plain(heading)
+        if heading.lower() not in GENERIC_HEADINGS and not heading.endswith("?") and len(heading.split()) <= 5:
+            terms.append(heading)
+
+    unique = []
+    for term in terms:
+        if term and len(term) <= 60 and term.lower() not in (t.lower() for t in unique):
+            unique.append(term)
+    return unique
+
+
+def _cloze_cards(markdown: str, terms: list) -> list:
+    """Builds fill-in-the-blank cards from sentences that mention a key term."""
+    cards = []
+    used_sentences = set()
+    for term in terms:
+        pattern = re.compile(rf"\b{re.escape(term)}\b", flags=re.IGNORECASE)
+        for sentence in _sentences(markdown):
+            if sentence in used_sentences or not pattern.search(sentence):
+                continue
+            used_sentences.add(sentence)
+            cards.append({
+                "question": f"Fill in the blank: {pattern.sub('_____', sentence, count=1)}",
+                "answer": term,
+            })
+            break
+    return cards
+
+
+def _section_cards(markdown: str) -> list:
+    """Builds cards that ask for the key idea of each section, answered by its first sentence."""
+    cards = []
+    body = markdown.split("\n## References", 1)[0]
+    for section in re.split(r"\n(?=#{2,4}\s)", body):
+        lines = section.strip().split("\n", 1)
+        if len(lines) < 2 or not lines[0].startswith("#"):
+            continue
+        sentences = _sentences(lines[1])
+        if sentences:
+            cards.append({"question": f"What is the key idea of {_plain(lines[0].lstrip('#'))}?", "answer": sentences[0]})
+    return cards
+
+
+def _reverse_definition_cards(definitions: list) -> list:
+    """Builds cards that ask for the term of a definition, the other way round from "What is X?"."""
+    cards = []
+    for term, definition in definitions:
+        masked = re.sub(rf"\b{re.escape(term)}\b", "_____", definition, flags=re.IGNORECASE)
+        if masked != definition:
+            cards.append({"question": f'Which term completes: "{masked}"?', "answer": term})
+    return cards
+
+
+def _statement_cards(markdown: str) -> list:
+    """Builds cards that ask to complete a sentence of the page from its first half."""
+    cards = []
+    for sentence in _sentences(markdown):
+        words = sentence.split()
+        if len(words) >= 6:
+            cards.append({"question": f'Complete the statement: "{" ".join(words[:len(words) // 2])} ..."', "answer": sentence})
+    return cards
+
+
+def generate_flashcards(markdown: str, count: int = FLASHCARD_COUNT) -> dict:
+    """Derives FlashcardList-shaped flashcards from the webpage markdown without a model call.
+
+    Definitions become "What is X?" cards. Cloze cards built from sentences that mention key
+    terms, per-section "key idea" cards, reversed definitions and sentence completions fill
+    the rest. No two cards share a question or an answer. May return fewer than count cards
+    for very short pages.
+    """
+    definitions = extract_definitions(markdown)
+    defined_terms = {term.lower() for term, _ in definitions}
+    candidates = [{"question": f"What is {term}?", "answer": definition} for term, definition in definitions]
+    candidates += [card for card in _cloze_cards(markdown, extract_key_terms(markdown)) + _section_cards(markdown)
+                   if card["answer"].lower() not in defined_terms]
+    candidates += _reverse_definition_cards(definitions) + _statement_cards(markdown)
+
+    flashcards = []
+    seen = set()
+    for card in candidates:
+        if len(flashcards) >= count:
+            break
+        question, answer = card["question"].lower(), card["answer"].lower()
+        if question in seen or answer in seen:
+            continue
+        seen.update((question, answer))
+        flashcards.append(card)
+
+    return {"flashcards": flashcards}
+
+
+def generate_quiz(markdown: str, sibling_markdowns: Optional[list] = None, count: int = QUIZ_QUESTION_COUNT) -> dict:
+    """Derives a QuizList-shaped MCQ quiz from the webpage markdown without a model call.
+
+    Each question asks for the term matching a definition (or completing a sentence). The
+    distractors are sampled from the key terms of sibling subtopics, then from other terms
+    of the same page; FILLER_OPTIONS make up the four options when there are too few. Returns
+    fewer than count questions, or none, for very short pages.
+    """
+    # Seed from the content so the same page always yields the same quiz.
+    rng = random.Random(zlib.crc32(markdown.encode("utf-8")))
+
+    own_terms = extract_key_terms(markdown)
+    sibling_terms = []
+    for sibling in sibling_markdowns or []:
+        if sibling and sibling != markdown:
+            sibling_terms.extend(extract_key_terms(sibling))
+
+    prompts = []
+    for term, definition in extract_definitions(markdown):
+        masked = re.sub(rf"\b{re.escape(term)}\b", "_____", definition, flags=re.IGNORECASE)
+        prompts.append((f'Which term is described by: "{masked}"?', term, definition))
+    for card in _cloze_cards(markdown, own_terms):
+        prompts.append((card["question"], card["answer"], card["question"].replace("_____", card["answer"])))
+
+    questions, options, correct_answers = [], [], []
+    asked = set()
+    for question, answer, explanation in prompts:
+        if len(questions) >= count or answer.lower() in asked:
+            continue
+
+        candidates = [term for term in sibling_terms if term.lower() != answer.lower()]
+        candidates += [term for term in own_terms if term.lower() != answer.lower() and term not in candidates]
+        # At least one real distractor, or the question answers itself
+        if not candidates:
+            continue
+
+        distractors = rng.sample(candidates[:30], min(len(candidates), len(OPTION_LETTERS) - 1))
+        distractors += FILLER_OPTIONS[:len(OPTION_LETTERS) - 1 - len(distractors)]
+        question_options = distractors + [answer]
+        rng.shuffle(question_options)
+        correct_index = question_options.index(answer)
+
+        asked.add(answer.lower())
+        questions.append(question)
+        options.append(question_options)
+        correct_answers.append(f"{OPTION_LETTERS[correct_index]}) {answer} - {explanation}")
+
+    return {"quiz": [{"questions": questions, "options": options, "correct_answers": correct_answers}]}
+
+
+def is_complete(result: dict, output: str) -> bool:
+    """Whether offline output fills the output schema: exactly FLASHCARD_COUNT flashcards, and
+    one quiz with at least one question whose options and answer line up."""
+    if output in ("flashcards", "assessment") and len(result.get("flashcards", [])) != FLASHCARD_COUNT:
+        return False
+    if output in ("quiz", "assessment"):
+        quizzes = result.get("quiz", [])
+        if len(quizzes) != 1 or not quizzes[0]["questions"]:
+            return False
+        quiz = quizzes[0]
+        if not len(quiz["questions"]) == len(quiz["options"]) == len(quiz["correct_answers"]):
+            return False
+    return True
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a model error is an overload, rate limit, outage or timeout."""
+    if isinstance(error, errors.APIError):
+        return error.code in TRANSIENT_CODES or error.status in TRANSIENT_STATUSES
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError,
+                              httpx.TimeoutException, httpx.NetworkError))
+
+
+def offline_fallback_on_model_error_callback(subtopic_index: int, output: str):
+    """Builds an on_model_error_callback that answers with offline flashcards and/or a quiz.
+
+    output is "flashcards", "quiz" or "assessment" (both). The source is webpage_content_N
+    from session state, and the other webpage_content_* keys serve as sibling subtopics.
+    Only overloads, rate limits, outages and timeouts are answered. Returns None, re-raising the
+    model error, for any other error (an invalid request, a bad key, a bug), or if the page is
+    missing or too short to fill the output schema.
+    """
+    content_key = f"webpage_content_{subtopic_index}"
+
+    def on_model_error_callback(callback_context: CallbackContext, llm_request: LlmRequest, error: Exception) -> Optional[LlmResponse]:
+        if not is_transient(error):
+            return None
+        state = callback_context.state.to_dict()
+        markdown = state.get(content_key)
+        if not markdown:
+            return None
+
+        siblings = [value for key, value in state.items()
+                    if key.startswith("webpage_content_") and key != content_key and isinstance(value, str)]
+
+        result = {}
+        if output in ("flashcards", "assessment"):
+            result.update(generate_flashcards(markdown))
+        if output in ("quiz", "assessment"):
+            result.update(generate_quiz(markdown, siblings))
+        if not is_complete(result, output):
+            print(f"Model error in {callback_context.agent_name} ({error}), and the page is too short for offline {output}")
+            return None
+
+        print(f"Model error in {callback_context.agent_name} ({error}), using offline {output}")
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=json.dumps(result))]))
+
+    return on_model_error_callback
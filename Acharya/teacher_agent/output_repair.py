@@ -0,0 +1,322 @@
+import json
+import re
+from typing import Callable, Optional
+
+from google.genai import types
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from pydantic import BaseModel, ValidationError
+
+from .metrics import agent_role, record_retry
+from .cassette import model_llm
+from .usage import record_model_usage
+
+FLASHCARD_COUNT = 5
+# Fewer usable cards than this cannot be padded to FLASHCARD_COUNT by reversing them
+MIN_REPAIRABLE_FLASHCARDS = 3
+QUIZ_OPTION_COUNT = 4
+MIN_SUBTOPICS = 5
+MAX_SUBTOPICS = 10
+
+# Only the last few safe cut points are tried when closing truncated JSON.
+MAX_TRUNCATION_CANDIDATES = 50
+
+
+def close_truncated_json(text: str):
+    """Parses JSON that was cut off mid-generation by closing open strings and brackets.
+
+    Returns the parsed value, or None if no prefix of the text could be turned into valid JSON.
+    """
+    stack = []
+    in_string = False
+    escape = False
+    # (index, open brackets) pairs where the text can be cut and still be closed cleanly
+    safe_points = []
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            safe_points.append((i + 1, list(stack)))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            safe_points.append((i + 1, list(stack)))
+        elif ch == ",":
+            safe_points.append((i, list(stack)))
+
+    candidates = [text + ('"' if in_string else "") + "".join(reversed(stack))]
+    for index, open_brackets in reversed(safe_points[-MAX_TRUNCATION_CANDIDATES:]):
+        candidates.append(text[:index].rstrip().rstrip(",") + "".join(reversed(open_brackets)))
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+
+    return None
+
+
+def parse_json_leniently(text: str):
+    """Parses model output as JSON, tolerating code fences, surrounding prose and truncation."""
+    if not isinstance(text, str):
+        return text
+
+    text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text.strip())
+
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        return None
+
+    return close_truncated_json(text[min(starts):])
+
+
+def _find_list(data, *keys):
+    """Returns the first list found under one of keys, or data itself if it is a list."""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key in keys:
+            if isinstance(data.get(key), list):
+                return data[key]
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+    return None
+
+
+def repair_flashcards(data) -> Optional[dict]:
+    """Coerces near-valid flashcard output into a FlashcardList dict with exactly 5 cards.
+
+    Extra cards are trimmed. Missing ones are padded with reversed cards, which ask for the
+    question of a card's answer. Returns None if fewer than 3 usable cards can be recovered.
+    """
+    cards = _find_list(parse_json_leniently(data), "flashcards", "cards")
+    if cards is None:
+        return None
+
+    flashcards = []
+    seen = set()
+    for card in cards:
+        if not isinstance(card, dict):
+            continue
+        question = card.get("question") or card.get("q") or card.get("front")
+        answer = card.get("answer") or card.get("a") or card.get("back")
+        if not question or not answer or str(question).strip().lower() in seen:
+            continue
+        seen.add(str(question).strip().lower())
+        flashcards.append({"question": str(question).strip(), "answer": str(answer).strip()})
+
+    if len(flashcards) < MIN_REPAIRABLE_FLASHCARDS:
+        return None
+
+    for card in list(flashcards):
+        if len(flashcards) >= FLASHCARD_COUNT:
+            break
+        flashcards.append({"question": f'Which question has the answer: "{card["answer"]}"?', "answer": card["question"]})
+
+    return {"flashcards": flashcards[:FLASHCARD_COUNT]}
+
+
+def _normalize_options(options) -> list:
+    if isinstance(options, dict):
+        options = list(options.values())
+    if not isinstance(options, list):
+        return []
+    return [str(option).strip() for option in options if str(option).strip()]
+
+
+def repair_quiz(data) -> Optional[dict]:
+    """Coerces near-valid quiz output into a QuizList dict holding exactly one quiz.
+
+    Several quizzes are merged into one, per-question objects are converted into the parallel
+    questions/options/correct_answers arrays, and questions without options or a correct
+    answer are dropped so the arrays line up. Returns None if no complete question remains.
+    """
+    data = parse_json_leniently(data)
+    quizzes = _find_list(data, "quiz", "quizzes")
+    if quizzes is None:
+        return None
+
+    # A flat quiz dict or a list of per-question objects is treated as a single quiz.
+    if isinstance(data, dict) and "questions" in data:
+        quizzes = [data]
+    elif quizzes and all(isinstance(item, dict) and "question" in item for item in quizzes):
+        quizzes = [{
+            "questions": [item.get("question") for item in quizzes],
+            "options": [item.get("options", []) for item in quizzes],
+            "correct_answers": [item.get("correct_answer") or item.get("answer") or "" for item in quizzes],
+        }]
+
+    questions, options, correct_answers = [], [], []
+    for quiz in quizzes:
+        if not isinstance(quiz, dict):
+            continue
+
+        quiz_questions = quiz.get("questions") or []
+        quiz_options = quiz.get("options") or []
+        quiz_answers = quiz.get("correct_answers") or []
+
+        for i, question in enumerate(quiz_questions):
+            if i >= len(quiz_options) or i >= len(quiz_answers):
+                break
+
+            question_options = _normalize_options(quiz_options[i])
+            if not question or len(question_options) < 2 or not quiz_answers[i]:
+                continue
+
+            # Pad short option lists so every question has A-D.
+            while len(question_options) < QUIZ_OPTION_COUNT:
+                question_options.append("None of the above")
+
+            questions.append(str(question).strip())
+            options.append(question_options[:QUIZ_OPTION_COUNT])
+            correct_answers.append(str(quiz_answers[i]).strip())
+
+    if not questions:
+        return None
+
+    return {"quiz": [{"questions": questions, "options": options, "correct_answers": correct_answers}]}
+
+
+def repair_assessment(data) -> Optional[dict]:
+    """Repairs the flashcards and quiz halves of a combined Assessment output independently."""
+    data = parse_json_leniently(data)
+    if not isinstance(data, dict):
+        return None
+
+    flashcards = repair_flashcards(data.get("flashcards"))
+    quiz = repair_quiz(data.get("quiz"))
+    if flashcards is None or quiz is None:
+        return None
+
+    return {**flashcards, **quiz}
+
+
+def repair_topics(data) -> Optional[dict]:
+    """Coerces near-valid topic generator output into a TopicGenerator dict.
+
+    Numbering and duplicates are stripped, the list is capped at 10 subtopics and count is
+    recomputed from the list. Returns None if fewer than 5 subtopics remain.
+    """
+    data = parse_json_leniently(data)
+    if isinstance(data, dict) and isinstance(data.get("subtopics"), str):
+        items = data["subtopics"].split("\n")
+    else:
+        items = _find_list(data, "subtopics")
+    if items is None:
+        return None
+
+    subtopics = []
+    for item in items:
+        subtopic = re.sub(r"^\s*(\d+[.)]|[-*])\s*", "", str(item)).strip().strip("'\"")
+        if subtopic and subtopic not in subtopics:
+            subtopics.append(subtopic)
+
+    subtopics = subtopics[:MAX_SUBTOPICS]
+    if len(subtopics) < MIN_SUBTOPICS:
+        return None
+
+    return {"subtopics": subtopics, "count": len(subtopics)}
+
+
+class OutputRepair:
+    """Repairs structured agent output locally before ADK validates it against the output schema.
+
+    Register remember_request_before_model_callback and repair_after_model_callback on the
+    agent, and forget_request_on_model_error_callback and forget_request_after_agent_callback
+    so that calls which fail keep no request behind. A response that already validates is left
+    untouched. One that does not is repaired with repair_fn. The model is only called again when
+    the repair is impossible.
+    """
+
+    def __init__(self, output_schema: type[BaseModel], repair_fn: Callable, max_retries: int = 1):
+        self.output_schema = output_schema
+        self.repair_fn = repair_fn
+        self.max_retries = max_retries
+        self.requests = {}
+
+    def remember_request_before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        self.requests[(callback_context.invocation_id, callback_context.agent_name)] = llm_request
+        return None
+
+    def forget_request_on_model_error_callback(self, callback_context: CallbackContext, llm_request: LlmRequest, error: Exception) -> Optional[LlmResponse]:
+        """Drops the request of a failed call, which never reaches repair_after_model_callback.
+
+        Register it before any callback that answers the error, since those end the chain.
+        """
+        self.requests.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        return None
+
+    def forget_request_after_agent_callback(self, callback_context: CallbackContext) -> None:
+        """Drops the request of a call that was cut short without either model callback."""
+        self.requests.pop((callback_context.invocation_id, callback_context.agent_name), None)
+
+    def repair_text(self, text: str) -> Optional[str]:
+        """Returns schema-valid JSON text for the output, or None if it cannot be repaired."""
+        try:
+            self.output_schema.model_validate_json(text)
+            return text
+        except ValidationError:
+            pass
+
+        repaired = self.repair_fn(text)
+        if repaired is None:
+            return None
+
+        try:
+            return self.output_schema.model_validate(repaired).model_dump_json()
+        except ValidationError:
+            return None
+
+    async def repair_after_model_callback(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        llm_request = self.requests.pop((callback_context.invocation_id, callback_context.agent_name), None)
+
+        if not llm_response.content or not llm_response.content.parts:
+            return None
+
+        text = "".join(part.text for part in llm_response.content.parts if part.text)
+        repaired = self.repair_text(text)
+
+        attempt = 0
+        while repaired is None and llm_request is not None and attempt < self.max_retries:
+            attempt += 1
+            print(f"Output of {callback_context.agent_name} could not be repaired, retrying model call ({attempt}/{self.max_retries})")
+            record_retry("output_repair")
+            try:
+                text_parts = []
+                async for response in model_llm(llm_request.model).generate_content_async(llm_request):
+                    if not response.partial:
+                        record_model_usage(agent_role(callback_context.agent_name), llm_request.model, response.usage_metadata)
+                    if response.content and response.content.parts:
+                        text_parts.extend(part.text for part in response.content.parts if part.text)
+                repaired = self.repair_text("".join(text_parts))
+            except Exception as e:
+                print(f"Retry for {callback_context.agent_name} failed: {e}")
+                break
+
+        if repaired is None:
+            print(f"Output of {callback_context.agent_name} could not be repaired")
+            return None
+
+        if repaired == text:
+            return None
+
+        print(f"Repaired output of {callback_context.agent_name}")
+        return llm_response.model_copy(update={"content": types.Content(role="model", parts=[types.Part(text=repaired)])})
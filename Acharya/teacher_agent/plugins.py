@@ -0,0 +1,246 @@
+"""
+ADK plugins that schedule, budget and feed the metrics and traces of every Runner.
+Kept apart from metrics.py and tracing.py so that those stay importable without google.adk.
+"""
+import time
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from .metrics import (
+    AGENT_DURATION,
+    MODEL_CALL_DURATION,
+    MODEL_TOKENS,
+    TOOL_DURATION,
+    agent_role,
+    record_error,
+)
+from .scheduler import current_job, model_scheduler
+from .tracing import current_span, current_trace, end_span
+from .usage import DOWNGRADE_MODEL, BudgetExceeded, current_ledger
+
+
+class MetricsPlugin(BasePlugin):
+    """Times every agent, model call and tool call a Runner executes."""
+
+    def __init__(self):
+        super().__init__(name="acharya_metrics")
+        self.started = {}
+
+    async def before_agent_callback(self, *, agent, callback_context) -> None:
+        self.started[("agent", callback_context.invocation_id, agent.name)] = time.perf_counter()
+
+    async def after_agent_callback(self, *, agent, callback_context) -> None:
+        start = self.started.pop(("agent", callback_context.invocation_id, agent.name), None)
+        if start is not None:
+            AGENT_DURATION.labels(agent=agent_role(agent.name)).observe(time.perf_counter() - start)
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        self.started[("model", callback_context.invocation_id, callback_context.agent_name)] = (
+            time.perf_counter(), llm_request.model or "unknown"
+        )
+
+    def _finish_model_call(self, callback_context) -> str:
+        """Records the call's latency and returns the model it was sent to."""
+        start, model = self.started.pop(
+            ("model", callback_context.invocation_id, callback_context.agent_name), (None, "unknown")
+        )
+        if start is not None:
+            MODEL_CALL_DURATION.labels(
+                agent=agent_role(callback_context.agent_name),
+                model=model,
+            ).observe(time.perf_counter() - start)
+        return model
+
+    async def after_model_callback(self, *, callback_context, llm_response) -> None:
+        # Streaming responses call this per chunk; only the final chunk carries the full usage
+        if llm_response.partial:
+            return
+        model = self._finish_model_call(callback_context)
+
+        usage = llm_response.usage_metadata
+        if usage is None:
+            return
+        for kind, tokens in (
+            ("prompt", usage.prompt_token_count),
+            ("cached", usage.cached_content_token_count),
+            ("output", usage.candidates_token_count),
+            ("thoughts", usage.thoughts_token_count),
+        ):
+            if tokens:
+                MODEL_TOKENS.labels(model=model, kind=kind).observe(tokens)
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        self._finish_model_call(callback_context)
+        record_error(f"model:{agent_role(callback_context.agent_name)}", error)
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context) -> None:
+        self.started[("tool", tool_context.function_call_id, tool.name)] = time.perf_counter()
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result) -> None:
+        start = self.started.pop(("tool", tool_context.function_call_id, tool.name), None)
+        if start is not None:
+            TOOL_DURATION.labels(tool=tool.name).observe(time.perf_counter() - start)
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error) -> None:
+        self.started.pop(("tool", tool_context.function_call_id, tool.name), None)
+        record_error(f"tool:{tool.name}", error)
+
+
+class TracingPlugin(BasePlugin):
+    """Records agent, model and tool spans into the trace bound to the running session."""
+
+    def __init__(self):
+        super().__init__(name="acharya_tracing")
+        self.open_spans = {}
+        # Span that was current before each agent started, restored when it finishes
+        self.previous_spans = {}
+
+    async def before_agent_callback(self, *, agent, callback_context) -> None:
+        trace = current_trace.get()
+        if trace is None:
+            return
+        parent = None
+        if agent.parent_agent is not None:
+            parent = self.open_spans.get(("agent", callback_context.invocation_id, agent.parent_agent.name))
+        span = trace.start_span(agent.name, "agent", parent or current_span.get())
+        key = ("agent", callback_context.invocation_id, agent.name)
+        self.open_spans[key] = span
+        self.previous_spans[key] = current_span.get()
+        # Callbacks and tools of this agent nest under it
+        current_span.set(span)
+
+    async def after_agent_callback(self, *, agent, callback_context) -> None:
+        key = ("agent", callback_context.invocation_id, agent.name)
+        span = self.open_spans.pop(key, None)
+        previous = self.previous_spans.pop(key, None)
+        end_span(span)
+        if span is not None and current_span.get() is span:
+            current_span.set(previous)
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        trace = current_trace.get()
+        if trace is None:
+            return
+        parent = self.open_spans.get(("agent", callback_context.invocation_id, callback_context.agent_name))
+        self.open_spans[("model", callback_context.invocation_id, callback_context.agent_name)] = trace.start_span(
+            f"llm {llm_request.model}", "model", parent, model=llm_request.model,
+        )
+
+    async def after_model_callback(self, *, callback_context, llm_response) -> None:
+        if llm_response.partial:
+            return
+        span = self.open_spans.pop(("model", callback_context.invocation_id, callback_context.agent_name), None)
+        usage = llm_response.usage_metadata
+        end_span(
+            span,
+            prompt_tokens=usage.prompt_token_count if usage else None,
+            cached_tokens=usage.cached_content_token_count if usage else None,
+            output_tokens=usage.candidates_token_count if usage else None,
+            thoughts_tokens=usage.thoughts_token_count if usage else None,
+        )
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        span = self.open_spans.pop(("model", callback_context.invocation_id, callback_context.agent_name), None)
+        end_span(span, error=error)
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context) -> None:
+        trace = current_trace.get()
+        if trace is None:
+            return
+        parent = self.open_spans.get(("agent", tool_context.invocation_id, tool_context.agent_name))
+        self.open_spans[("tool", tool_context.function_call_id, tool.name)] = trace.start_span(
+            f"tool {tool.name}", "tool", parent, tool=tool.name,
+        )
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result) -> None:
+        end_span(self.open_spans.pop(("tool", tool_context.function_call_id, tool.name), None))
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error) -> None:
+        end_span(self.open_spans.pop(("tool", tool_context.function_call_id, tool.name), None), error=error)
+
+
+class SchedulerPlugin(BasePlugin):
+    """Holds every model call until the fair scheduler grants its session a model slot."""
+
+    def __init__(self, scheduler):
+        super().__init__(name="acharya_scheduler")
+        self.scheduler = scheduler
+        self.held = {}
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        job = current_job.get()
+        if job is None:
+            return
+        grant = await self.scheduler.acquire(job.key, owner=job.session_id)
+        self.held[(callback_context.invocation_id, callback_context.agent_name)] = grant
+
+    def _release(self, callback_context) -> None:
+        grant = self.held.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if grant is not None:
+            self.scheduler.release(grant)
+
+    async def after_model_callback(self, *, callback_context, llm_response) -> None:
+        if not llm_response.partial:
+            self._release(callback_context)
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        self._release(callback_context)
+
+    async def after_agent_callback(self, *, agent, callback_context) -> None:
+        # A model call that ended without either callback must not keep its slot
+        self._release(callback_context)
+
+
+class UsagePlugin(BasePlugin):
+    """Accounts the tokens of every model call to its session and enforces the usage budgets.
+
+    Once a budget is mostly used, calls are sent to the cheaper DOWNGRADE_MODEL; once it is used
+    up, calls are refused with BudgetExceeded.
+    """
+
+    def __init__(self):
+        super().__init__(name="acharya_usage")
+        self.models = {}
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        ledger = current_ledger.get()
+        if ledger is None:
+            return
+        state = ledger.check()
+        if state == "exceeded":
+            ledger.refused()
+            raise BudgetExceeded(ledger.exceeded)
+        # A context cache only serves requests for the model it was created for
+        cached = llm_request.config is not None and llm_request.config.cached_content
+        if state == "downgrade" and llm_request.model != DOWNGRADE_MODEL and not cached:
+            llm_request.model = DOWNGRADE_MODEL
+            ledger.downgraded()
+        self.models[(callback_context.invocation_id, callback_context.agent_name)] = llm_request.model or "unknown"
+
+    async def after_model_callback(self, *, callback_context, llm_response) -> None:
+        if llm_response.partial:
+            return
+        model = self.models.pop((callback_context.invocation_id, callback_context.agent_name), "unknown")
+        ledger = current_ledger.get()
+        usage = llm_response.usage_metadata
+        if ledger is None or usage is None:
+            return
+        ledger.record(
+            agent_role(callback_context.agent_name), model,
+            prompt=usage.prompt_token_count or 0,
+            cached=usage.cached_content_token_count or 0,
+            output=usage.candidates_token_count or 0,
+            thoughts=usage.thoughts_token_count or 0,
+        )
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        self.models.pop((callback_context.invocation_id, callback_context.agent_name), None)
+
+
+# Shared by every Runner in the process; the scheduler comes first so that queueing is not
+# counted as model latency, and the usage plugin before the metrics so that they see the model
+# a call was downgraded to
+scheduler_plugin = SchedulerPlugin(model_scheduler)
+usage_plugin = UsagePlugin()
+metrics_plugin = MetricsPlugin()
+tracing_plugin = TracingPlugin()
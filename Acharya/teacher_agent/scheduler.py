@@ -0,0 +1,199 @@
+"""
+Weighted fair scheduling of generation work across users and tenants.
+Sessions wait for one of ACHARYA_MAX_ACTIVE_SESSIONS slots before they start, and every model call
+waits for one of ACHARYA_MAX_MODEL_CALLS slots (SchedulerPlugin in plugins.py). Waiters are served
+in weighted fair-queuing order by their fairness key, so a user who submits 20 topics gets their
+share of the Gemini quota while others are waiting and all of it while nobody else is.
+"""
+import asyncio
+import itertools
+import os
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from .metrics import SCHEDULER_QUEUED, SCHEDULER_WAIT
+from .tracing import traced
+
+
+def _parse_map(value: str) -> dict:
+    """Parses "tenant:greenwood=4,user:batch_bot=0.5" into {key: number}."""
+    result = {}
+    for item in value.split(","):
+        if "=" in item:
+            key, number = item.rsplit("=", 1)
+            result[key.strip()] = float(number)
+    return result
+
+
+MAX_ACTIVE_SESSIONS = int(os.getenv("ACHARYA_MAX_ACTIVE_SESSIONS", "8"))
+MAX_MODEL_CALLS = int(os.getenv("ACHARYA_MAX_MODEL_CALLS", "16"))
+# Sessions one fairness key may run at once, unless overridden in ACHARYA_SCHEDULER_CAPS
+DEFAULT_SESSION_CAP = int(os.getenv("ACHARYA_MAX_ACTIVE_SESSIONS_PER_KEY", "2"))
+# Relative shares by fairness key (default 1), e.g. "tenant:greenwood=4,user:batch_bot=0.5"
+WEIGHTS = _parse_map(os.getenv("ACHARYA_SCHEDULER_WEIGHTS", ""))
+# Per-key session caps, e.g. "tenant:greenwood=10"
+CAPS = {key: int(cap) for key, cap in _parse_map(os.getenv("ACHARYA_SCHEDULER_CAPS", "")).items()}
+
+
+class Job:
+    """The session a model call belongs to, bound to the context by generate_content."""
+
+    def __init__(self, session_id: str, key: str):
+        self.session_id = session_id
+        self.key = key
+
+
+current_job: ContextVar[Optional[Job]] = ContextVar("acharya_job", default=None)
+
+
+def fairness_key(user_id: Optional[str], tenant_id: Optional[str] = None) -> str:
+    """School customers share one tenant's share; everyone else is scheduled per user."""
+    if tenant_id:
+        return f"tenant:{tenant_id}"
+    return f"user:{user_id or 'default_user'}"
+
+
+class _Waiter:
+    def __init__(self, seq: int, key: str, owner, start_tag: float, finish_tag: float):
+        self.seq = seq
+        self.key = key
+        self.owner = owner
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class FairScheduler:
+    """Grants up to capacity slots in weighted fair-queuing order by key.
+
+    Each waiter gets a virtual finish tag of max(virtual time, the key's last tag) + 1 / weight,
+    and free slots go to the eligible waiter with the smallest tag. A key at its cap is skipped
+    until one of its slots is released. Capacity or caps of 0 or less mean unlimited.
+    """
+
+    def __init__(self, name: str, capacity: int, weights: Optional[dict] = None,
+                 caps: Optional[dict] = None, default_cap: int = 0):
+        self.name = name
+        self.capacity = capacity
+        self.weights = weights or {}
+        self.caps = caps or {}
+        self.default_cap = default_cap
+        self.virtual_time = 0.0
+        self.finish_tags = {}
+        self.waiting = []
+        self.active = Counter()
+        self.grants = {}
+        self.by_owner = defaultdict(set)
+        self._ids = itertools.count()
+        self.stats = {"granted": 0, "waited": 0}
+
+    def weight(self, key: str) -> float:
+        return max(self.weights.get(key, 1.0), 1e-3)
+
+    def cap(self, key: str) -> int:
+        return self.caps.get(key, self.default_cap)
+
+    def _eligible(self, key: str) -> bool:
+        cap = self.cap(key)
+        return cap <= 0 or self.active[key] < cap
+
+    def _dispatch(self) -> None:
+        while self.capacity <= 0 or len(self.grants) < self.capacity:
+            candidates = [w for w in self.waiting if not w.future.done() and self._eligible(w.key)]
+            if not candidates:
+                break
+            waiter = min(candidates, key=lambda w: (w.finish_tag, w.seq))
+            self.waiting.remove(waiter)
+            self.virtual_time = max(self.virtual_time, waiter.start_tag)
+            waiter.future.set_result(self._grant(waiter.key, waiter.owner))
+        SCHEDULER_QUEUED.labels(scheduler=self.name).set(len(self.waiting))
+
+    def _grant(self, key: str, owner) -> int:
+        grant = next(self._ids)
+        self.grants[grant] = (key, owner)
+        self.active[key] += 1
+        if owner is not None:
+            self.by_owner[owner].add(grant)
+        self.stats["granted"] += 1
+        return grant
+
+    async def acquire(self, key: str, owner=None) -> int:
+        """Waits for a slot and returns its grant id, which is passed to release()."""
+        start_tag = max(self.virtual_time, self.finish_tags.get(key, 0.0))
+        finish_tag = start_tag + 1 / self.weight(key)
+        self.finish_tags[key] = finish_tag
+        waiter = _Waiter(next(self._ids), key, owner, start_tag, finish_tag)
+        self.waiting.append(waiter)
+        self._dispatch()
+        if waiter.future.done():
+            return waiter.future.result()
+
+        self.stats["waited"] += 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            with traced(f"queue {self.name}", kind="queue", key=key):
+                return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the waiter was cancelled; hand the slot on
+                self.release(waiter.future.result())
+            elif waiter in self.waiting:
+                self.waiting.remove(waiter)
+                self._dispatch()
+            raise
+        finally:
+            SCHEDULER_WAIT.labels(scheduler=self.name).observe(loop.time() - start)
+
+    def release(self, grant: int) -> None:
+        """Frees a slot. Releasing a grant twice is a no-op."""
+        granted = self.grants.pop(grant, None)
+        if granted is None:
+            return
+        key, owner = granted
+        self.active[key] -= 1
+        if self.active[key] <= 0:
+            del self.active[key]
+            if not any(w.key == key for w in self.waiting):
+                # Idle keys restart at the current virtual time, so their old tags can go
+                self.finish_tags.pop(key, None)
+        if owner is not None:
+            self.by_owner[owner].discard(grant)
+            if not self.by_owner[owner]:
+                del self.by_owner[owner]
+        self._dispatch()
+
+    def release_owner(self, owner) -> None:
+        """Frees every slot an owner still holds, e.g. model calls of a cancelled session."""
+        for grant in list(self.by_owner.get(owner, ())):
+            self.release(grant)
+
+    @asynccontextmanager
+    async def slot(self, key: str, owner=None):
+        grant = await self.acquire(key, owner)
+        try:
+            yield grant
+        finally:
+            self.release(grant)
+
+    def snapshot(self) -> dict:
+        queued = Counter(w.key for w in self.waiting)
+        return {
+            "capacity": self.capacity,
+            "active": len(self.grants),
+            "queued": len(self.waiting),
+            **self.stats,
+            "keys": {
+                key: {"active": self.active.get(key, 0), "queued": queued.get(key, 0),
+                      "weight": self.weight(key), "cap": self.cap(key)}
+                for key in sorted(set(self.active) | set(queued))
+            },
+        }
+
+
+# Admission of whole sessions: bounds the courses generating at once and per key
+session_scheduler = FairScheduler("session", MAX_ACTIVE_SESSIONS, WEIGHTS, CAPS, DEFAULT_SESSION_CAP)
+# Individual model calls of the admitted sessions share the model quota by the same weights
+model_scheduler = FairScheduler("model", MAX_MODEL_CALLS, WEIGHTS)
@@ -0,0 +1 @@
+from .agent import assessment_agent_function
@@ -0,0 +1,66 @@
+from google.adk.agents import Agent
+from pydantic import BaseModel, Field
+import os
+from google.adk.agents.callback_context import CallbackContext
+from typing import List
+from ...output_repair import OutputRepair, repair_assessment
+from ...offline_generator import offline_fallback_on_model_error_callback
+from ...metrics import throttle
+from ...cassette import model_backend
+from ..flashcard_agent.agent import Flashcard
+from ..quiz_agent.agent import Quiz
+
+# When enabled, one assessment agent replaces the separate flashcard and quiz agents.
+COMBINED_ASSESSMENT = os.getenv("ACHARYA_COMBINED_ASSESSMENT", "0") == "1"
+
+class Assessment(BaseModel):
+    """Model representing the flashcards and the quiz for a subtopic, generated in one call."""
+    flashcards: List[Flashcard] = Field(...,
+    description="A list of flashcards",
+    min_length = 5,
+    max_length = 5,
+    )
+    quiz: List[Quiz] = Field(...,
+    description="A list of quizzes",
+    min_length = 1,
+    max_length = 1,
+    )
+
+count = 0
+
+assessment_output_repair = OutputRepair(Assessment, repair_assessment)
+
+def split_assessment_after_agent_callback(subtopic_index: int):
+    """Splits assessment_N back into the flashcards_N and quiz_N keys read by the API server."""
+
+    async def after_agent_callback(callback_context: CallbackContext):
+        assessment = callback_context.state.get(f"assessment_{subtopic_index}")
+
+        if isinstance(assessment, dict):
+            callback_context.state[f"flashcards_{subtopic_index}"] = {"flashcards": assessment.get("flashcards", [])}
+            callback_context.state[f"quiz_{subtopic_index}"] = {"quiz": assessment.get("quiz", [])}
+        else:
+            print(f"No assessment content found for key: assessment_{subtopic_index}")
+
+        await throttle(45, "assessment_agent")
+
+    return after_agent_callback
+
+def assessment_agent_function() -> Agent:
+    global count
+    count += 1
+
+    assessment_agent = Agent(
+    name = f"assessment_agent_{count}",
+    model = model_backend("gemini-2.5-flash-lite"),
+    description = "Generates flashcards and a quiz for a given topic in a single call",
+    tools = [],
+    output_key = f"assessment_{count}",
+    output_schema = Assessment,
+    before_model_callback = assessment_output_repair.remember_request_before_model_callback,
+    after_model_callback = assessment_output_repair.repair_after_model_callback,
+    on_model_error_callback = [assessment_output_repair.forget_request_on_model_error_callback, offline_fallback_on_model_error_callback(count, "assessment")],
+    after_agent_callback = [assessment_output_repair.forget_request_after_agent_callback, split_assessment_after_agent_callback(count)]
+)
+
+    return assessment_agent
@@ -1,9 +1,31 @@
 from google.adk.agents import ParallelAgent
 
 
+count = 0
 
-factory_agent = ParallelAgent(
-    name="factory_agent",
-    description="Factory agent that creates agents for each subtopic",
-    # sub_agents will be set in the main workflow
-)
+
+def factory_agent_function(sub_agents: list) -> ParallelAgent:
+    """Runs the pipelines of a new course's subtopics in parallel.
+
+    A new agent per run, since concurrent sessions each have their own pipelines.
+    """
+    global count
+    count += 1
+
+    return ParallelAgent(
+        name=f"factory_agent_{count}",
+        description="Factory agent that creates agents for each subtopic",
+        sub_agents=sub_agents,
+    )
+
+
+def regeneration_agent_function(sub_agents: list) -> ParallelAgent:
+    """Runs the pipelines of the subtopics selected for regeneration in parallel."""
+    global count
+    count += 1
+
+    return ParallelAgent(
+        name=f"regeneration_agent_{count}",
+        description="Regenerates selected artifacts of selected subtopics",
+        sub_agents=sub_agents,
+    )
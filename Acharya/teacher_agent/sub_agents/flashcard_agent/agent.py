@@ -1,8 +1,11 @@
 from google.adk.agents import Agent
 from pydantic import BaseModel, Field
-import asyncio
 from google.adk.agents.callback_context import CallbackContext
 from typing import List
+from ...output_repair import OutputRepair, repair_flashcards
+from ...offline_generator import offline_fallback_on_model_error_callback
+from ...metrics import throttle
+from ...cassette import model_backend
 
 class Flashcard(BaseModel):
     """Model representing a flashcard with a question and answer."""
@@ -18,8 +21,10 @@ class FlashcardList(BaseModel):
 
 count = 0
 
+flashcard_output_repair = OutputRepair(FlashcardList, repair_flashcards)
+
 async def after_agent_callback(callback_context: CallbackContext):
-    await asyncio.sleep(45)
+    await throttle(45, "flashcard_agent")
 
 def flashcard_agent_function() -> Agent:
     global count
@@ -27,12 +32,15 @@ def flashcard_agent_function() -> Agent:
 
     flashcard_agent = Agent(
     name = f"flashcard_agent_{count}",
-    model = "gemini-2.5-flash-lite",
+    model = model_backend("gemini-2.5-flash-lite"),
     description = "Generates flashcards for a given topic",
     tools = [],
     output_key = f"flashcards_{count}",
     output_schema = FlashcardList,
-    after_agent_callback = after_agent_callback
+    before_model_callback = flashcard_output_repair.remember_request_before_model_callback,
+    after_model_callback = flashcard_output_repair.repair_after_model_callback,
+    on_model_error_callback = [flashcard_output_repair.forget_request_on_model_error_callback, offline_fallback_on_model_error_callback(count, "flashcards")],
+    after_agent_callback = [flashcard_output_repair.forget_request_after_agent_callback, after_agent_callback]
 
     )
 
@@ -4,31 +4,35 @@ from ..quiz_agent.agent import quiz_agent_function
 from ..flashcard_agent.agent import flashcard_agent_function
 from ..podcast_agent.agent import podcast_agent_function
 from ..image_agent.agent import image_agent_function
+from ..assessment_agent.agent import assessment_agent_function, COMBINED_ASSESSMENT
 
 count = 0
 
-def flashcard_quiz_podcast_image_agent_function() -> ParallelAgent:      
+
+def downstream_agents_function() -> list:
+    """Creates the agents that turn a subtopic's webpage into its other artifacts."""
+    if COMBINED_ASSESSMENT:
+        # One call produces both the flashcards and the quiz.
+        assessment_agents = [assessment_agent_function()]
+    else:
+        assessment_agents = [flashcard_agent_function(), quiz_agent_function()]
+
+    return [*assessment_agents, podcast_agent_function(), image_agent_function()]
+
+
+def flashcard_quiz_podcast_image_agent_function(sub_agents: list = None) -> ParallelAgent:
+    """Runs the downstream agents in parallel; all of them unless sub_agents selects some."""
     global count
     count += 1
 
-    flashcard_agent = flashcard_agent_function()
-    quiz_agent = quiz_agent_function()
-    podcast_agent = podcast_agent_function()
-    image_agent = image_agent_function()
-    
+    if sub_agents is None:
+        sub_agents = downstream_agents_function()
+
     # Parallel Agent preserves the order of results inherently.
     flashcard_quiz_podcast_image_agent = ParallelAgent(    
         name=f"flashcard_quiz_podcast_image_agent_{count}",
-        sub_agents=[
-            flashcard_agent,
-            quiz_agent,
-            podcast_agent,
-            image_agent
-        ],
+        sub_agents=sub_agents,
         description="The pipeline that creates flashcards, quizzes, podcasts and images for a given topic parallelly"
     )
 
     return flashcard_quiz_podcast_image_agent
-    
-
-
@@ -1,6 +1,7 @@
 from google.adk.agents import Agent
 from dotenv import load_dotenv, find_dotenv
 from .tools import image_tool
+from ...cassette import model_backend
 
 load_dotenv(find_dotenv())
 
@@ -12,7 +13,7 @@ def image_agent_function() -> Agent:
 
     image_agent = Agent(
     name=f"image_agent_{count}",
-    model="gemini-2.5-flash-lite",
+    model=model_backend("gemini-2.5-flash-lite"),
     description="Generates images for a given topic",
     tools=[image_tool],
     output_key=f"image_url_{count}",
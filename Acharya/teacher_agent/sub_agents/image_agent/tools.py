@@ -5,12 +5,23 @@ from serpapi import GoogleSearch
 import os
 import requests
 import asyncio
+import uuid
 from pathlib import Path
-import time
+from ...artifacts import IMAGE_DIR
+from ...metrics import ARTIFACT_BYTES_WRITTEN, backoff_sleep, record_retry, timed
+from ...cassette import CASSETTE_MODE, replay_call, encode_bytes, decode_bytes
 
 load_dotenv(find_dotenv())
 
-count = 0
+
+def fetch_image(image_url: str, headers: dict) -> dict:
+    """GETs an image, returning its status code and (on success) base64 content."""
+    def live():
+        response = requests.get(image_url, headers=headers, timeout=15)
+        content = encode_bytes(response.content) if response.status_code == 200 else None
+        return {"status_code": response.status_code, "content": content}
+
+    return replay_call("image_download", "image_tool", image_url, live)
 
 
 def download_image_with_retry(image_url: str, filepath: Path, max_retries: int = 3):
@@ -20,16 +31,21 @@ def download_image_with_retry(image_url: str, filepath: Path, max_retries: int =
     }
     
     for attempt in range(max_retries):
+        if attempt > 0:
+            record_retry("image_download")
         try:
-            response = requests.get(image_url, headers=headers, timeout=15)
+            with timed("image_download"):
+                response = fetch_image(image_url, headers)
             
-            if response.status_code == 200:
+            if response["status_code"] == 200:
+                content = decode_bytes(response["content"])
                 with open(filepath, "wb") as f:
-                    f.write(response.content)
+                    f.write(content)
+                ARTIFACT_BYTES_WRITTEN.labels(kind="image").inc(len(content))
                 print(f"Image saved to {filepath}")
                 return True
             else:
-                print(f"Download attempt {attempt + 1} failed (Status: {response.status_code})")
+                print(f"Download attempt {attempt + 1} failed (Status: {response['status_code']})")
                 
         except requests.exceptions.Timeout:
             print(f"Download attempt {attempt + 1} timed out")
@@ -39,24 +55,33 @@ def download_image_with_retry(image_url: str, filepath: Path, max_retries: int =
             print(f"Download attempt {attempt + 1} error: {e}")
         
         if attempt < max_retries - 1:
-            time.sleep(2 * (attempt + 1))  # Backoff
+            backoff_sleep(2 * (attempt + 1), "image_download_retry")  # Backoff
     
     return False
 
 
-def image_tool(tool_context: ToolContext, topic: str):
+async def image_tool(tool_context: ToolContext, topic: str):
     """Fetches image url for the required topic and downloads it. Returns the image url."""
-    global count
-    count += 1
+    # SerpAPI, the downloads and their backoff sleeps block, so they run in a worker thread
+    return await asyncio.to_thread(search_and_download_image, tool_context, topic)
+
+
+def search_and_download_image(tool_context: ToolContext, topic: str):
+    """Blocking implementation of image_tool."""
+    # image_agent_N publishes image_file_N; take N from the agent name, since the parallel
+    # image agents call the tool in any order
+    count = int(tool_context.agent_name.rsplit("_", 1)[1])
     
     # Create save directory
-    save_dir = Path(r"C:\Users\DELL\OneDrive\Desktop\Project\Hackathons\Acharya\images")
+    save_dir = IMAGE_DIR
     save_dir.mkdir(parents=True, exist_ok=True)
-    filepath = save_dir / f"image_{count}.jpg"
+    # Agent indexes restart with the process, so the file name must be unique on its own: the
+    # course cache keeps linking to files of earlier sessions
+    filepath = save_dir / f"image_{count}_{uuid.uuid4().hex}.jpg"
 
     # Get API key
     api_key = os.getenv("SERPAPI_API_KEY")
-    if not api_key:
+    if not api_key and CASSETTE_MODE != "replay":
         print("SERPAPI_API_KEY not found in environment variables")
         return None
 
@@ -69,7 +94,9 @@ def image_tool(tool_context: ToolContext, topic: str):
     try:
         print(f"Searching for image: {topic}")
         search = GoogleSearch(params)
-        results = search.get_dict()
+        with timed("image_search"):
+            # The API key is left out of the cassette key (and the cassette)
+            results = replay_call("image_search", "image_tool", {"engine": "google_images", "q": topic}, search.get_dict)
         
         # Try multiple images in case some fail to download
         images_results = results.get("images_results", [])
@@ -87,6 +114,8 @@ def image_tool(tool_context: ToolContext, topic: str):
             print(f"Trying image source {i + 1}: {image_url[:80]}...")
             
             if download_image_with_retry(image_url, filepath):
+                # Publish the downloaded file so the API server can serve it
+                tool_context.state[f"image_file_{count}"] = filepath.name
                 return image_url
         
         print(f"Failed to download any image for: {topic}")
@@ -1,11 +1,14 @@
 import asyncio
+import uuid
 from google import genai
 from google.genai import types
 import wave
 from google.adk.agents.callback_context import CallbackContext
 from pathlib import Path
-
-count = 0
+from ...artifacts import PODCAST_DIR
+from ...metrics import ARTIFACT_BYTES_WRITTEN, record_error, record_retry, throttle, timed
+from ...cassette import replay_call, encode_bytes, decode_bytes
+from ...usage import record_tts_usage
 
 def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
     with wave.open(filename, "wb") as wf:
@@ -15,52 +18,66 @@ def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
         wf.writeframes(pcm)
 
 
-async def generate_audio_with_retry(client, formatted_prompt, max_retries=3, delay=10):
+def synthesize_speech(formatted_prompt):
+    """Calls Gemini TTS for a two-speaker dialogue and returns the PCM audio."""
+    client = genai.Client()
+    response = client.models.generate_content(
+        model="gemini-2.5-flash-preview-tts",
+        contents=formatted_prompt,
+        config=types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
+                    speaker_voice_configs=[
+                        types.SpeakerVoiceConfig(
+                            speaker='Alice',
+                            voice_config=types.VoiceConfig(
+                                prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                                    voice_name='Kore',
+                                )
+                            )
+                        ),
+                        types.SpeakerVoiceConfig(
+                            speaker='Bob',
+                            voice_config=types.VoiceConfig(
+                                prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                                    voice_name='Puck',
+                                )
+                            )
+                        ),
+                    ]
+                )
+            )
+        )
+    )
+
+    # Extract audio data
+    return response.candidates[0].content.parts[0].inline_data.data
+
+
+async def generate_audio_with_retry(formatted_prompt, max_retries=3, delay=10):
     """Generate TTS audio with retry logic for handling API disconnects."""
     last_error = None
     
     for attempt in range(max_retries):
         try:
             print(f"TTS Generation attempt {attempt + 1}/{max_retries}")
+            if attempt > 0:
+                record_retry("tts")
             
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-preview-tts",
-                contents=formatted_prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
-                            speaker_voice_configs=[
-                                types.SpeakerVoiceConfig(
-                                    speaker='Alice',
-                                    voice_config=types.VoiceConfig(
-                                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                            voice_name='Kore',
-                                        )
-                                    )
-                                ),
-                                types.SpeakerVoiceConfig(
-                                    speaker='Bob',
-                                    voice_config=types.VoiceConfig(
-                                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                            voice_name='Puck',
-                                        )
-                                    )
-                                ),
-                            ]
-                        )
-                    )
-                )
-            )
-            
-            # Extract audio data
-            data = response.candidates[0].content.parts[0].inline_data.data
+            # The TTS client is blocking, so it runs in a worker thread
+            data = decode_bytes(await asyncio.to_thread(
+                replay_call, "tts", "podcast_agent", formatted_prompt,
+                lambda: encode_bytes(synthesize_speech(formatted_prompt)),
+            ))
             print(f"TTS Generation succeeded on attempt {attempt + 1}")
+            record_tts_usage(formatted_prompt, data)
             return data
             
         except Exception as e:
             last_error = e
             error_str = str(e).lower()
+            record_error("tts", e)
             
             # Check if it's a retryable error
             if any(x in error_str for x in ['503', 'disconnect', 'overload', 'timeout', 'server']):
@@ -68,7 +85,7 @@ async def generate_audio_with_retry(client, formatted_prompt, max_retries=3, del
                 if attempt < max_retries - 1:
                     wait_time = delay * (attempt + 1)  # Exponential backoff
                     print(f"Waiting {wait_time}s before retry...")
-                    await asyncio.sleep(wait_time)
+                    await throttle(wait_time, "tts_retry")
             else:
                 # Non-retryable error
                 print(f"TTS generation failed (non-retryable): {e}")
@@ -81,17 +98,16 @@ async def generate_audio_with_retry(client, formatted_prompt, max_retries=3, del
 
 async def after_agent_callback(callback_context: CallbackContext):
     """Generate podcast audio from dialogue after agent completes."""
-    await asyncio.sleep(45) 
+    await throttle(45, "podcast_agent")
     
     try:
-        client = genai.Client()
-
-        global count
-        count += 1
+        # podcast_agent_N writes podcast_content_N; take N from the agent name, since the
+        # parallel podcast agents finish in any order
+        count = int(callback_context.agent_name.rsplit("_", 1)[1])
 
         # Get the podcast content from session state
         podcast_key = f"podcast_content_{count}"
-        prompt = callback_context.session.state.get(podcast_key)
+        prompt = callback_context.state.get(podcast_key)
         
         if not prompt:
             print(f"No podcast content found for key: {podcast_key}")
@@ -109,19 +125,25 @@ async def after_agent_callback(callback_context: CallbackContext):
         print(f"Generating TTS for podcast {count}...")
 
         # Generate audio with retry logic
-        data = await generate_audio_with_retry(client, formatted_prompt)
+        with timed("tts"):
+            data = await generate_audio_with_retry(formatted_prompt)
 
         # Create podcasts directory if it doesn't exist
-        podcast_dir = Path(r"C:\Users\DELL\OneDrive\Desktop\Project\Hackathons\Acharya\podcasts")
+        podcast_dir = PODCAST_DIR
         podcast_dir.mkdir(parents=True, exist_ok=True)  
         
         # Save the audio file
-        file_name = f"out_{count}.wav"
+        # Unique across restarts, which reset the agent indexes; cached courses link to old files
+        file_name = f"out_{count}_{uuid.uuid4().hex}.wav"
         wav_file_path = podcast_dir / file_name
-        wave_file(str(wav_file_path), data)
+        await asyncio.to_thread(wave_file, str(wav_file_path), data)
+        ARTIFACT_BYTES_WRITTEN.labels(kind="podcast").inc(wav_file_path.stat().st_size)
         
         print(f"Podcast audio saved to {wav_file_path}")
 
+        # Publish the audio file so the API server can serve it
+        callback_context.state[f"podcast_audio_{count}"] = file_name
+
     except Exception as e:
         print(f"Error generating podcast audio: {e}")
 
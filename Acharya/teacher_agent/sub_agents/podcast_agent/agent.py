@@ -4,6 +4,7 @@ from typing import List
 import asyncio
 from google.adk.agents.callback_context import CallbackContext
 from .after_agent_callback import after_agent_callback
+from ...cassette import model_backend
 from typing import List
 from typing import Literal
 
@@ -33,7 +34,7 @@ def podcast_agent_function() -> Agent:
 
     podcast_agent = Agent(
         name=f"podcast_agent_{count}",
-        model = "gemini-2.5-flash-lite",
+        model = model_backend("gemini-2.5-flash-lite"),
         description="Generates podcast content for a given topic",
         tools=[],
         output_key=f"podcast_content_{count}",
@@ -1,7 +1,10 @@
 from google.adk.agents import Agent
 from pydantic import BaseModel, Field
 from typing import List
-import asyncio
+from ...output_repair import OutputRepair, repair_quiz
+from ...offline_generator import offline_fallback_on_model_error_callback
+from ...metrics import throttle
+from ...cassette import model_backend
 from google.adk.agents.callback_context import CallbackContext
 from typing import List
 
@@ -19,9 +22,11 @@ class QuizList(BaseModel):
 
 count = 0
 
+quiz_output_repair = OutputRepair(QuizList, repair_quiz)
+
 
 async def after_agent_callback(callback_context: CallbackContext):
-    await asyncio.sleep(45)
+    await throttle(45, "quiz_agent")
 
 def quiz_agent_function() -> Agent:
     global count
@@ -29,12 +34,15 @@ def quiz_agent_function() -> Agent:
 
     quiz_agent = Agent(
     name = f"quiz_agent_{count}",
-    model = "gemini-2.5-flash-lite",
+    model = model_backend("gemini-2.5-flash-lite"),
     description = "Generates a quiz for a given topic",
     tools = [],
     output_key = f"quiz_{count}",
     output_schema = QuizList,
-    after_agent_callback = after_agent_callback
+    before_model_callback = quiz_output_repair.remember_request_before_model_callback,
+    after_model_callback = quiz_output_repair.repair_after_model_callback,
+    on_model_error_callback = [quiz_output_repair.forget_request_on_model_error_callback, offline_fallback_on_model_error_callback(count, "quiz")],
+    after_agent_callback = [quiz_output_repair.forget_request_after_agent_callback, after_agent_callback]
 )
 
     return quiz_agent
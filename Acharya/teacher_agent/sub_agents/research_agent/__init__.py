@@ -0,0 +1 @@
+from .agent import research_agent
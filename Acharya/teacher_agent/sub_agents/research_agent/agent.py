@@ -0,0 +1,16 @@
+from google.adk.agents import Agent
+from google.adk.tools import google_search
+from .instructions import research_agent_instruction
+from .corpus import collect_research_sources_after_model_callback
+from ...cassette import model_backend
+
+
+research_agent = Agent(
+    name="research_agent",
+    model=model_backend("gemini-2.5-flash"),
+    description="Researches a topic once and builds a shared source corpus for all subtopic writers",
+    instruction=research_agent_instruction,
+    tools=[google_search],
+    output_key="research_notes",
+    after_model_callback=collect_research_sources_after_model_callback,
+)
@@ -0,0 +1,116 @@
+import os
+import re
+from typing import Optional
+
+from google.adk.models import LlmResponse
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+
+# When enabled, the research agent searches once per topic and the subtopic writers
+# work from its notes instead of running their own google_search.
+SHARED_RESEARCH = os.getenv("ACHARYA_SHARED_RESEARCH", "1") != "0"
+
+# Upper bound on the research notes put into a single writer instruction.
+MAX_NOTES_CHARS = 8000
+
+STOPWORDS = {
+    "about", "and", "are", "for", "from", "how", "into", "that", "the", "their",
+    "this", "what", "with", "your", "role", "using", "between",
+}
+
+
+def tokenize(text: str) -> set:
+    """Lowercase word tokens used to match notes and sources against subtopics."""
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2 and word not in STOPWORDS}
+
+
+def collect_research_sources_after_model_callback(
+    llm_response: LlmResponse,
+    callback_context: CallbackContext,) -> Optional[LlmResponse]:
+    """Adds the grounding sources of the research response to the shared research_sources corpus.
+
+    Sources are deduplicated by URL and title. The text segments each source supports are
+    kept as snippets so citations can be matched to subtopic content later.
+    """
+    if not llm_response.grounding_metadata or not llm_response.grounding_metadata.grounding_chunks:
+        return None
+
+    metadata = llm_response.grounding_metadata
+    sources = list(callback_context.state.get("research_sources", []) or [])
+    seen = {source["url"] for source in sources} | {source["title"] for source in sources}
+
+    new_sources = {}
+    for chunk_index, chunk in enumerate(metadata.grounding_chunks):
+        if not chunk.web or not chunk.web.uri or not chunk.web.title:
+            continue
+        if chunk.web.uri in seen or chunk.web.title in seen:
+            continue
+        new_sources[chunk_index] = {"title": chunk.web.title, "url": chunk.web.uri, "snippets": []}
+        seen.update((chunk.web.uri, chunk.web.title))
+
+    for support in metadata.grounding_supports or []:
+        if not support.segment or not support.segment.text:
+            continue
+        for chunk_index in support.grounding_chunk_indices or []:
+            if chunk_index in new_sources:
+                new_sources[chunk_index]["snippets"].append(support.segment.text)
+
+    if new_sources:
+        sources.extend(new_sources.values())
+        callback_context.state["research_sources"] = sources
+        print(f"Research corpus now holds {len(sources)} sources")
+
+    return None
+
+
+def select_notes_section(notes: str, subtopic: str) -> str:
+    """Returns the section of the research notes that best matches the subtopic."""
+    sections = re.split(r"\n(?=###\s)", notes)
+    subtopic_tokens = tokenize(subtopic)
+
+    best_section, best_score = None, 0.0
+    for section in sections:
+        heading = section.strip().split("\n", 1)[0]
+        heading_tokens = tokenize(heading)
+        if not heading_tokens:
+            continue
+        score = len(subtopic_tokens & heading_tokens) / len(subtopic_tokens | heading_tokens)
+        if score > best_score:
+            best_section, best_score = section, score
+
+    if best_section is None:
+        return notes[:MAX_NOTES_CHARS]
+
+    return best_section.strip()[:MAX_NOTES_CHARS]
+
+
+def rank_sources(sources: list, text: str, limit: int = 5) -> list:
+    """Ranks corpus sources by word overlap between their title/snippets and the given text."""
+    text_tokens = tokenize(text)
+    scored = []
+
+    for source in sources:
+        source_tokens = tokenize(" ".join([source["title"], *source.get("snippets", [])]))
+        score = len(text_tokens & source_tokens)
+        if score > 0:
+            scored.append((score, source))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [source for _, source in scored[:limit]]
+
+
+def research_corpus_instruction(subtopic: str, base_instruction: str):
+    """Builds an instruction provider that appends the subtopic's research notes to the writer instruction."""
+
+    def instruction_provider(context: ReadonlyContext) -> str:
+        notes = context.state.get("research_notes", "") or ""
+        section = select_notes_section(notes, subtopic)
+
+        return f"""{base_instruction.rstrip()}
+    5.  **Sources**: Base the content *only* on the research notes below. Do not invent facts that are not supported by them.
+
+    Research Notes:
+    {section}
+    """
+
+    return instruction_provider
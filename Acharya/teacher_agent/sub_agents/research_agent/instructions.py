@@ -0,0 +1,47 @@
+research_agent_instruction_template = """
+You are an expert research assistant preparing source material for a team of educational content writers.
+
+---
+### YOUR TASK
+Research the topic "{topic}" using Google Search. The writers will each cover one of these subtopics:
+{subtopics}
+
+Gather the facts once for the whole topic so that every writer can work from the same corpus.
+
+---
+### OUTPUT FORMAT
+For **each** subtopic, write a section that starts with a `### ` heading containing the exact subtopic name, followed by:
+- Key definitions and terminology
+- Core concepts and how they work
+- Important facts, figures, dates and examples
+- Practical applications
+
+---
+### IMPORTANT
+- Keep every section factual and dense; the writers will turn it into prose.
+- Do not repeat the same fact under several subtopics; put it under the most relevant one.
+- Return *only* the research notes in Markdown.
+"""
+
+
+existing_material_template = """
+---
+### EXISTING MATERIAL
+Earlier courses already cover the passages below. Keep your notes consistent with them, and spend
+your searches on the facts they do not cover.
+{existing_material}
+"""
+
+
+def research_agent_instruction(context) -> str:
+    """Fills the template with the topic, the subtopic list produced by the topic generator and
+    any existing material found in the search index."""
+    subtopics = context.state.get("subtopics", {}).get("subtopics", [])
+    instruction = research_agent_instruction_template.format(
+        topic=context.state.get("topic", ""),
+        subtopics="\n".join(f"- {subtopic}" for subtopic in subtopics),
+    )
+    existing_material = context.state.get("existing_material")
+    if existing_material:
+        instruction += existing_material_template.format(existing_material=existing_material)
+    return instruction
@@ -2,6 +2,8 @@ from google.adk.agents import Agent
 from pydantic import BaseModel, Field
 from .instructions import topic_generator_agent_instruction
 from typing import List, Dict
+from ...output_repair import OutputRepair, repair_topics
+from ...cassette import model_backend
 
 class TopicGenerator(BaseModel):
     """Model representing the generated subtopics for a given educational topic."""
@@ -17,15 +19,20 @@ class TopicGenerator(BaseModel):
     )
 
 
+topic_generator_output_repair = OutputRepair(TopicGenerator, repair_topics)
 
 topic_generator_agent = Agent(
     name="topic_generator_agent",
-    model="gemini-2.5-flash-lite",  
+    model=model_backend("gemini-2.5-flash-lite"),  
     description="Analyzes topics and generates pedagogically sound subtopics for educational content creation",
     instruction=topic_generator_agent_instruction,
     tools=[],
     output_schema=TopicGenerator,
     output_key="subtopics",
+    before_model_callback=topic_generator_output_repair.remember_request_before_model_callback,
+    after_model_callback=topic_generator_output_repair.repair_after_model_callback,
+    on_model_error_callback=topic_generator_output_repair.forget_request_on_model_error_callback,
+    after_agent_callback=topic_generator_output_repair.forget_request_after_agent_callback,
     generate_content_config={
         "temperature": 0.3,  # Lower temperature for more deterministic subtopic generation
     },
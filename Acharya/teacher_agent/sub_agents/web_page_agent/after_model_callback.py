@@ -1,16 +1,38 @@
 from google.adk.models import LlmResponse
 from google.adk.agents.callback_context import CallbackContext
 from google.genai import types
+from ..research_agent.corpus import rank_sources
+
+
+def corpus_citations(llm_response: LlmResponse, callback_context: CallbackContext) -> LlmResponse:
+    """Adds citations from the shared research corpus when the writer ran without google_search."""
+    sources = callback_context.state.get("research_sources") or []
+    if not sources or not llm_response.content or not llm_response.content.parts:
+        return llm_response
+
+    text = "".join(part.text for part in llm_response.content.parts if part.text)
+    ranked = rank_sources(sources, text)
+    if not ranked:
+        return llm_response
+
+    citation_text = "\n\n## References\n"
+    for source in ranked:
+        citation_text += f"- [{source['title']}]({source['url']})\n"
+
+    parts = list(llm_response.content.parts)
+    parts.append(types.Part(text=citation_text))
+    return LlmResponse(content=types.Content(parts=parts))
+
 
 def citation_retrieval_after_model_callback(
     llm_response: LlmResponse,
     callback_context: CallbackContext,) -> LlmResponse:
-    """Adds citations to the response if grounding metadata is present."""
+    """Adds citations to the response from grounding metadata, or from the shared research corpus."""
     
     # Check if grounding_metadata exists
     if not llm_response.grounding_metadata:
         print("1")
-        return llm_response
+        return corpus_citations(llm_response, callback_context)
     
     # Check if grounding_chunks exists
     chunks = llm_response.grounding_metadata.grounding_chunks
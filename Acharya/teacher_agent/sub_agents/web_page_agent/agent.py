@@ -4,26 +4,34 @@ from google.adk.tools import google_search
 from google.genai import types
 from pydantic import BaseModel, Field
 from .after_model_callback import citation_retrieval_after_model_callback
-import asyncio
+from .context_cache import source_context_after_agent_callback
+from ...metrics import throttle
+from ...cassette import model_backend
 
 count = 0
 
-async def after_agent_callback(callback_context: CallbackContext):
-    await asyncio.sleep(45)
+def make_after_agent_callback(subtopic_index: int):
+    publish_source_context = source_context_after_agent_callback(subtopic_index)
 
-def web_page_agent_function() -> Agent: 
+    async def after_agent_callback(callback_context: CallbackContext):
+        await publish_source_context(callback_context)
+        await throttle(45, "web_page_agent")
+
+    return after_agent_callback
+
+def web_page_agent_function(use_google_search: bool = True) -> Agent: 
     global count
     count += 1
 
     web_page_agent = Agent(
         name = f"web_page_agent_{count}",
-        model = "gemini-2.5-flash", 
+        model = model_backend("gemini-2.5-flash"), 
         description = "Generates web page content for a given topic",
-        tools = [google_search],
+        tools = [google_search] if use_google_search else [],
         instruction = "You are a professional content writer. Write a detailed webpage about the user's topic.",
         output_key = f"webpage_content_{count}",
         after_model_callback = citation_retrieval_after_model_callback,
-        after_agent_callback = after_agent_callback
+        after_agent_callback = make_after_agent_callback(count)
     )
 
     return web_page_agent
\ No newline at end of file
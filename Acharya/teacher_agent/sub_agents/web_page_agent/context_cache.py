@@ -0,0 +1,150 @@
+import os
+import re
+from typing import Optional
+
+from google import genai
+from google.genai import types
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+
+from ...cassette import CASSETTE_MODE
+
+# Model used by the flashcard, quiz and podcast agents. A context cache can only be
+# used by requests for the model it was created for.
+DOWNSTREAM_MODEL = "gemini-2.5-flash-lite"
+
+# Cache names are random, so requests that reference a cache cannot be recorded or replayed
+CONTEXT_CACHE_ENABLED = os.getenv("ACHARYA_CONTEXT_CACHE", "1") != "0" and CASSETTE_MODE == "off"
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("ACHARYA_CONTEXT_CACHE_TTL", "900"))
+
+# Gemini rejects caches below a minimum token count (~1024 tokens), so skip the round trip
+# for pages that are obviously too short to be cached.
+MIN_CACHE_CHARS = 4096
+
+# Character budget for the compacted extract sent when no cache is available.
+COMPACT_SOURCE_CHARS = int(os.getenv("ACHARYA_COMPACT_SOURCE_CHARS", "6000"))
+
+CACHED_SOURCE_NOTE = "(The full source content for this subtopic is provided in the cached context above.)"
+
+
+def compact_webpage_content(content: str, max_chars: int = COMPACT_SOURCE_CHARS) -> str:
+    """Returns a compacted extract of the webpage markdown that fits in max_chars.
+
+    The References section, images and link targets are dropped. If the page is still too
+    long, every heading and bullet is kept and paragraphs are cut down to their first two
+    sentences before a final hard truncation.
+    """
+    if not content:
+        return ""
+
+    text = content.split("\n## References", 1)[0]
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", text)
+    text = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text).strip()
+
+    if len(text) <= max_chars:
+        return text
+
+    blocks = []
+    for block in text.split("\n\n"):
+        block = block.strip()
+        if block.startswith("#") or block.startswith(("-", "*", "1.")):
+            blocks.append(block)
+        else:
+            sentences = re.split(r"(?<=[.!?])\s+", block)
+            blocks.append(" ".join(sentences[:2]))
+
+    extract = "\n\n".join(blocks)
+    if len(extract) > max_chars:
+        extract = extract[:max_chars].rsplit("\n", 1)[0]
+
+    return extract
+
+
+async def create_source_cache(content: str, subtopic_index: int) -> Optional[str]:
+    """Uploads the webpage content into a Gemini context cache and returns the cache name."""
+    client = genai.Client()
+
+    cache = await client.aio.caches.create(
+        model=DOWNSTREAM_MODEL,
+        config=types.CreateCachedContentConfig(
+            display_name=f"acharya_webpage_{subtopic_index}",
+            contents=[
+                types.Content(
+                    role="user",
+                    parts=[types.Part(text=f"Source Content:\n{content}")],
+                )
+            ],
+            ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s",
+        ),
+    )
+
+    return cache.name
+
+
+def source_context_after_agent_callback(subtopic_index: int):
+    """Builds the web page agent callback that publishes the source for the downstream agents.
+
+    The callback sets three state keys for the subtopic:
+    - webpage_cache_N: the name of the context cache holding the webpage, if one was created
+    - webpage_extract_N: a compacted extract of the page
+    - webpage_source_N: what the downstream instructions interpolate instead of the full page,
+      i.e. a pointer to the cached context or the compacted extract
+    """
+    content_key = f"webpage_content_{subtopic_index}"
+    cache_key = f"webpage_cache_{subtopic_index}"
+    extract_key = f"webpage_extract_{subtopic_index}"
+    source_key = f"webpage_source_{subtopic_index}"
+
+    async def after_agent_callback(callback_context: CallbackContext):
+        content = callback_context.state.get(content_key, "") or ""
+        cache_name = None
+
+        if CONTEXT_CACHE_ENABLED and len(content) >= MIN_CACHE_CHARS:
+            try:
+                cache_name = await create_source_cache(content, subtopic_index)
+                print(f"Created context cache {cache_name} for {content_key}")
+            except Exception as e:
+                print(f"Context cache unavailable for {content_key}, sending compacted extract: {e}")
+
+        extract = compact_webpage_content(content)
+
+        callback_context.state[cache_key] = cache_name
+        callback_context.state[extract_key] = extract
+        callback_context.state[source_key] = CACHED_SOURCE_NOTE if cache_name else extract
+
+        return None
+
+    return after_agent_callback
+
+
+def source_cache_before_model_callback(subtopic_index: int):
+    """Builds a before_model_callback that points the request at the subtopic's context cache.
+
+    Gemini does not accept a system instruction or tools next to cached content, so the
+    agent instruction is moved into the request contents. Agents with tools keep the
+    compacted extract from their instruction instead.
+    """
+    cache_key = f"webpage_cache_{subtopic_index}"
+
+    def before_model_callback(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        cache_name = callback_context.state.get(cache_key)
+        if not cache_name or llm_request.model != DOWNSTREAM_MODEL:
+            return None
+
+        config = llm_request.config
+        if config.tools:
+            return None
+
+        if config.system_instruction:
+            instruction = config.system_instruction
+            if not isinstance(instruction, str):
+                instruction = "\n".join(part.text for part in instruction.parts if part.text)
+            llm_request.contents.insert(0, types.Content(role="user", parts=[types.Part(text=instruction)]))
+            config.system_instruction = None
+
+        config.cached_content = cache_name
+        return None
+
+    return before_model_callback
@@ -1,20 +1,59 @@
 from google.adk.agents import SequentialAgent
 from ..web_page_agent import web_page_agent_function
+from ..web_page_agent.context_cache import compact_webpage_content, source_cache_before_model_callback
 # from ..quiz_agent import quiz_agent
 # from ..flashcard_agent import flashcard_agent
-from ..flashcard_quiz_podcast_image_agent.agent import flashcard_quiz_podcast_image_agent_function
+from ..flashcard_quiz_podcast_image_agent.agent import downstream_agents_function, flashcard_quiz_podcast_image_agent_function
+from ..research_agent.corpus import research_corpus_instruction
 
 
 count = 0
 
+# Content slot fields that can be regenerated, and the agent roles that produce each of them
+ARTIFACT_ROLES = {
+    "webContent": ("web_page_agent",),
+    "flashcards": ("flashcard_agent", "assessment_agent"),
+    "quiz": ("quiz_agent", "assessment_agent"),
+    "podcast": ("podcast_agent",),
+    "images": ("image_agent",),
+}
 
-def web_page_content_function(subtopic: str) -> SequentialAgent: 
 
+def web_page_content_function(subtopic: str, use_research_corpus: bool = False, artifacts: list = None) -> SequentialAgent: 
+    """Builds the pipeline that generates every artifact of a subtopic.
+
+    With artifacts (see ARTIFACT_ROLES), only the agents producing those artifacts are run.
+    Without "webContent", the existing webpage must be seeded into the session state with
+    regeneration_state.
+    """
     global count
     count += 1
 
-    web_page_agent = web_page_agent_function()
-    flashcard_quiz_podcast_image_agent = flashcard_quiz_podcast_image_agent_function()
+    # With a shared research corpus the writer draws from the topic-level notes
+    # instead of running its own google_search.
+    # Every agent is created even when only some run, so the per-role counters that name the
+    # output keys keep advancing together.
+    web_page_agent = web_page_agent_function(use_google_search=not use_research_corpus)
+    all_downstream_agents = downstream_agents_function()
+
+    # The downstream agents read the webpage through webpage_source_N (a pointer to the
+    # context cache, or a compacted extract) instead of the full webpage_content_N.
+    subtopic_index = int(web_page_agent.output_key.rsplit("_", 1)[1])
+    source_key = f"webpage_source_{subtopic_index}"
+    extract_key = f"webpage_extract_{subtopic_index}"
+
+    # Look the downstream agents up by role, since the combined assessment mode replaces
+    # the flashcard and quiz agents with a single assessment agent.
+    downstream_agents = {
+        agent.name.rsplit("_", 1)[0]: agent for agent in all_downstream_agents
+    }
+
+    for agent in downstream_agents.values():
+        if not agent.tools:
+            agent.before_model_callback = [
+                source_cache_before_model_callback(subtopic_index),
+                *agent.canonical_before_model_callbacks,
+            ]
 
     web_page_agent.instruction = f"""
     You are an expert technical writer and educator. Your task is to write high-quality web page content for the subtopic: "{subtopic}".
@@ -26,11 +65,14 @@ def web_page_content_function(subtopic: str) -> SequentialAgent:
     4.  **Format**: Return *only* the Markdown content. Do not include conversational filler like "Here is the content."
     """
 
-    flashcard_quiz_podcast_image_agent.sub_agents[0].instruction = f"""
+    if use_research_corpus:
+        web_page_agent.instruction = research_corpus_instruction(subtopic, web_page_agent.instruction)
+
+    flashcard_instruction = f"""
     You are a specialist in learning retention and flashcard design. Create 5 high-quality flashcards based *strictly* on the provided webpage content for the subtopic: "{subtopic}".
 
     Source Content:
-    {{{web_page_agent.output_key}}}
+    {{{source_key}}}
 
     Guidelines for Flashcards:
     1.  **Focus**: Each card should test a single distinct concept or fact from the text.
@@ -40,11 +82,11 @@ def web_page_content_function(subtopic: str) -> SequentialAgent:
           A: [Answer]
     """
 
-    flashcard_quiz_podcast_image_agent.sub_agents[1].instruction = f"""
+    quiz_instruction = f"""
     You are an assessment expert. Create a 5-question Multiple Choice Quiz (MCQ) to test the user's understanding of the subtopic "{subtopic}", based *only* on the provided content.
 
     Source Content:
-    {{{web_page_agent.output_key}}}
+    {{{source_key}}}
 
     Guidelines:
     1.  **Difficulty**: Mix of recall (easy) and conceptual application (medium).
@@ -58,12 +100,12 @@ def web_page_content_function(subtopic: str) -> SequentialAgent:
            **Correct Answer:** [Option Letter] - [Brief Explanation]
     """
 
-    flashcard_quiz_podcast_image_agent.sub_agents[2].instruction = f"""
+    podcast_instruction = f"""
     You are a world-class podcast scriptwriter. Your task is to write a highly engaging, conversational script for a podcast episode about: "{subtopic}".
 
     **Source Material:**
     Base your script *strictly* on the following content:
-    {{{web_page_agent.output_key}}}
+    {{{source_key}}}
 
     **The Hosts:**
     1.  **Alice (The Host):** Energetic, curious, and represents the audience. She asks the "dumb questions" and drives the conversation forward.
@@ -88,7 +130,7 @@ def web_page_content_function(subtopic: str) -> SequentialAgent:
     ...
     """
 
-    flashcard_quiz_podcast_image_agent.sub_agents[3].instruction = f"""
+    image_instruction = f"""
     You are a Visual Learning Specialist. Your goal is to find a single, high-quality educational illustration that best explains the subtopic: "{subtopic}".
 
     **Instructions:**
@@ -98,22 +140,77 @@ def web_page_content_function(subtopic: str) -> SequentialAgent:
         *   Good: "Labelled diagram of [Key Concept from content]", "Illustration of [Process described in content]", "Real world example of [Most Relevant Entity]"
         *   *Note: The image query does not need to strictly use the subtopic title; use whichever specific concept from the content is most visually relevant.*
     3.  **Execute:** Call the `image_tool` with your specific query to download the image and get the image URL.
-    4.  **Output:** Ensure that the image URL is stored in the output key "{flashcard_quiz_podcast_image_agent.sub_agents[3].output_key}".
+    4.  **Output:** Ensure that the image URL is stored in the output key "{downstream_agents["image_agent"].output_key}".
 
     **Source Content:**
-    {{{web_page_agent.output_key}}}
+    {{{extract_key}}}
+    """
+
+    assessment_instruction = f"""
+    You are an assessment expert and a specialist in learning retention. Create both flashcards and a Multiple Choice Quiz (MCQ) for the subtopic "{subtopic}", based *strictly* on the provided content.
+
+    Source Content:
+    {{{source_key}}}
+
+    Guidelines for Flashcards:
+    1.  **Count**: Create exactly 5 flashcards.
+    2.  **Focus**: Each card should test a single distinct concept or fact from the text.
+    3.  **Clarity**: Questions should be unambiguous. Answers should be concise.
+
+    Guidelines for the Quiz:
+    1.  **Count**: Create exactly one quiz with 5 questions. Do not repeat the flashcard questions.
+    2.  **Difficulty**: Mix of recall (easy) and conceptual application (medium).
+    3.  **Options**: Provide 4 options (A, B, C, D) for each question. Only one should be correct.
+    4.  **Correct Answers**: Give each correct answer as "[Option Letter]) [Option] - [Brief Explanation]".
     """
-    
+
+    instructions = {
+        "flashcard_agent": flashcard_instruction,
+        "quiz_agent": quiz_instruction,
+        "assessment_agent": assessment_instruction,
+        "podcast_agent": podcast_instruction,
+        "image_agent": image_instruction,
+    }
+
+    for role, agent in downstream_agents.items():
+        agent.instruction = instructions[role]
+
+    roles = None
+    if artifacts is not None:
+        roles = {role for artifact in artifacts for role in ARTIFACT_ROLES[artifact]}
+
+    sub_agents = []
+    if roles is None or "web_page_agent" in roles:
+        sub_agents.append(web_page_agent)
+    selected = [agent for role, agent in downstream_agents.items() if roles is None or role in roles]
+    if selected:
+        # flashcard_agent, quiz_agent, podcast_agent and image_agent run in parallel
+        sub_agents.append(flashcard_quiz_podcast_image_agent_function(selected))
 
     web_page_content_agent = SequentialAgent(
         name = f"web_page_content_function_agent_{count}",
         description = "Generates web page content for a given topic",
-        sub_agents=[
-            web_page_agent,
-            # flashcard_agent,
-            # quiz_agent,
-            flashcard_quiz_podcast_image_agent,
-        ],
+        sub_agents=sub_agents,
     )
 
-    return web_page_content_agent
\ No newline at end of file
+    return web_page_content_agent
+
+
+def regeneration_state(pipeline: SequentialAgent, web_content: str, sibling_pages: list) -> dict:
+    """Session state that lets the downstream agents of a pipeline run on a stored webpage.
+
+    Mirrors what the web page agent publishes (see source_context_after_agent_callback),
+    without a context cache. The sibling pages serve the offline quiz fallback as distractors.
+    """
+    # The pipeline and all of its agents share one index, since their counters advance together
+    subtopic_index = int(pipeline.name.rsplit("_", 1)[1])
+    extract = compact_webpage_content(web_content)
+    state = {
+        f"webpage_content_{subtopic_index}": web_content,
+        f"webpage_cache_{subtopic_index}": None,
+        f"webpage_extract_{subtopic_index}": extract,
+        f"webpage_source_{subtopic_index}": extract,
+    }
+    for i, page in enumerate(sibling_pages):
+        state[f"webpage_content_sibling_{i}"] = page
+    return state
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Per-session traces of the generation pipeline.
+generate_content opens a Trace for each session and binds it to the current context. Every
+stage, agent, model call, tool call (via TracingPlugin in plugins.py), timed operation and throttling sleep run under that
+context is then recorded as a span, which the API serves as a waterfall or as OTLP JSON.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Spans beyond this many per session are dropped rather than kept in memory
+MAX_SPANS = int(os.getenv("ACHARYA_TRACE_MAX_SPANS", "5000"))
+
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("acharya_trace", default=None)
+current_span: ContextVar[Optional[dict]] = ContextVar("acharya_span", default=None)
+
+
+class Trace:
+    """The spans recorded for one session, as plain dicts."""
+
+    def __init__(self, session_id: str, trace_id: Optional[str] = None, spans: Optional[list] = None):
+        self.session_id = session_id
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans = spans or []
+        self.dropped = 0
+
+    def start_span(self, name: str, kind: str, parent: Optional[dict] = None, **attributes) -> Optional[dict]:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return None
+        span = {
+            "span_id": os.urandom(8).hex(),
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "kind": kind,
+            "start": time.time_ns(),
+            "end": None,
+            "status": "ok",
+            "attributes": {key: value for key, value in attributes.items() if value is not None},
+            "events": [],
+        }
+        self.spans.append(span)
+        return span
+
+    def to_dict(self) -> dict:
+        return {"session_id": self.session_id, "trace_id": self.trace_id, "spans": self.spans}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Trace":
+        return cls(data["session_id"], data["trace_id"], data["spans"])
+
+
+def end_span(span: Optional[dict], error=None, **attributes) -> None:
+    if span is None or span["end"] is not None:
+        return
+    span["end"] = time.time_ns()
+    span["attributes"].update({key: value for key, value in attributes.items() if value is not None})
+    if error is not None:
+        span["status"] = "error"
+        span["attributes"]["error"] = str(error)[:300]
+
+
+def add_event(name: str, **attributes) -> None:
+    """Adds an event (e.g. a retry) to the current span, if a trace is active."""
+    span = current_span.get()
+    if span is not None:
+        span["events"].append({"name": name, "time": time.time_ns(), "attributes": attributes})
+
+
+@contextmanager
+def traced(name: str, kind: str = "operation", **attributes):
+    """Records the enclosed block as a child of the current span."""
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    span = trace.start_span(name, kind, current_span.get(), **attributes)
+    token = current_span.set(span) if span is not None else None
+    try:
+        yield span
+    except BaseException as e:
+        end_span(span, error=e)
+        raise
+    finally:
+        end_span(span)
+        if token is not None:
+            current_span.reset(token)
+
+
+# ---------- Export ----------
+
+def _span_end(span: dict, trace_end: int) -> int:
+    # Spans of a failed or still running session may never have ended
+    return span["end"] if span["end"] is not None else trace_end
+
+
+def critical_path(spans: list) -> list:
+    """Follows the child that finished last from the root down, i.e. the spans that set the total time."""
+    if not spans:
+        return []
+    trace_end = max(span["end"] or span["start"] for span in spans)
+    children = {}
+    for span in spans:
+        children.setdefault(span["parent_id"], []).append(span)
+
+    path = []
+    candidates = children.get(None, [])
+    while candidates:
+        span = max(candidates, key=lambda s: _span_end(s, trace_end))
+        path.append(span)
+        candidates = children.get(span["span_id"], [])
+    return path
+
+
+def waterfall(trace: Trace) -> dict:
+    """Returns the spans of a trace ordered by start, with offsets and durations in seconds."""
+    spans = sorted(trace.spans, key=lambda span: span["start"])
+    if not spans:
+        return {"session_id": trace.session_id, "trace_id": trace.trace_id, "duration": 0, "spans": []}
+
+    trace_start = spans[0]["start"]
+    trace_end = max(span["end"] or span["start"] for span in spans)
+    by_id = {span["span_id"]: span for span in spans}
+
+    def depth(span):
+        level = 0
+        while span["parent_id"] in by_id:
+            span = by_id[span["parent_id"]]
+            level += 1
+        return level
+
+    path = critical_path(spans)
+    on_path = {span["span_id"] for span in path}
+    throttled = sum(_span_end(s, trace_end) - s["start"] for s in spans if s["kind"] == "sleep")
+
+    return {
+        "session_id": trace.session_id,
+        "trace_id": trace.trace_id,
+        "duration": (trace_end - trace_start) / 1e9,
+        "throttled_seconds": throttled / 1e9,
+        "critical_path": [span["name"] for span in path],
+        "dropped_spans": trace.dropped,
+        "spans": [
+            {
+                "span_id": span["span_id"],
+                "parent_id": span["parent_id"],
+                "name": span["name"],
+                "kind": span["kind"],
+                "depth": depth(span),
+                "offset": (span["start"] - trace_start) / 1e9,
+                "duration": (_span_end(span, trace_end) - span["start"]) / 1e9,
+                "finished": span["end"] is not None,
+                "critical": span["span_id"] in on_path,
+                "status": span["status"],
+                "attributes": span["attributes"],
+                "events": [
+                    {"name": event["name"], "offset": (event["time"] - trace_start) / 1e9, "attributes": event["attributes"]}
+                    for event in span["events"]
+                ],
+            }
+            for span in spans
+        ],
+    }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp(trace: Trace, service_name: str = "acharya") -> dict:
+    """Exports a trace as OTLP/JSON (the body of an OTLP/HTTP traces request)."""
+    trace_end = max((span["end"] or span["start"] for span in trace.spans), default=0)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{
+                "scope": {"name": "acharya.tracing"},
+                "spans": [
+                    {
+                        "traceId": trace.trace_id,
+                        "spanId": span["span_id"],
+                        **({"parentSpanId": span["parent_id"]} if span["parent_id"] else {}),
+                        "name": span["name"],
+                        "kind": 1,  # SPAN_KIND_INTERNAL
+                        "startTimeUnixNano": str(span["start"]),
+                        "endTimeUnixNano": str(_span_end(span, trace_end)),
+                        "attributes": _otlp_attributes({
+                            "acharya.session_id": trace.session_id,
+                            "acharya.span_kind": span["kind"],
+                            **span["attributes"],
+                        }),
+                        "events": [
+                            {"timeUnixNano": str(event["time"]), "name": event["name"], "attributes": _otlp_attributes(event["attributes"])}
+                            for event in span["events"]
+                        ],
+                        "status": {"code": 2 if span["status"] == "error" else 1},
+                    }
+                    for span in trace.spans
+                ],
+            }],
+        }],
+    }
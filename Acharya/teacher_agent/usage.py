@@ -0,0 +1,242 @@
+"""
+Token and cost accounting of model calls, with usage budgets.
+UsagePlugin (plugins.py) records the usage metadata of every model call, and the podcast callback
+an estimate for every TTS call, into the ledger generate_content binds to the context. Totals are
+kept per session (in its session_store entry, so they are persisted and served with it), per agent
+role and model within it, and per fairness key (user or tenant) and day in a UsageStore.
+Costs are estimates from the list prices below; override them with ACHARYA_MODEL_PRICES.
+"""
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from .metrics import BUDGET_ACTIONS, MODEL_COST, MODEL_TOKENS
+
+
+def _parse_prices(value: str) -> dict:
+    """Parses "gemini-2.5-flash=0.3/0.03/2.5" into {model: (input, cached input, output)}."""
+    prices = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, numbers = item.rsplit("=", 1)
+            prices[model.strip()] = tuple(float(number) for number in numbers.split("/"))
+    return prices
+
+
+# USD per million input, cached input and output (including thinking) tokens
+PRICES = {
+    "gemini-2.5-pro": (1.25, 0.125, 10.0),
+    "gemini-2.5-flash": (0.30, 0.03, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.01, 0.40),
+    "gemini-2.5-flash-preview-tts": (0.50, 0.50, 10.0),
+    **_parse_prices(os.getenv("ACHARYA_MODEL_PRICES", "")),
+}
+# Price of models missing from PRICES
+DEFAULT_PRICE = PRICES["gemini-2.5-flash"]
+
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+# Gemini counts audio at 32 tokens per second; the TTS output is 24 kHz 16-bit mono PCM
+AUDIO_TOKENS_PER_SECOND = 32
+TTS_BYTES_PER_SECOND = 24000 * 2
+# Rough size of a text token, for the TTS prompt
+CHARS_PER_TOKEN = 4
+
+# Tokens or USD one session may use, including its regenerations (0 = unlimited)
+SESSION_TOKEN_BUDGET = int(os.getenv("ACHARYA_SESSION_TOKEN_BUDGET", "0"))
+SESSION_COST_BUDGET = float(os.getenv("ACHARYA_SESSION_COST_BUDGET", "0"))
+# Tokens or USD one user (or tenant) may use per UTC day (0 = unlimited)
+DAILY_TOKEN_BUDGET = int(os.getenv("ACHARYA_DAILY_TOKEN_BUDGET", "0"))
+DAILY_COST_BUDGET = float(os.getenv("ACHARYA_DAILY_COST_BUDGET", "0"))
+# Share of a budget after which model calls go to DOWNGRADE_MODEL; at all of it they are refused
+DOWNGRADE_AT = float(os.getenv("ACHARYA_BUDGET_DOWNGRADE_AT", "0.8"))
+DOWNGRADE_MODEL = os.getenv("ACHARYA_BUDGET_DOWNGRADE_MODEL", "gemini-2.5-flash-lite")
+
+USAGE_FILE = os.getenv("ACHARYA_USAGE_FILE", "./usage.json")
+# Days of per-user totals kept in USAGE_FILE
+RETENTION_DAYS = int(os.getenv("ACHARYA_USAGE_RETENTION_DAYS", "90"))
+
+TOKEN_KINDS = ("prompt", "cached", "output", "thoughts")
+
+
+class BudgetExceeded(Exception):
+    """Raised instead of a model call once a session or its user has used up a budget."""
+
+
+def cost(model: str, prompt: int = 0, cached: int = 0, output: int = 0, thoughts: int = 0) -> float:
+    """Estimated USD cost of a model call; cached tokens are part of the prompt tokens."""
+    input_price, cached_price, output_price = PRICES.get(model, DEFAULT_PRICE)
+    return ((prompt - cached) * input_price + cached * cached_price + (output + thoughts) * output_price) / 1e6
+
+
+def today() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def new_totals() -> dict:
+    return {"calls": 0, **{kind: 0 for kind in TOKEN_KINDS}, "tokens": 0, "cost_usd": 0.0}
+
+
+def new_usage() -> dict:
+    """Usage record of a session, as stored in its session_store entry."""
+    return {**new_totals(), "estimated_calls": 0, "downgraded_calls": 0, "budget": None,
+            "by_agent": {}, "by_model": {}}
+
+
+def _add(totals: dict, tokens: dict, calls: int = 1) -> None:
+    totals["calls"] += calls
+    for kind in TOKEN_KINDS:
+        totals[kind] += tokens[kind]
+    # Cached tokens are counted in the prompt tokens
+    totals["tokens"] += tokens["prompt"] + tokens["output"] + tokens["thoughts"]
+    totals["cost_usd"] = round(totals["cost_usd"] + tokens["cost_usd"], 6)
+
+
+class UsageStore:
+    """Tokens and cost per fairness key and UTC day, persisted to a JSON file."""
+
+    def __init__(self, path: str = USAGE_FILE):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.days = {}
+        if self.path.exists():
+            try:
+                self.days = json.loads(self.path.read_text())
+            except (OSError, ValueError) as e:
+                print(f"Error loading usage totals from {self.path}: {e}")
+
+    def add(self, key: str, totals: dict) -> None:
+        with self.lock:
+            _add(self.days.setdefault(today(), {}).setdefault(key, new_totals()), totals, totals["calls"])
+
+    def today(self, key: str) -> dict:
+        with self.lock:
+            return dict(self.days.get(today(), {}).get(key) or new_totals())
+
+    def report(self, days: int = 7) -> dict:
+        """Totals of the last days, newest first: {day: {key: totals}}."""
+        with self.lock:
+            return {day: dict(self.days[day]) for day in sorted(self.days, reverse=True)[:days]}
+
+    def save(self) -> None:
+        """Writes the totals of the retained days; blocking, so call it from a worker thread."""
+        cutoff = time.strftime("%Y-%m-%d", time.gmtime(time.time() - RETENTION_DAYS * 86400))
+        with self.lock:
+            self.days = {day: keys for day, keys in self.days.items() if day >= cutoff}
+            data = json.dumps(self.days)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            temp_path.write_text(data)
+            temp_path.replace(self.path)
+        except OSError as e:
+            print(f"Error saving usage totals to {self.path}: {e}")
+
+    def over_budget(self, key: str) -> Optional[str]:
+        """Why the key cannot start more generation today, or None."""
+        spent = self.today(key)
+        if DAILY_TOKEN_BUDGET > 0 and spent["tokens"] >= DAILY_TOKEN_BUDGET:
+            return f"Daily token budget of {DAILY_TOKEN_BUDGET} exhausted"
+        if DAILY_COST_BUDGET > 0 and spent["cost_usd"] >= DAILY_COST_BUDGET:
+            return f"Daily cost budget of ${DAILY_COST_BUDGET:.2f} exhausted"
+        return None
+
+
+class UsageLedger:
+    """Accounts the model calls of one session into its usage record and checks its budgets."""
+
+    def __init__(self, usage: dict, key: str, store: Optional[UsageStore] = None,
+                 token_budget: int = SESSION_TOKEN_BUDGET, cost_budget: float = SESSION_COST_BUDGET):
+        self.usage = usage
+        self.key = key
+        self.store = store
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        # Why the budget was exceeded, once it has been
+        self.exceeded = None
+        usage["budget"] = {"tokens": token_budget or None, "cost_usd": cost_budget or None, "state": "ok"}
+
+    def record(self, role: str, model: str, prompt: int = 0, cached: int = 0, output: int = 0,
+               thoughts: int = 0, estimated: bool = False) -> None:
+        tokens = {"prompt": prompt, "cached": cached, "output": output, "thoughts": thoughts,
+                  "cost_usd": cost(model, prompt, cached, output, thoughts)}
+        _add(self.usage, tokens)
+        _add(self.usage["by_agent"].setdefault(role, new_totals()), tokens)
+        _add(self.usage["by_model"].setdefault(model, new_totals()), tokens)
+        if estimated:
+            self.usage["estimated_calls"] += 1
+        if self.store is not None:
+            self.store.add(self.key, {**tokens, "calls": 1})
+        MODEL_COST.labels(agent=role, model=model).inc(tokens["cost_usd"])
+
+    def _used(self) -> list:
+        """(share used, description) of every budget that applies."""
+        used = []
+        if self.token_budget > 0:
+            used.append((self.usage["tokens"] / self.token_budget, f"session token budget of {self.token_budget}"))
+        if self.cost_budget > 0:
+            used.append((self.usage["cost_usd"] / self.cost_budget, f"session cost budget of ${self.cost_budget:.2f}"))
+        if self.store is not None and (DAILY_TOKEN_BUDGET > 0 or DAILY_COST_BUDGET > 0):
+            spent = self.store.today(self.key)
+            if DAILY_TOKEN_BUDGET > 0:
+                used.append((spent["tokens"] / DAILY_TOKEN_BUDGET, f"daily token budget of {DAILY_TOKEN_BUDGET}"))
+            if DAILY_COST_BUDGET > 0:
+                used.append((spent["cost_usd"] / DAILY_COST_BUDGET, f"daily cost budget of ${DAILY_COST_BUDGET:.2f}"))
+        return used
+
+    def check(self) -> str:
+        """Returns "ok", "downgrade" (calls should use DOWNGRADE_MODEL) or "exceeded"."""
+        state = "ok"
+        for share, budget in self._used():
+            if share >= 1:
+                self.exceeded = self.exceeded or f"Generation stopped at the {budget}"
+                state = "exceeded"
+                break
+            if share >= DOWNGRADE_AT:
+                state = "downgrade"
+        if state != self.usage["budget"]["state"]:
+            print(f"Usage budget state of {self.key} is now '{state}' (session: {self.usage['tokens']} tokens, ${self.usage['cost_usd']:.4f})")
+        self.usage["budget"]["state"] = state
+        return state
+
+    def downgraded(self) -> None:
+        self.usage["downgraded_calls"] += 1
+        BUDGET_ACTIONS.labels(action="downgrade").inc()
+
+    def refused(self) -> None:
+        BUDGET_ACTIONS.labels(action="cutoff").inc()
+
+
+# Ledger of the session a model call belongs to, bound to the context by generate_content
+current_ledger: ContextVar[Optional[UsageLedger]] = ContextVar("acharya_usage_ledger", default=None)
+
+
+def record_tts_usage(prompt: str, audio: bytes, model: str = TTS_MODEL) -> None:
+    """Records a TTS call, estimating its tokens from the prompt length and the audio duration.
+
+    The estimate also works for replayed calls, which have no usage metadata.
+    """
+    prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+    output_tokens = int(len(audio) / TTS_BYTES_PER_SECOND * AUDIO_TOKENS_PER_SECOND)
+    MODEL_TOKENS.labels(model=model, kind="prompt").observe(prompt_tokens)
+    MODEL_TOKENS.labels(model=model, kind="output").observe(output_tokens)
+    ledger = current_ledger.get()
+    if ledger is not None:
+        ledger.record("tts", model, prompt=prompt_tokens, output=output_tokens, estimated=True)
+
+
+def record_model_usage(role: str, model: str, usage_metadata) -> None:
+    """Records the usage metadata of a model call made outside the Runner, e.g. an output repair retry."""
+    ledger = current_ledger.get()
+    if ledger is None or usage_metadata is None:
+        return
+    ledger.record(
+        role, model,
+        prompt=usage_metadata.prompt_token_count or 0,
+        cached=usage_metadata.cached_content_token_count or 0,
+        output=usage_metadata.candidates_token_count or 0,
+        thoughts=usage_metadata.thoughts_token_count or 0,
+    )
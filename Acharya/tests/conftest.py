@@ -0,0 +1,18 @@
+"""
+Shared pytest setup.
+The modules read their settings from the environment when they are imported, so artifact and
+storage paths are pointed at a temporary directory before any test imports them.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="acharya-tests-")
+for name, default in {
+    "ACHARYA_PODCAST_DIR": os.path.join(_workdir, "podcasts"),
+    "ACHARYA_IMAGE_DIR": os.path.join(_workdir, "images"),
+    "ACHARYA_COLD_STORAGE_DIR": os.path.join(_workdir, "cold_storage"),
+    "ACHARYA_COURSE_CACHE_DIR": os.path.join(_workdir, "course_cache"),
+    "ACHARYA_SEARCH_DB": os.path.join(_workdir, "search_index.db"),
+    "ACHARYA_USAGE_FILE": os.path.join(_workdir, "usage.json"),
+}.items():
+    os.environ.setdefault(name, default)
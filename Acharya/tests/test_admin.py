@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+
+ADMIN_PATHS = [
+    ("get", "/api/admin/reaper"),
+    ("get", "/api/admin/scheduler"),
+    ("get", "/api/admin/course-cache"),
+    ("post", "/api/admin/course-cache/warm"),
+    ("get", "/api/admin/usage"),
+    ("get", "/api/admin/loop"),
+    ("get", "/api/admin/process-pool"),
+    ("get", "/api/admin/profile?seconds=0.1"),
+]
+
+client = TestClient(api_server.app)
+
+
+def test_every_admin_route_is_gated():
+    paths = {path for path in api_server.app.openapi()["paths"] if path.startswith("/api/admin")}
+    assert paths == {path.split("?")[0] for _, path in ADMIN_PATHS}
+
+
+@pytest.mark.parametrize("method,path", ADMIN_PATHS)
+def test_admin_routes_are_disabled_without_a_token(monkeypatch, method, path):
+    monkeypatch.setattr(api_server, "ADMIN_TOKEN", "")
+    assert client.request(method, path, headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("method,path", ADMIN_PATHS)
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", "admin-secret", "Basic admin-secret"])
+def test_admin_routes_need_the_token(monkeypatch, method, path, authorization):
+    monkeypatch.setattr(api_server, "ADMIN_TOKEN", "admin-secret")
+    headers = {"Authorization": authorization} if authorization else {}
+    assert client.request(method, path, headers=headers).status_code == 401
+
+
+def test_admin_routes_accept_the_token(monkeypatch):
+    monkeypatch.setattr(api_server, "ADMIN_TOKEN", "admin-secret")
+    response = client.get("/api/admin/usage", headers={"Authorization": "Bearer admin-secret"})
+    assert response.status_code == 200
+    assert "days" in response.json()
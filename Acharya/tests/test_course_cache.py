@@ -0,0 +1,55 @@
+import asyncio
+
+from services import course_cache as course_cache_module
+from services.content import new_content_slot
+from services.course_cache import CacheWarmer, CourseCache
+from teacher_agent.tracing import Trace, end_span
+from teacher_agent.usage import new_usage
+
+
+def generated_entry(topic: str, tokens: int) -> dict:
+    usage = new_usage()
+    usage.update(prompt=tokens - 100, cached=tokens - 200, output=100, tokens=tokens)
+    # Spans carry the same call, with the cached tokens counted again
+    trace = Trace("warm")
+    end_span(trace.start_span("model", "model", prompt_tokens=tokens - 100, cached_tokens=tokens - 200,
+                              output_tokens=100))
+    return {
+        "status": "completed",
+        "topic": topic,
+        "subtopics": ["Basics"],
+        "content": [{**new_content_slot("Basics"), "webContent": "# Basics"}],
+        "trace": trace,
+        "usage": usage,
+    }
+
+
+def test_courses_and_the_warmer_are_charged_the_session_usage(tmp_path, monkeypatch):
+    monkeypatch.setattr(course_cache_module, "WARMER_TOPICS", ["Photosynthesis", "Volcanoes"])
+    cache = CourseCache(tmp_path)
+
+    async def generate(topic):
+        entry = generated_entry(topic, 1000)
+        cache.put(topic, entry)
+        return entry
+
+    warmer = CacheWarmer(cache, generate)
+    assert asyncio.run(warmer.warm_once()) == ["Photosynthesis", "Volcanoes"]
+    assert cache.spend["courses"] == 2
+    assert cache.spend["tokens"] == 2000
+    assert [item["tokens"] for item in cache.courses.values()] == [1000, 1000]
+
+
+def test_the_warmer_stops_at_its_token_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(course_cache_module, "WARMER_TOPICS", ["Photosynthesis", "Volcanoes"])
+    monkeypatch.setattr(course_cache_module, "WARMER_DAILY_TOKENS", 1500)
+    cache = CourseCache(tmp_path)
+
+    async def generate(topic):
+        entry = generated_entry(topic, 1000)
+        cache.put(topic, entry)
+        return entry
+
+    warmer = CacheWarmer(cache, generate)
+    assert asyncio.run(warmer.warm_once()) == ["Photosynthesis"]
+    assert warmer.stats["skipped_budget"] == 1
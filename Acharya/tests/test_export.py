@@ -0,0 +1,75 @@
+import io
+import json
+import zipfile
+
+from services import export
+from services.content import image_url, new_content_slot, podcast_audio_url
+from services.export import archive_name, course_archive
+
+
+def exported(session_id: str, entry: dict) -> zipfile.ZipFile:
+    return zipfile.ZipFile(io.BytesIO(b"".join(course_archive(session_id, entry))))
+
+
+def course_entry() -> dict:
+    slot = {
+        **new_content_slot("Light Reactions"),
+        "webContent": "# Light Reactions",
+        "webHtml": "<h1>Light Reactions</h1>",
+        "flashcards": [{"question": "What is ATP?", "answer": "An energy carrier"}],
+        "quiz": [{"question": "Where?", "options": ["Thylakoid", "Stroma"], "correctAnswer": 0}],
+    }
+    slot["podcast"] = {**slot["podcast"], "transcript": "Host: Hello", "audioUrl": podcast_audio_url("out_0.wav")}
+    slot["images"] = [{"url": image_url("image_0.jpg"), "title": "Light Reactions Visual"},
+                      {"url": image_url("gone.jpg"), "title": "Light Reactions Visual"}]
+    return {"topic": "Photosynthesis: The Basics!", "subtopics": ["Light Reactions"], "content": [slot],
+            "created_at": 1.0}
+
+
+def test_a_course_is_exported_with_its_manifest_and_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "PODCAST_DIR", tmp_path)
+    monkeypatch.setattr(export, "IMAGE_DIR", tmp_path)
+    audio = b"RIFF" + bytes(3 * export.CHUNK_SIZE)
+    (tmp_path / "out_0.wav").write_bytes(audio)
+    (tmp_path / "image_0.jpg").write_bytes(b"\xff\xd8jpeg")
+
+    archive = exported("s1", course_entry())
+    folder = "subtopics/01-light-reactions"
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["topic"] == "Photosynthesis: The Basics!"
+    assert manifest["missing_artifacts"] == ["gone.jpg"]
+    assert manifest["subtopics"][0]["files"] == {
+        "webpage": [f"{folder}/webpage.md", f"{folder}/webpage.html"],
+        "flashcards": [f"{folder}/flashcards.json"],
+        "quiz": [f"{folder}/quiz.json"],
+        "podcast": [f"{folder}/podcast.txt", f"{folder}/podcast.wav"],
+        "images": [f"{folder}/images/image_0.jpg"],
+    }
+    assert archive.read(f"{folder}/podcast.wav") == audio
+    assert archive.getinfo(f"{folder}/podcast.wav").compress_type == zipfile.ZIP_STORED
+    assert json.loads(archive.read(f"{folder}/flashcards.json"))[0]["answer"] == "An energy carrier"
+    assert archive.testzip() is None
+
+
+def test_the_archive_is_streamed_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "PODCAST_DIR", tmp_path)
+    monkeypatch.setattr(export, "IMAGE_DIR", tmp_path)
+    (tmp_path / "out_0.wav").write_bytes(bytes(4 * export.CHUNK_SIZE))
+    chunks = list(course_archive("s1", course_entry()))
+    assert len(chunks) > 4
+    assert max(len(chunk) for chunk in chunks) <= 2 * export.CHUNK_SIZE
+
+
+def test_the_course_is_snapshotted_when_the_export_starts(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "PODCAST_DIR", tmp_path)
+    monkeypatch.setattr(export, "IMAGE_DIR", tmp_path)
+    entry = course_entry()
+    chunks = course_archive("s1", entry)
+    entry["content"][0]["webContent"] = "# Regenerated"
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.read("subtopics/01-light-reactions/webpage.md") == b"# Light Reactions"
+
+
+def test_archive_names():
+    assert archive_name({"topic": "Photosynthesis: The Basics!"}) == "photosynthesis-the-basics.zip"
+    assert archive_name({"topic": "???"}) == "course.zip"
@@ -0,0 +1,12 @@
+from google.adk.agents import LlmAgent
+
+from teacher_agent.sub_agents.factory_agent.agent import factory_agent_function
+
+
+def test_each_session_gets_its_own_factory_agent():
+    first = factory_agent_function([LlmAgent(name="web_page_agent_a", model="gemini-2.5-flash")])
+    second = factory_agent_function([LlmAgent(name="web_page_agent_b", model="gemini-2.5-flash")])
+    assert first is not second
+    assert first.name != second.name
+    assert [agent.name for agent in first.sub_agents] == ["web_page_agent_a"]
+    assert [agent.name for agent in second.sub_agents] == ["web_page_agent_b"]
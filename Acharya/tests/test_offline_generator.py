@@ -0,0 +1,104 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+from google.genai import errors
+
+from teacher_agent.offline_generator import (
+    FLASHCARD_COUNT,
+    generate_flashcards,
+    generate_quiz,
+    is_complete,
+    is_transient,
+    offline_fallback_on_model_error_callback,
+)
+from teacher_agent.sub_agents.assessment_agent.agent import Assessment
+from teacher_agent.sub_agents.flashcard_agent.agent import FlashcardList
+from teacher_agent.sub_agents.quiz_agent.agent import QuizList
+
+SHORT_PAGE = """# Photosynthesis
+
+Photosynthesis is the process by which green plants convert light energy into chemical energy. It takes place in the **chloroplasts** of leaf cells, where chlorophyll absorbs sunlight. The products are glucose and oxygen, which is released into the air.
+"""
+
+ONE_SENTENCE_PAGE = "# Tiny\n\nThis page has only one sentence that is long enough to be used here.\n"
+
+SIBLING_PAGE = """# Cellular Respiration
+
+- **Mitochondria**: organelles where cellular respiration releases energy from glucose.
+- **ATP**: the molecule cells use to store and transfer energy.
+"""
+
+
+OVERLOADED = errors.ServerError(503, {"error": {"code": 503, "message": "The model is overloaded", "status": "UNAVAILABLE"}})
+
+
+class FakeState(dict):
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+def fake_context(state: dict, agent_name: str = "flashcard_agent_1"):
+    return SimpleNamespace(state=FakeState(state), agent_name=agent_name)
+
+
+def test_short_page_gets_exactly_five_distinct_flashcards():
+    cards = generate_flashcards(SHORT_PAGE)["flashcards"]
+    assert len(cards) == FLASHCARD_COUNT
+    assert len({card["answer"].lower() for card in cards}) == FLASHCARD_COUNT
+    assert len({card["question"].lower() for card in cards}) == FLASHCARD_COUNT
+    FlashcardList.model_validate({"flashcards": cards})
+
+
+def test_sentences_without_a_term_are_not_definitions():
+    questions = [card["question"] for card in generate_flashcards(SHORT_PAGE)["flashcards"]]
+    assert "What is The products?" not in questions
+
+
+def test_short_page_quiz_lines_up():
+    quiz = generate_quiz(SHORT_PAGE)["quiz"][0]
+    assert quiz["questions"]
+    assert len(quiz["questions"]) == len(quiz["options"]) == len(quiz["correct_answers"])
+    assert all(len(options) == 4 and len(set(options)) == 4 for options in quiz["options"])
+    QuizList.model_validate({"quiz": [quiz]})
+
+
+def test_one_sentence_page_is_incomplete():
+    result = {**generate_flashcards(ONE_SENTENCE_PAGE), **generate_quiz(ONE_SENTENCE_PAGE)}
+    assert not is_complete(result, "flashcards")
+    assert not is_complete(result, "quiz")
+
+
+def test_callback_reraises_errors_that_are_not_transient():
+    callback = offline_fallback_on_model_error_callback(1, "assessment")
+    context = fake_context({"webpage_content_1": SHORT_PAGE, "webpage_content_2": SIBLING_PAGE}, "assessment_agent_1")
+    invalid = errors.ClientError(400, {"error": {"code": 400, "message": "Bad request", "status": "INVALID_ARGUMENT"}})
+    denied = errors.ClientError(403, {"error": {"code": 403, "message": "Denied", "status": "PERMISSION_DENIED"}})
+    for error in (invalid, denied, KeyError("webpage_content_1")):
+        assert callback(context, None, error) is None
+
+
+def test_transient_errors():
+    rate_limited = errors.ClientError(429, {"error": {"code": 429, "message": "Quota", "status": "RESOURCE_EXHAUSTED"}})
+    assert is_transient(OVERLOADED) and is_transient(rate_limited)
+    assert is_transient(TimeoutError()) and is_transient(httpx.ConnectTimeout("timed out"))
+    assert not is_transient(RuntimeError("503 overloaded"))
+
+
+def test_callback_reraises_when_the_page_is_too_short():
+    callback = offline_fallback_on_model_error_callback(1, "flashcards")
+    context = fake_context({"webpage_content_1": ONE_SENTENCE_PAGE})
+    assert callback(context, None, OVERLOADED) is None
+
+
+def test_callback_reraises_when_the_page_is_missing():
+    callback = offline_fallback_on_model_error_callback(1, "quiz")
+    assert callback(fake_context({}, "quiz_agent_1"), None, OVERLOADED) is None
+
+
+def test_callback_answers_with_a_valid_assessment():
+    callback = offline_fallback_on_model_error_callback(1, "assessment")
+    context = fake_context({"webpage_content_1": SHORT_PAGE, "webpage_content_2": SIBLING_PAGE}, "assessment_agent_1")
+    response = callback(context, None, OVERLOADED)
+    assert response is not None
+    Assessment.model_validate(json.loads(response.content.parts[0].text))
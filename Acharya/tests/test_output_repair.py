@@ -0,0 +1,90 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from google.adk.models import LlmResponse
+from google.genai import types
+
+from teacher_agent.output_repair import (
+    FLASHCARD_COUNT,
+    OutputRepair,
+    close_truncated_json,
+    parse_json_leniently,
+    repair_assessment,
+    repair_flashcards,
+    repair_quiz,
+    repair_topics,
+)
+from teacher_agent.sub_agents.flashcard_agent.agent import FlashcardList
+
+
+def cards(count: int) -> list:
+    return [{"question": f"Question {i}?", "answer": f"Answer {i}"} for i in range(count)]
+
+
+def test_truncated_json_is_closed():
+    assert close_truncated_json('{"flashcards": [{"question": "a", "answer": "b"}, {"question": "c"') == {
+        "flashcards": [{"question": "a", "answer": "b"}, {"question": "c"}]
+    }
+
+
+def test_code_fences_and_prose_are_ignored():
+    assert parse_json_leniently('Here you go:\n```json\n{"a": 1}\n```') == {"a": 1}
+
+
+def test_extra_flashcards_are_trimmed():
+    repaired = repair_flashcards(json.dumps({"flashcards": cards(7)}))
+    assert repaired["flashcards"] == cards(5)
+
+
+def test_missing_flashcards_are_padded():
+    repaired = repair_flashcards(json.dumps({"cards": [{"q": c["question"], "a": c["answer"]} for c in cards(3)]}))
+    assert len(repaired["flashcards"]) == FLASHCARD_COUNT
+    assert repaired["flashcards"][:3] == cards(3)
+    assert repaired["flashcards"][3] == {"question": 'Which question has the answer: "Answer 0"?', "answer": "Question 0?"}
+    FlashcardList.model_validate(repaired)
+
+
+def test_too_few_flashcards_are_not_repaired():
+    assert repair_flashcards(json.dumps({"flashcards": cards(2)})) is None
+
+
+def test_duplicate_flashcards_count_once():
+    assert repair_flashcards(json.dumps({"flashcards": cards(2) + cards(2)})) is None
+
+
+def test_quiz_questions_are_merged_and_padded():
+    data = [{"question": "Q1?", "options": ["a", "b"], "answer": "A) a"}, {"question": "Q2?", "options": [], "answer": "x"}]
+    repaired = repair_quiz(json.dumps(data))
+    quiz = repaired["quiz"][0]
+    assert quiz["questions"] == ["Q1?"]
+    assert len(quiz["options"][0]) == 4
+
+
+def test_assessment_needs_both_halves():
+    quiz = {"questions": ["Q?"], "options": [["a", "b", "c", "d"]], "correct_answers": ["A) a"]}
+    assert repair_assessment(json.dumps({"flashcards": cards(4), "quiz": [quiz]})) is not None
+    assert repair_assessment(json.dumps({"flashcards": cards(1), "quiz": [quiz]})) is None
+
+
+def test_topics_are_cleaned():
+    repaired = repair_topics(json.dumps({"subtopics": "1. A\n2. B\n3. C\n- D\n5) E\n5) E"}))
+    assert repaired == {"subtopics": ["A", "B", "C", "D", "E"], "count": 5}
+
+
+def test_failed_calls_leave_no_request_behind():
+    context = SimpleNamespace(invocation_id="invocation", agent_name="flashcard_agent_0")
+    repair = OutputRepair(FlashcardList, repair_flashcards)
+
+    repair.remember_request_before_model_callback(context, object())
+    assert repair.forget_request_on_model_error_callback(context, None, RuntimeError("503")) is None
+    assert repair.requests == {}
+
+    repair.remember_request_before_model_callback(context, object())
+    repair.forget_request_after_agent_callback(context)
+    assert repair.requests == {}
+
+    repair.remember_request_before_model_callback(context, object())
+    response = LlmResponse(content=types.Content(role="model", parts=[types.Part(text=json.dumps({"flashcards": cards(5)}))]))
+    assert asyncio.run(repair.repair_after_model_callback(context, response)) is None
+    assert repair.requests == {}
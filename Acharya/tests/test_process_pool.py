@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import pytest
+
+from services.process_pool import ProcessPool
+
+
+def test_a_timeout_does_not_fail_the_other_tasks():
+    pool = ProcessPool(workers=2, max_pending=4, timeout=2)
+
+    async def run():
+        # Spawned workers take a moment to start, so the timed tasks begin on warm workers
+        await pool.run("warmup", time.sleep, 0)
+        stuck = asyncio.ensure_future(pool.run("stuck", time.sleep, 30))
+        await asyncio.sleep(1)
+        # Still running in the other worker when the stuck task times out
+        other = asyncio.ensure_future(pool.run("other", time.sleep, 1.5))
+        with pytest.raises(asyncio.TimeoutError):
+            await stuck
+        await other
+        # New tasks go to new workers
+        await pool.run("after", time.sleep, 0)
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert pool.stats == {"ok": 3, "error": 0, "timeout": 1, "restarts": 1}
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from services import reaper as reaper_module
+from services.content import new_content_slot
+from services.reaper import SessionReaper
+from services.result_sink import ResultSink
+
+
+def finished_entry(age: float) -> dict:
+    return {
+        "status": "completed",
+        "topic": "Photosynthesis",
+        "subtopics": ["Light Reactions"],
+        "content": [{**new_content_slot("Light Reactions"), "webContent": "# Light Reactions"}],
+        "progress": "Done",
+        "user_id": "student",
+        "finished_at": time.time() - age,
+    }
+
+
+def make_reaper(tmp_path, session_store: dict) -> SessionReaper:
+    reaper = SessionReaper(session_store, lambda: None, "Acharya", [tmp_path / "files"])
+    reaper.cold_dir = tmp_path
+    reaper.index_path = tmp_path / "index.json"
+    return reaper
+
+
+def test_expired_results_are_evicted_and_restored(tmp_path):
+    session_store = {"old": finished_entry(reaper_module.RESULT_TTL + 60), "new": finished_entry(0)}
+    reaper = make_reaper(tmp_path, session_store)
+
+    asyncio.run(reaper.reap_once())
+    assert list(session_store) == ["new"]
+    assert reaper.stats["results_evicted"] == 1
+    assert "old" in reaper.cold_index
+
+    restored = asyncio.run(reaper.load_cold("old"))
+    assert restored is session_store["old"]
+    assert restored["content"][0]["webContent"] == "# Light Reactions"
+    assert asyncio.run(reaper.load_cold("unknown")) is None
+
+
+def test_results_changed_while_written_are_kept(tmp_path, monkeypatch):
+    entry = finished_entry(reaper_module.RESULT_TTL + 60)
+    session_store = {"old": entry}
+    reaper = make_reaper(tmp_path, session_store)
+    write_cold = reaper._write_cold
+
+    def regenerate_meanwhile(session_id, record, artifacts):
+        # What the sink of a regeneration does to the live entry
+        entry["content"][0]["webContent"] = "# Regenerated"
+        entry["content"].append(new_content_slot("Dark Reactions"))
+        entry.pop("size_bytes", None)
+        write_cold(session_id, record, artifacts)
+        entry["status"] = "completed"
+
+    monkeypatch.setattr(reaper, "_write_cold", regenerate_meanwhile)
+    asyncio.run(reaper.reap_once())
+    assert session_store == {"old": entry}
+    assert reaper.stats["results_evicted"] == 0
+    # The record is the result as it was chosen for eviction
+    written = reaper._read_cold("old")
+    assert [slot["webContent"] for slot in written["content"]] == ["# Light Reactions"]
+
+
+def test_a_restored_result_is_not_replaced(tmp_path):
+    session_store = {"old": finished_entry(reaper_module.RESULT_TTL + 60)}
+    reaper = make_reaper(tmp_path, session_store)
+    asyncio.run(reaper.reap_once())
+
+    current = finished_entry(0)
+
+    async def restore_twice():
+        loading = asyncio.ensure_future(reaper.load_cold("old"))
+        session_store["old"] = current
+        return await loading
+
+    assert asyncio.run(restore_twice()) is current
+    assert session_store["old"] is current
+
+
+def test_the_sink_invalidates_the_result_size():
+    entry = finished_entry(0)
+    entry["size_bytes"] = 1
+    sink = ResultSink(entry, entry["subtopics"], [], slots=[])
+    assert "size_bytes" not in entry
+
+    entry["size_bytes"] = 1
+    sink.slot_for_key["flashcards_0"] = 0
+    sink.publish({"flashcards_0": {"flashcards": [{"question": "What is ATP?", "answer": "An energy carrier"}]}})
+    assert "size_bytes" not in entry
+
+    entry["size_bytes"] = 1
+    sink.replace_subtopic(0, "Dark Reactions")
+    assert "size_bytes" not in entry
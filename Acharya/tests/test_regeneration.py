@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+import api_server
+from services.content import new_content_slot
+
+client = TestClient(api_server.app)
+
+
+def stored_session(monkeypatch) -> str:
+    entry = {
+        "status": "completed",
+        "topic": "Photosynthesis",
+        "subtopics": ["Light Reactions"],
+        "content": [{**new_content_slot("Light Reactions"), "webContent": "# Light Reactions"}],
+        "user_id": "student",
+        "tenant_id": "greenwood",
+    }
+    monkeypatch.setitem(api_server.session_store, "s1", entry)
+    return "s1"
+
+
+def test_regeneration_runs_as_the_stored_user_and_tenant(monkeypatch):
+    session_id = stored_session(monkeypatch)
+    started = []
+
+    async def regenerate_content(*args):
+        started.append(args)
+
+    monkeypatch.setattr(api_server, "regenerate_content", regenerate_content)
+    response = client.post(f"/api/sessions/{session_id}/regenerate", json={
+        "targets": [{"subtopic_index": 0, "artifacts": ["quiz"]}],
+        "tenant_id": "someone_else",
+    })
+    assert response.status_code == 200
+    [(_, targets, user_id, tenant_id)] = started
+    assert (user_id, tenant_id) == ("student", "greenwood")
+    assert targets == [{"subtopic_index": 0, "artifacts": ["quiz"], "subtopic": None}]
+
+
+def test_regeneration_checks_the_stored_tenant_budget(monkeypatch):
+    session_id = stored_session(monkeypatch)
+    checked = []
+
+    def over_budget(key):
+        checked.append(key)
+        return "Daily token budget of 100 exhausted"
+
+    monkeypatch.setattr(api_server.usage_store, "over_budget", over_budget)
+    response = client.post(f"/api/sessions/{session_id}/regenerate", json={
+        "targets": [{"subtopic_index": 0}],
+        "tenant_id": "someone_else",
+    })
+    assert response.status_code == 429
+    assert checked == ["tenant:greenwood"]
+    assert api_server.session_store[session_id]["status"] == "completed"
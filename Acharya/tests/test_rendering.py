@@ -0,0 +1,36 @@
+from services.rendering import render_webpage
+
+
+def test_markdown_is_rendered_with_the_frontend_classes():
+    html, toc = render_webpage("## Overview\n\nPlants **capture** light.\n\n- one\n- two\n")
+    assert '<h2 class="md-h2" id="overview">Overview</h2>' in html
+    assert '<strong class="md-bold">capture</strong>' in html
+    assert '<ul class="md-list">' in html
+    assert toc == [{"level": 2, "id": "overview", "title": "Overview"}]
+
+
+def test_the_table_of_contents_covers_levels_2_and_3():
+    _, toc = render_webpage("# Title\n\n## Light & Energy\n\n### Chlorophyll\n\n#### Detail\n")
+    assert [(entry["level"], entry["title"]) for entry in toc] == [(2, "Light & Energy"), (3, "Chlorophyll")]
+
+
+def test_scripts_handlers_and_unsafe_links_are_removed():
+    html, _ = render_webpage(
+        '<script>alert(1)</script>\n\n<img src=x onerror="alert(2)">\n\n'
+        '[click](javascript:alert(3)) and [docs](https://example.com)'
+    )
+    assert "<script" not in html and "alert(1)" not in html
+    assert "onerror" not in html and "<img" not in html
+    assert "javascript:" not in html
+    assert 'href="https://example.com"' in html
+
+
+def test_citations_and_sources():
+    html, _ = render_webpage("Light drives it [1].\n\n## References\n\n1. [Source](https://example.com)\n")
+    assert '<cite class="citation">[1]</cite>' in html
+    assert 'class="md-h2 sources-header"' in html
+
+
+def test_fenced_code_blocks_keep_their_class():
+    html, _ = render_webpage("```\nx = 1 < 2\n```\n")
+    assert '<pre class="md-code-block"><code>x = 1 &lt; 2' in html
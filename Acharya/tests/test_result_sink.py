@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+from services import postprocess
+from services.content import new_content_slot
+from services.process_pool import process_pool
+from services.result_sink import ResultSink
+
+
+def test_reused_pages_are_rendered_off_the_event_loop(monkeypatch):
+    # Threads instead of worker processes, so the rendering can be observed
+    monkeypatch.setattr(process_pool, "workers", 0)
+    render_webpage = postprocess.render_webpage
+    rendered_on = []
+
+    def render(text):
+        rendered_on.append(threading.current_thread())
+        return render_webpage(text)
+
+    monkeypatch.setattr(postprocess, "render_webpage", render)
+    # Stored before webpages were rendered on the server
+    stored = {**new_content_slot("Light Reactions"), "webContent": "## Thylakoids\n\nWhere light is absorbed."}
+    del stored["webHtml"], stored["webToc"]
+
+    async def run():
+        entry = {}
+        sink = ResultSink(entry, ["Light Reactions", "Dark Reactions"], [], reused={0: stored})
+        assert entry["content"][0]["webHtml"] == ""
+        await sink.finalize()
+        return entry
+
+    entry = asyncio.run(run())
+    assert rendered_on and threading.main_thread() not in rendered_on
+    assert 'id="thylakoids"' in entry["content"][0]["webHtml"]
+    assert entry["content"][0]["webToc"] == [{"level": 2, "id": "thylakoids", "title": "Thylakoids"}]
+    assert entry["content"][0]["podcast"]["title"] == "Light Reactions Overview"
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from teacher_agent.scheduler import FairScheduler, fairness_key
+
+
+def test_fairness_keys():
+    assert fairness_key("ana") == "user:ana"
+    assert fairness_key(None) == "user:default_user"
+    assert fairness_key("ana", "greenwood") == "tenant:greenwood"
+
+
+def run_in_order(scheduler: FairScheduler, keys: list, held: list) -> list:
+    """Queues a waiter per key behind the held slots, then frees them; returns the grant order."""
+    order = []
+
+    async def run():
+        grants = [await scheduler.acquire(key) for key in held]
+
+        async def wait(key):
+            async with scheduler.slot(key):
+                order.append(key)
+                await asyncio.sleep(0)
+
+        waiters = []
+        for key in keys:
+            waiters.append(asyncio.ensure_future(wait(key)))
+            await asyncio.sleep(0)
+        for grant in grants:
+            scheduler.release(grant)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    return order
+
+
+def test_a_batch_does_not_starve_other_keys():
+    scheduler = FairScheduler("test", capacity=1)
+    order = run_in_order(scheduler, ["user:batch"] * 4 + ["user:ana"], held=["user:other"])
+    assert order.index("user:ana") <= 1
+
+
+def test_weights_set_the_shares():
+    scheduler = FairScheduler("test", capacity=1, weights={"tenant:school": 3})
+    order = run_in_order(scheduler, ["user:ana"] * 4 + ["tenant:school"] * 6, held=["user:other"])
+    assert order[:4].count("tenant:school") == 3
+
+
+def test_caps_limit_a_key_but_not_the_others():
+    async def run():
+        scheduler = FairScheduler("test", capacity=0, default_cap=1)
+        first = await scheduler.acquire("user:ana")
+        blocked = asyncio.ensure_future(scheduler.acquire("user:ana"))
+        other = await asyncio.wait_for(scheduler.acquire("user:ben"), 1)
+        await asyncio.sleep(0)
+        assert not blocked.done()
+        scheduler.release(first)
+        await asyncio.wait_for(blocked, 1)
+        assert scheduler.snapshot()["active"] == 2
+        scheduler.release(other)
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiters_hand_their_slot_on():
+    async def run():
+        scheduler = FairScheduler("test", capacity=1)
+        grant = await scheduler.acquire("user:ana")
+        cancelled = asyncio.ensure_future(scheduler.acquire("user:ben"))
+        waiting = asyncio.ensure_future(scheduler.acquire("user:cai"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        scheduler.release(grant)
+        await asyncio.wait_for(waiting, 1)
+        assert scheduler.snapshot()["keys"] == {"user:cai": {"active": 1, "queued": 0, "weight": 1.0, "cap": 0}}
+
+    asyncio.run(run())
+
+
+def test_releasing_twice_and_by_owner():
+    async def run():
+        scheduler = FairScheduler("test", capacity=2)
+        grant = await scheduler.acquire("user:ana", owner="s1")
+        await scheduler.acquire("user:ana", owner="s1")
+        scheduler.release(grant)
+        scheduler.release(grant)
+        assert scheduler.snapshot()["active"] == 1
+        scheduler.release_owner("s1")
+        assert scheduler.snapshot()["active"] == 0
+        assert not scheduler.by_owner
+
+    asyncio.run(run())
@@ -0,0 +1,35 @@
+from services.content import new_content_slot
+from services.search_index import SearchIndex
+
+
+def indexed(tmp_path, web_content: str) -> SearchIndex:
+    index = SearchIndex(str(tmp_path / "search.db"))
+    content = {**new_content_slot("Cross-Site Scripting"), "webContent": web_content}
+    index.index_session("s1", {"topic": "Web Security", "subtopics": ["Cross-Site Scripting"], "content": [content]})
+    return index
+
+
+def test_snippets_escape_the_text_and_mark_the_matches(tmp_path):
+    index = indexed(tmp_path, 'An attacker injects <script>alert("xss")</script> & <mark>steals</mark> cookies.')
+    [result] = index.search("attacker cookies")["results"]
+    assert "<script>" not in result["snippet"]
+    assert "&lt;script&gt;" in result["snippet"]
+    assert "&lt;mark&gt;steals&lt;/mark&gt;" in result["snippet"]
+    assert "&amp;" in result["snippet"]
+    assert "<mark>attacker</mark>" in result["snippet"]
+    assert "<mark>cookies</mark>" in result["snippet"]
+    assert result["snippet"].count("<mark>") == 2
+
+
+def test_existing_material_is_plain_text(tmp_path):
+    index = indexed(tmp_path, "An attacker injects a script that steals cookies & tokens.")
+    material = index.existing_material("cookies")
+    assert material.startswith("- **Cross-Site Scripting** (course: Web Security): ")
+    assert "steals cookies & tokens" in material
+    assert "\x02" not in material and "\x03" not in material and "<mark>" not in material
+
+
+def test_queries_are_searched_as_plain_words(tmp_path):
+    index = indexed(tmp_path, "An attacker injects a script that steals cookies.")
+    assert index.search('cookies" OR NOT "x')["total"] == 0
+    assert index.search("STEALS cookies!")["total"] == 1
@@ -0,0 +1,67 @@
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from services import snapshots
+from services.content import new_content_slot
+from services.snapshots import choose_encoding, get_status_snapshot
+
+
+def session_entry() -> dict:
+    return {
+        "status": "processing",
+        "topic": "Photosynthesis",
+        "subtopics": ["Light Reactions"],
+        "content": [new_content_slot("Light Reactions")],
+        "sink": SimpleNamespace(version=0),
+    }
+
+
+def test_snapshots_are_reused_until_the_content_version_changes():
+    entry = session_entry()
+    snapshot = get_status_snapshot("s1", entry)
+    assert json.loads(snapshot.body)["topic"] == "Photosynthesis"
+
+    entry["content"][0]["webContent"] = "# Light Reactions"
+    assert get_status_snapshot("s1", entry) is snapshot
+
+    entry["sink"].version += 1
+    changed = get_status_snapshot("s1", entry)
+    assert changed is not snapshot
+    assert changed.etag != snapshot.etag
+    assert json.loads(changed.body)["content"][0]["webContent"] == "# Light Reactions"
+
+    entry["status"] = "completed"
+    assert get_status_snapshot("s1", entry) is not changed
+
+
+def test_compressed_variants_are_built_once():
+    snapshot = get_status_snapshot("s1", session_entry())
+    compressed = snapshot.encode("gzip")
+    assert gzip.decompress(compressed) == snapshot.body
+    assert snapshot.encode("gzip") is compressed
+
+
+@pytest.mark.parametrize("accept_encoding,expected", [
+    (None, "identity"),
+    ("gzip, deflate", "gzip"),
+    ("*", "gzip"),
+    ("gzip;q=0", "identity"),
+    ("deflate", "identity"),
+])
+def test_encoding_choice(accept_encoding, expected):
+    assert choose_encoding(accept_encoding, 10000) == expected
+
+
+def test_small_bodies_are_not_compressed():
+    assert choose_encoding("gzip", snapshots.COMPRESS_MIN_BYTES - 1) == "identity"
+
+
+def test_brotli_is_preferred_when_available(monkeypatch):
+    monkeypatch.setattr(snapshots, "brotli", object())
+    assert choose_encoding("gzip, br", 10000) == "br"
+    assert choose_encoding("gzip, br;q=0", 10000) == "gzip"
+    monkeypatch.setattr(snapshots, "brotli", None)
+    assert choose_encoding("gzip, br", 10000) == "gzip"
@@ -0,0 +1,30 @@
+"""
+Startup regression: api_server must import quickly and leave the agent pipeline to
+services/pipeline.py. Runs the import check of benchmarks/bench_startup.py.
+"""
+import importlib.util
+import os
+import statistics
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    "bench_startup", Path(__file__).resolve().parent.parent / "benchmarks" / "bench_startup.py")
+bench_startup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench_startup)
+
+# Generous for slow CI machines; the import takes well under a second on a laptop
+MAX_IMPORT_SECONDS = float(os.getenv("ACHARYA_MAX_IMPORT_SECONDS", "3"))
+# Loaded lazily by services/pipeline.py
+DEFERRED_PACKAGES = ("google.adk", "google.genai", "serpapi")
+
+
+def test_api_server_imports_quickly_without_the_pipeline():
+    env = bench_startup.isolated_env()
+    runs = [bench_startup.measure_import(env) for _ in range(3)]
+
+    imported = {module["module"] for module in bench_startup.slowest_modules(runs[-1][1], top=100000)}
+    deferred = sorted(name for name in imported if name.startswith(DEFERRED_PACKAGES))
+    assert deferred == []
+
+    median = statistics.median(seconds for seconds, _ in runs)
+    assert median <= MAX_IMPORT_SECONDS, f"Median import of api_server took {median:.2f}s"
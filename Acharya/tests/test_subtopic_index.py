@@ -0,0 +1,56 @@
+from services.subtopic_index import SubtopicIndex, containment, keywords, numerals
+
+
+def page(title: str) -> dict:
+    return {"webContent": f"# {title}\n\n## Sets and dictionaries\n\nSome text."}
+
+
+def index_with(tmp_path, *titles) -> SubtopicIndex:
+    index = SubtopicIndex(tmp_path)
+    for title in titles:
+        index.add("Topic", title, page(title), [f"{title}.wav"])
+    return index
+
+
+def test_reordered_title_reuses_content(tmp_path):
+    index = index_with(tmp_path, "The Light Reactions of Photosynthesis")
+    match = index.find("Photosynthesis Light Reactions")
+    assert match is not None
+    assert match["title"] == "The Light Reactions of Photosynthesis"
+    assert match["content"]["webContent"].startswith("# The Light Reactions")
+
+
+def test_different_numerals_never_match(tmp_path):
+    index = index_with(tmp_path, "Causes of World War I")
+    assert index.find("Causes of World War II") is None
+    assert index.find("Causes of World War I") is not None
+
+
+def test_keywords_must_be_contained_both_ways(tmp_path):
+    # The stored headings mention sets, but the stored title is about tuples
+    index = index_with(tmp_path, "Python Lists and Tuples")
+    assert index.find("Python Sets and Lists") is None
+
+
+def test_generic_titles_are_not_matched(tmp_path):
+    index = index_with(tmp_path, "Introduction")
+    assert index.find("Introduction") is None
+
+
+def test_numerals():
+    assert numerals("World War II") == {"ii"}
+    assert numerals("HTML5 Forms") == {"html5"}
+    assert numerals("Mixing Colors") == set()
+
+
+def test_containment_is_the_lower_share():
+    query = keywords("Python Sets and Lists")
+    stored = keywords("Python Lists and Tuples") | keywords("Sets and dictionaries")
+    assert containment(query, "Python Lists and Tuples", stored) == 2 / 3
+
+
+def test_saved_index_is_loaded(tmp_path):
+    index_with(tmp_path, "The Light Reactions of Photosynthesis").save()
+    reloaded = SubtopicIndex(tmp_path)
+    assert reloaded.find("Photosynthesis Light Reactions") is not None
+    assert reloaded.artifacts() == {"The Light Reactions of Photosynthesis.wav"}
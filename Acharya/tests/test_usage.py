@@ -0,0 +1,66 @@
+import pytest
+
+from teacher_agent import usage
+from teacher_agent.usage import UsageLedger, UsageStore, cost, new_usage
+
+
+def test_cost_charges_cached_tokens_at_the_cached_price():
+    # gemini-2.5-flash: 0.30 input, 0.03 cached input, 2.50 output per million tokens
+    assert cost("gemini-2.5-flash", prompt=1_000_000) == pytest.approx(0.30)
+    assert cost("gemini-2.5-flash", prompt=1_000_000, cached=1_000_000) == pytest.approx(0.03)
+    assert cost("gemini-2.5-flash", output=1_000_000, thoughts=1_000_000) == pytest.approx(5.0)
+    assert cost("unknown-model", prompt=1_000_000) == cost("gemini-2.5-flash", prompt=1_000_000)
+
+
+def test_the_ledger_totals_by_agent_and_model(tmp_path):
+    store = UsageStore(str(tmp_path / "usage.json"))
+    record = new_usage()
+    ledger = UsageLedger(record, "user:ana", store, token_budget=0, cost_budget=0)
+    ledger.record("flashcards", "gemini-2.5-flash", prompt=1000, cached=400, output=200, thoughts=50)
+    ledger.record("tts", "gemini-2.5-flash-preview-tts", prompt=10, output=320, estimated=True)
+
+    # Cached tokens are part of the prompt tokens and are not counted again
+    assert record["tokens"] == 1000 + 200 + 50 + 10 + 320
+    assert record["calls"] == 2 and record["estimated_calls"] == 1
+    assert record["by_agent"]["flashcards"]["cached"] == 400
+    assert set(record["by_model"]) == {"gemini-2.5-flash", "gemini-2.5-flash-preview-tts"}
+    assert store.today("user:ana")["tokens"] == record["tokens"]
+    assert store.today("user:ana")["cost_usd"] == record["cost_usd"]
+
+
+def test_session_budgets_downgrade_then_stop(monkeypatch):
+    monkeypatch.setattr(usage, "DOWNGRADE_AT", 0.8)
+    ledger = UsageLedger(new_usage(), "user:ana", None, token_budget=1000, cost_budget=0)
+    assert ledger.check() == "ok"
+    ledger.record("quiz", "gemini-2.5-flash", prompt=800)
+    assert ledger.check() == "downgrade"
+    ledger.record("quiz", "gemini-2.5-flash", prompt=200)
+    assert ledger.check() == "exceeded"
+    assert ledger.exceeded == "Generation stopped at the session token budget of 1000"
+    assert ledger.usage["budget"]["state"] == "exceeded"
+
+
+def test_daily_budgets_are_shared_by_the_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(usage, "DAILY_TOKEN_BUDGET", 1000)
+    store = UsageStore(str(tmp_path / "usage.json"))
+    first = UsageLedger(new_usage(), "tenant:greenwood", store, token_budget=0, cost_budget=0)
+    first.record("webpage", "gemini-2.5-flash", prompt=1000)
+    assert store.over_budget("tenant:greenwood") == "Daily token budget of 1000 exhausted"
+    assert store.over_budget("user:ana") is None
+    second = UsageLedger(new_usage(), "tenant:greenwood", store, token_budget=0, cost_budget=0)
+    assert second.check() == "exceeded"
+
+
+def test_totals_are_saved_and_loaded(tmp_path):
+    path = str(tmp_path / "usage.json")
+    store = UsageStore(path)
+    UsageLedger(new_usage(), "user:ana", store, 0, 0).record("webpage", "gemini-2.5-flash", prompt=100, output=10)
+    store.save()
+    assert UsageStore(path).today("user:ana")["tokens"] == 110
+    assert list(UsageStore(path).report()) == [usage.today()]
+
+
+def test_a_corrupt_usage_file_is_ignored(tmp_path):
+    path = tmp_path / "usage.json"
+    path.write_text("{not json")
+    assert UsageStore(str(path)).today("user:ana")["tokens"] == 0
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import hmac
+import socket
+
+import httpx
+import pytest
+
+from services import webhooks
+from services.webhooks import Delivery, WebhookDispatcher, pinned_request, sign, validate_callback_url
+
+
+@pytest.fixture(autouse=True)
+def configured(monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_SECRET", "secret")
+    monkeypatch.setattr(webhooks, "ALLOWED_HOSTS", set())
+    monkeypatch.setattr(webhooks, "ALLOW_PRIVATE", False)
+
+
+def resolve_to(monkeypatch, address: str) -> None:
+    """Makes every host resolve to the address, both in worker threads and on the event loop."""
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    infos = [(family, socket.SOCK_STREAM, 6, "", (address, 443))]
+
+    async def loop_getaddrinfo(self, *args, **kwargs):
+        return infos
+
+    monkeypatch.setattr(socket, "getaddrinfo", lambda *args, **kwargs: infos)
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", loop_getaddrinfo)
+
+
+def test_signature_is_hmac_of_timestamp_and_body():
+    body = b'{"event": "session.completed"}'
+    expected = hmac.new(b"secret", b"1700000000." + body, hashlib.sha256).hexdigest()
+    assert sign(body, 1700000000, "secret") == f"t=1700000000,v1={expected}"
+    assert sign(body, 1700000001, "secret") != sign(body, 1700000000, "secret")
+
+
+def test_callbacks_need_a_secret(monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_SECRET", "")
+    with pytest.raises(ValueError):
+        validate_callback_url("https://93.184.216.34/hook")
+
+
+@pytest.mark.parametrize("url", ["ftp://example.com/hook", "https:///hook", "not a url"])
+def test_non_http_urls_are_refused(url):
+    with pytest.raises(ValueError):
+        validate_callback_url(url)
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://localhost:8000/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.1/hook",
+    "http://100.64.0.1/hook",
+    "http://0.0.0.0/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://[fd00::1]/hook",
+])
+def test_internal_addresses_are_refused(url):
+    with pytest.raises(ValueError):
+        validate_callback_url(url)
+
+
+def test_hosts_resolving_to_internal_addresses_are_refused(monkeypatch):
+    resolve_to(monkeypatch, "169.254.169.254")
+    with pytest.raises(ValueError, match="non-public"):
+        validate_callback_url("https://hooks.example.com/acharya")
+
+
+def test_public_addresses_are_allowed(monkeypatch):
+    assert validate_callback_url("https://93.184.216.34/hook") == "https://93.184.216.34/hook"
+    resolve_to(monkeypatch, "93.184.216.34")
+    assert validate_callback_url("https://hooks.example.com/acharya")
+
+
+def test_allowed_hosts_restrict_and_are_trusted(monkeypatch):
+    monkeypatch.setattr(webhooks, "ALLOWED_HOSTS", {"receiver.internal"})
+    resolve_to(monkeypatch, "10.0.0.5")
+    assert validate_callback_url("http://receiver.internal/hook")
+    with pytest.raises(ValueError, match="not allowed"):
+        validate_callback_url("https://93.184.216.34/hook")
+
+
+def test_private_addresses_can_be_allowed(monkeypatch):
+    monkeypatch.setattr(webhooks, "ALLOW_PRIVATE", True)
+    assert validate_callback_url("http://127.0.0.1:9000/hook")
+
+
+def test_delivery_is_pinned_to_the_checked_address(monkeypatch):
+    resolve_to(monkeypatch, "93.184.216.34")
+    url, headers, extensions = asyncio.run(pinned_request("https://hooks.example.com:8443/acharya?x=1"))
+    assert url == "https://93.184.216.34:8443/acharya?x=1"
+    assert headers == {"Host": "hooks.example.com:8443"}
+    assert extensions == {"sni_hostname": "hooks.example.com"}
+
+
+def deliver(delivery: Delivery) -> tuple:
+    """Delivers once through a mock transport; returns the dispatcher and the requests it sent."""
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(204)
+
+    async def run():
+        dispatcher = WebhookDispatcher()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await dispatcher._deliver(client, delivery)
+        return dispatcher
+
+    return asyncio.run(run()), sent
+
+
+def test_rebound_hosts_are_refused_at_delivery(monkeypatch):
+    resolve_to(monkeypatch, "93.184.216.34")
+    delivery = Delivery(validate_callback_url("https://hooks.example.com/acharya"), "session.completed", {})
+    resolve_to(monkeypatch, "127.0.0.1")
+    dispatcher, sent = deliver(delivery)
+    assert sent == []
+    assert dispatcher.stats == {"delivered": 0, "retried": 0, "failed": 1}
+    assert not dispatcher.scheduled
+
+
+def test_delivery_is_signed_and_sent_to_the_checked_address(monkeypatch):
+    resolve_to(monkeypatch, "93.184.216.34")
+    delivery = Delivery("https://hooks.example.com/acharya", "session.completed", {"session_id": "s"})
+    dispatcher, sent = deliver(delivery)
+    assert dispatcher.stats["delivered"] == 1
+    [request] = sent
+    assert request.url.host == "93.184.216.34"
+    assert request.headers["Host"] == "hooks.example.com"
+    timestamp = int(request.headers[webhooks.SIGNATURE_HEADER].split(",")[0][2:])
+    assert request.headers[webhooks.SIGNATURE_HEADER] == sign(delivery.body, timestamp)